@@ -0,0 +1,20 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+from app.core.config import settings
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_cube import FWICube
+
+__all__ = ["fwi_raster_cache", "fwi_cube"]
+
+
+fwi_raster_cache = LRUCache(
+    max_entries=settings.FWI_CACHE_MAX_ENTRIES,
+    ttl=settings.FWI_CACHE_TTL,
+    max_bytes=settings.FWI_CACHE_MAX_BYTES,
+)
+
+# The daily FWI grids stacked by the ingestion job, opened lazily (memory-mapped) on the first series query
+fwi_cube = FWICube(settings.FWI_CUBE_PATH) if settings.FWI_CUBE_PATH else None
@@ -0,0 +1,86 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+__all__ = ["BoundedExecutor", "ExecutorFullError", "fwi_executor", "run_or_503"]
+
+
+class ExecutorFullError(RuntimeError):
+    """Raised when too many blocking calls are already running or queued."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls (downloads, raster decoding, geopandas work) in a bounded thread pool,
+    so that they do not block the event loop.
+
+    Calls beyond `max_workers` running and `max_queue` waiting are rejected with an `ExecutorFullError`,
+    which routes turn into a 503 response.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pyrorisks")
+        # Released from the worker threads, once the calls are done
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                raise ExecutorFullError(f"{self.pending} calls already running or queued")
+            self.pending += 1
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # A cancelled request only frees its slot once the call is done, or if it was still queued
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_or_503(
+    executor: BoundedExecutor, subject: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Any:
+    """
+    Runs a blocking call in a bounded executor, or responds 503 with a Retry-After header when it is full.
+
+    Args:
+        executor (BoundedExecutor): The executor.
+        subject (str): What the requests are about, in the 503 detail, e.g. "wildfire risk".
+        func (callable): The blocking call, with its `args` and `kwargs`.
+
+    Returns:
+        The result of the call.
+    """
+    try:
+        return await executor.run(func, *args, **kwargs)
+    except ExecutorFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Too many {subject} requests are being processed, please retry later.",
+            headers={"Retry-After": "1"},
+        )
+
+
+fwi_executor = BoundedExecutor(max_workers=settings.FWI_MAX_WORKERS, max_queue=settings.FWI_MAX_QUEUE)
@@ -0,0 +1,58 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import hashlib
+from email.utils import format_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Response, status
+
+from app.core.config import settings
+
+__all__ = ["make_etag", "etag_matches", "cache_headers", "not_modified"]
+
+
+def make_etag(*parts: Any) -> str:
+    """Builds a strong ETag from the version of the underlying dataset and the request parameters."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an `If-None-Match` header matches an ETag, with the weak comparison of RFC 9110."""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str, date: str) -> Dict[str, str]:
+    """
+    Builds the caching headers of a response about a given date.
+
+    Past days are final once published, so they are cached for long. Today's and future days' data may still be
+    published or revised, so they are only cached shortly.
+
+    Args:
+        etag (str): The ETag of the response.
+        date (str): The date of the data, in %Y-%m-%d format.
+
+    Returns:
+        dict: The `ETag`, `Cache-Control` and `Expires` headers.
+    """
+    is_final = datetime.datetime.strptime(date, "%Y-%m-%d").date() < datetime.date.today()
+    max_age = settings.HTTP_CACHE_FINAL_MAX_AGE if is_final else settings.HTTP_CACHE_MAX_AGE
+    expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=max_age)
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" + (", immutable" if is_final else ""),
+        "Expires": format_datetime(expires, usegmt=True),
+    }
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
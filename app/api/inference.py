@@ -3,14 +3,155 @@
 # This program is licensed under the Apache License version 2.
 # See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
 
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-__all__ = ["predictor"]
+import numpy as np
 
+from app.core.config import settings
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_regions import N_FWI_CATEGORIES
 
-class Mock:
-    def predict(self, date):
-        _ = date
-        return {"01": {"score": 0.5, "explainability": "weather"}, "02": {"score": 0.5, "explainability": "weather"}}
+__all__ = ["predictor", "FWIRiskPredictor", "FEATURES"]
 
+logger = logging.getLogger(__name__)
 
-predictor = Mock()
+FEATURES = (
+    ["mean_category", "max_category"]
+    + [f"share_category_{category}" for category in range(1, N_FWI_CATEGORIES + 1)]
+    + ["day_of_year_sin", "day_of_year_cos"]
+)
+
+
+class FWIBaselineModel:
+    """Fallback model when no trained model is configured: a logistic curve of the mean FWI category."""
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        proba = 1 / (1 + np.exp(-1.5 * (X[:, 0] - 3.5)))
+        return np.stack([1 - proba, proba], axis=1)
+
+
+def _predict_proba(model: Any, X: np.ndarray) -> np.ndarray:
+    """The probability of the positive class, from `predict_proba`, or the output of `predict`."""
+    if hasattr(model, "predict_proba"):
+        return np.asarray(model.predict_proba(X))[:, 1]
+    return np.asarray(model.predict(X), dtype=np.float64)
+
+
+class FWIRiskPredictor:
+    """
+    Predicts the wildfire risk of every region of a country for a date, in one vectorized batch.
+
+    The model is loaded and warmed up once, at startup (see `load`). It can be any pickled object with a
+    scikit-learn like `predict_proba` (or `predict`) method taking the `FEATURES` matrix. Predictions are memoized
+    per (country, date).
+    """
+
+    def __init__(self, model_path: Optional[str] = None, max_dates: int = 31) -> None:
+        self.model_path = model_path
+        self.model: Any = None
+        self.version: Optional[str] = None
+        self.load_time = 0.0
+        self._load_lock = threading.Lock()
+
+        self._predictions = LRUCache(max_entries=max_dates)
+        self.n_batches = 0
+        self.batch_time = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> None:
+        """Loads and warms up the model, unless it is already loaded. Blocking, the API runs it at startup."""
+        with self._load_lock:
+            if self.loaded:
+                return
+            start = time.perf_counter()
+            if self.model_path is None:
+                model: Any = FWIBaselineModel()
+                version = FWIBaselineModel.__name__
+            else:
+                # The model path comes from the settings, never from user input
+                with open(self.model_path, "rb") as f:
+                    model_bytes = f.read()
+                model = pickle.loads(model_bytes)  # noqa: S301
+                version = hashlib.blake2b(model_bytes, digest_size=16).hexdigest()
+            # Warm up, so that the first request does not pay for lazy initializations
+            _predict_proba(model, np.zeros((1, len(FEATURES))))
+            self.model, self.version = model, version
+            self.load_time = time.perf_counter() - start
+            logger.info(f"Loaded risk model {type(self.model).__name__} in {self.load_time:.3f}s")
+
+    @staticmethod
+    def features(regions: Dict[str, Dict[str, Any]], date: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Builds the feature matrix of all the regions of a date: FWI statistics plus calendar features.
+
+        Args:
+            regions (dict): The FWI statistics of each region, by geocode, see `FWIRegions.aggregate`.
+            date (str): The date, in %Y-%m-%d format.
+
+        Returns:
+            (geocodes, X): The geocodes of the regions and their features, one row per region.
+        """
+        geocodes = list(regions)
+        X = np.empty((len(geocodes), len(FEATURES)))
+        for idx, geocode in enumerate(geocodes):
+            stats = regions[geocode]
+            X[idx, 0] = stats["mean_category"]
+            X[idx, 1] = stats["max_category"]
+            for category in range(1, N_FWI_CATEGORIES + 1):
+                X[idx, 1 + category] = stats["category_shares"].get(str(category), 0.0)
+        day_of_year = datetime.strptime(date, "%Y-%m-%d").timetuple().tm_yday
+        X[:, -2] = np.sin(2 * np.pi * day_of_year / 365.25)
+        X[:, -1] = np.cos(2 * np.pi * day_of_year / 365.25)
+        return geocodes, X
+
+    def predict(self, country: str, date: str, regions: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Predicts the wildfire risk of every region, reusing the predictions already made for (country, date).
+
+        Blocking: the model is loaded first if needed, and inference runs in the calling thread.
+
+        Args:
+            country (str): The country code, e.g. "FR".
+            date (str): The date, in %Y-%m-%d format.
+            regions (dict): The FWI statistics of each region, by geocode.
+
+        Returns:
+            dict: The score (in ]0, 1[) and explainability of each region, by geocode.
+        """
+        self.load()
+
+        def _predict() -> Dict[str, Dict[str, Any]]:
+            start = time.perf_counter()
+            geocodes, X = self.features(regions, date)
+            # Scores are strictly between 0 and 1
+            scores = np.clip(_predict_proba(self.model, X), 1e-6, 1 - 1e-6) if len(geocodes) else np.empty(0)
+            self.n_batches += 1
+            self.batch_time += time.perf_counter() - start
+            return {
+                geocode: {"score": float(score), "explainability": "fwi"} for geocode, score in zip(geocodes, scores)
+            }
+
+        return self._predictions.get_or_load((country, date), _predict)
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports the model load time, the number and latency of the batch predictions, and the memoization."""
+        return {
+            "model": type(self.model).__name__ if self.loaded else None,
+            "load_time": self.load_time,
+            "batches": self.n_batches,
+            "mean_batch_time": self.batch_time / self.n_batches if self.n_batches else 0.0,
+            "cache": self._predictions.stats(),
+        }
+
+
+# Loaded by the API lifespan, not on import
+predictor = FWIRiskPredictor(settings.RISK_MODEL_PATH, max_dates=settings.RISK_INDEX_MAX_DATES)
@@ -0,0 +1,75 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+from typing import Any, Dict, Iterator
+
+from fastapi.responses import JSONResponse
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from app.api.cache import fwi_raster_cache
+from app.api.executor import fwi_executor
+from app.api.inference import predictor
+from pyrorisks.utils.metrics import DURATION_BUCKETS, FWI_STAGE_SECONDS
+
+__all__ = ["HTTP_REQUEST_SECONDS", "HTTP_REQUESTS_IN_FLIGHT", "TimedJSONResponse"]
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "pyrorisks_http_request_duration_seconds",
+    "Duration of the HTTP requests, by route template.",
+    ["method", "route", "status"],
+    buckets=DURATION_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "pyrorisks_http_requests_in_flight", "Number of HTTP requests being processed.", ["method"]
+)
+
+
+class APIStateCollector(Collector):
+    """Reads the executor and in-process cache statistics when the metrics are scraped."""
+
+    def collect(self) -> Iterator[Metric]:
+        pending = GaugeMetricFamily(
+            "pyrorisks_fwi_executor_pending", "Number of blocking FWI calls running or queued in the thread pool."
+        )
+        pending.add_metric([], fwi_executor.pending)
+        yield pending
+
+        caches: Dict[str, Dict[str, Any]] = {
+            "fwi_raster": fwi_raster_cache.stats(),
+            "risk_predictions": predictor.stats()["cache"],
+        }
+        # Hits and misses only go up, since the process started
+        lookups = CounterMetricFamily(
+            "pyrorisks_cache_lookups", "Number of lookups of the in-process caches.", labels=["cache", "result"]
+        )
+        hit_ratio = GaugeMetricFamily(
+            "pyrorisks_cache_hit_ratio", "Share of the lookups of the in-process caches that hit.", labels=["cache"]
+        )
+        entries = GaugeMetricFamily(
+            "pyrorisks_cache_entries", "Number of entries of the in-process caches.", labels=["cache"]
+        )
+        size = GaugeMetricFamily(
+            "pyrorisks_cache_bytes", "Size of the values of the in-process caches, in bytes.", labels=["cache"]
+        )
+        for name, stats in caches.items():
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            hit_ratio.add_metric([name], stats["hit_ratio"])
+            entries.add_metric([name], stats["entries"])
+            size.add_metric([name], stats["bytes"])
+        yield from (lookups, hit_ratio, entries, size)
+
+
+REGISTRY.register(APIStateCollector())
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response recording its rendering time as the `serialization` stage of the FWI path."""
+
+    def render(self, content: Any) -> bytes:
+        with FWI_STAGE_SECONDS.labels(stage="serialization").time():
+            return super().render(content)
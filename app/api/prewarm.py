@@ -0,0 +1,124 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+from app.api.cache import fwi_raster_cache
+from app.core.config import settings
+from pyrorisks.platform_fwi.get_fwi_effis_score import EFFIS_FWI_LAYER, load_fwi_raster
+from pyrorisks.utils.cache import LRUCache
+
+__all__ = ["FWIPrewarmer", "fwi_prewarmer"]
+
+logger = logging.getLogger(__name__)
+
+
+class FWIPrewarmer:
+    """
+    Keeps the FWI rasters of today and tomorrow in the cache, loading them in the background.
+
+    Every `interval` seconds, the rasters which are missing from the cache, or which would expire before the next
+    run, are downloaded again. A raster not yet published by EFFIS is retried with an exponential backoff, until the
+    next run. A missing raster is loaded through the cache (`get_or_load`), so that a concurrent cold request shares
+    the same download. A stale one is downloaded again while the cached one keeps being served, then replaced in a
+    single `put`, so requests always see a full raster.
+    """
+
+    def __init__(
+        self,
+        cache: LRUCache,
+        interval: float = 15 * 60,
+        retry_delay: float = 10,
+        max_backoff: float = 10 * 60,
+        layer: str = EFFIS_FWI_LAYER,
+    ) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.layer = layer
+        self.last_loaded: Dict[str, datetime.datetime] = {}
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def dates() -> List[str]:
+        today = datetime.date.today()
+        return [(today + datetime.timedelta(days=delta)).strftime("%Y-%m-%d") for delta in (0, 1)]
+
+    def is_stale(self, date: str) -> bool:
+        age = self.cache.age((self.layer, date))
+        if age is None:
+            return True
+        # Reload the entries which would expire before the next run
+        return self.cache.ttl is not None and age + self.interval >= self.cache.ttl
+
+    async def warm(self, date: str, deadline: float) -> bool:
+        """
+        Loads the raster of a date into the cache, retrying with an exponential backoff until `deadline`.
+
+        Args:
+            date (str): The date of the FWI map, in %Y-%m-%d format.
+            deadline (float): The event loop time after which retries are given up.
+
+        Returns:
+            bool: Whether the raster was loaded.
+        """
+        loop = asyncio.get_running_loop()
+        delay = self.retry_delay
+        while True:
+            # Runs outside of the request executor, so that the pre-warming never takes slots from user requests
+            if self.cache.age((self.layer, date)) is None:
+                fwi_raster = await asyncio.to_thread(load_fwi_raster, date, self.layer, self.cache)
+            else:
+                fwi_raster = await asyncio.to_thread(load_fwi_raster, date, self.layer)
+                if fwi_raster is not None:
+                    self.cache.put((self.layer, date), fwi_raster)
+            if fwi_raster is not None:
+                self.last_loaded[date] = datetime.datetime.now()
+                logger.info(f"Pre-warmed the FWI raster of {date}")
+                return True
+            self.failures += 1
+            if loop.time() + delay >= deadline:
+                logger.warning(f"The FWI raster of {date} is not available yet, retrying at the next run")
+                return False
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, self.max_backoff)
+
+    async def run_once(self) -> None:
+        deadline = asyncio.get_running_loop().time() + self.interval
+        await asyncio.gather(*(self.warm(date, deadline) for date in self.dates() if self.is_stale(date)))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"Could not pre-warm the FWI rasters: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+fwi_prewarmer = FWIPrewarmer(
+    fwi_raster_cache,
+    interval=settings.FWI_PREWARM_INTERVAL,
+    retry_delay=settings.FWI_PREWARM_RETRY_DELAY,
+    max_backoff=settings.FWI_PREWARM_MAX_BACKOFF,
+)
@@ -0,0 +1,128 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.api.storage import get_s3_bucket
+from app.core.config import settings
+from pyrorisks.utils.fwi_catalog import fwi_partition
+
+__all__ = ["RegionRiskIndex", "risk_index"]
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of remembered missing (country, date), see `RegionRiskIndex.miss_ttl`
+MAX_MISSES = 1024
+
+
+class RegionRiskIndex:
+    """
+    In-memory index of the daily per-region FWI statistics computed by the platform_fwi pipeline,
+    keyed by (country, date), so that the risk route answers with a dict lookup.
+
+    Missing dates are loaded from S3 on first request, once even under concurrent requests. Dates whose
+    statistics are not stored are remembered for `miss_ttl` seconds, so that they do not cost an S3 GET per request.
+    """
+
+    def __init__(self, max_dates: int, miss_ttl: float = 60) -> None:
+        self.max_dates = max_dates
+        self.miss_ttl = miss_ttl
+        self._index: OrderedDict[Tuple[str, str], Dict[str, Dict[str, Any]]] = OrderedDict()
+        self._versions: Dict[Tuple[str, str], str] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Expiry (monotonic time) of the (country, date) known to be missing, oldest first
+        self._misses: OrderedDict[Tuple[str, str], float] = OrderedDict()
+
+    def get(self, country: str, date: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        return self._index.get((country, date))
+
+    def version(self, country: str, date: str) -> Optional[str]:
+        """The fingerprint of the indexed statistics of (country, date), None if they are not indexed."""
+        return self._versions.get((country, date))
+
+    def put(self, country: str, date: str, regions: Dict[str, Dict[str, Any]]) -> None:
+        self._misses.pop((country, date), None)
+        self._index[(country, date)] = regions
+        self._index.move_to_end((country, date))
+        self._versions[(country, date)] = hashlib.blake2b(
+            json.dumps(regions, sort_keys=True).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        while len(self._index) > self.max_dates:
+            key, _ = self._index.popitem(last=False)
+            del self._versions[key]
+
+    def _put_miss(self, country: str, date: str) -> None:
+        self._misses[(country, date)] = time.monotonic() + self.miss_ttl
+        self._misses.move_to_end((country, date))
+        while len(self._misses) > MAX_MISSES:
+            self._misses.popitem(last=False)
+
+    def _is_missing(self, country: str, date: str) -> bool:
+        expiry = self._misses.get((country, date))
+        if expiry is None:
+            return False
+        if expiry <= time.monotonic():
+            del self._misses[(country, date)]
+            return False
+        return True
+
+    async def _load(self, country: str, date: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        s3 = get_s3_bucket()
+        if s3 is None:
+            return None
+        try:
+            json_content = await s3.read_json_from_s3(fwi_partition(date) + "fwi_regions.json")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey"}:
+                self._put_miss(country, date)
+                return None
+            raise
+        if json_content.get("country") != country:
+            self._put_miss(country, date)
+            return None
+        self.put(country, date, json_content["regions"])
+        return json_content["regions"]
+
+    async def get_or_load(self, country: str, date: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Retrieves the statistics of each region of a country for a date, loading them from S3 if needed.
+
+        Args:
+            country (str): The country code, e.g. "FR".
+            date (str): The date, in %Y-%m-%d format.
+
+        Returns:
+            dict or None: The statistics of each region, by geocode, or None if they were not computed.
+        """
+        regions = self.get(country, date)
+        if regions is not None or self._is_missing(country, date):
+            return regions
+        key = (country, date)
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.create_task(self._load(country, date))
+            self._inflight[key].add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(self._inflight[key])
+
+    async def preload(self, country: str, n_days: int) -> None:
+        """Loads the statistics of the last `n_days` days, ignoring the missing ones."""
+        today = datetime.date.today()
+        for delta in range(n_days):
+            date = (today - datetime.timedelta(days=delta)).strftime("%Y-%m-%d")
+            try:
+                await self.get_or_load(country, date)
+            except Exception as e:
+                logger.warning(f"Could not preload the regional FWI statistics of {country} on {date}: {e}")
+
+
+risk_index = RegionRiskIndex(max_dates=settings.RISK_INDEX_MAX_DATES, miss_ttl=settings.RISK_INDEX_MISS_TTL)
@@ -3,14 +3,111 @@
 # This program is licensed under the Apache License version 2.
 # See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
 
-from typing import Dict, Any
-from fastapi import APIRouter, Depends
+import functools
+import datetime
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, File, Form, Header, Request, Response, UploadFile
 from fastapi import HTTPException, status
-from app.api.schemas import ScoreQueryParams, Score
-from pyrorisks.platform_fwi.get_fwi_effis_score import get_fwi as _get_fwi
+from fastapi.routing import APIRoute
+from app.api.cache import fwi_cube, fwi_raster_cache
+from app.api.executor import fwi_executor, run_or_503
+from app.api.http_cache import cache_headers, etag_matches, make_etag, not_modified
+from app.api.metrics import TimedJSONResponse
+from app.api.schemas import BatchScore, BatchScoreQuery, CacheStats, ScoreQueryParams, Score, ScoreSeries
+from app.api.schemas import SeriesQueryParams, validate_date
+from app.core.config import settings
+from pyrorisks.platform_fwi.get_fwi_effis_score import get_fwi_series as _get_fwi_series
+from pyrorisks.platform_fwi.get_fwi_effis_score import get_fwi_batch_from_raster, get_fwi_from_raster, load_fwi_raster
+from pyrorisks.utils.metrics import FWI_STAGE_SECONDS
+
+# Upper bound of the JSON size of a [longitude, latitude] point, with full float precision and separators
+POINT_MAX_BYTES = 64
+
+
+def _max_body_bytes(endpoint_name: str) -> Optional[int]:
+    if endpoint_name == "get_fwi_batch":
+        return settings.FWI_BATCH_MAX_POINTS * POINT_MAX_BYTES + 1024
+    if endpoint_name == "get_fwi_batch_file":
+        # The form fields and multipart boundaries come on top of the file
+        return settings.FWI_BATCH_MAX_UPLOAD_BYTES + 64 * 1024
+    return None
+
+
+class BodySizeLimitRoute(APIRoute):
+    """Rejects the batch requests whose declared size is too large, before their body is read and parsed."""
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        route_handler = super().get_route_handler()
+
+        async def size_limited_route_handler(request: Request) -> Any:
+            max_body_bytes = _max_body_bytes(self.name)
+            content_length = request.headers.get("content-length")
+            if max_body_bytes is not None and content_length is not None and content_length.isdigit():
+                if int(content_length) > max_body_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Batch requests are limited to {max_body_bytes} bytes.",
+                    )
+            return await route_handler(request)
+
+        return size_limited_route_handler
+
+
+router = APIRouter(default_response_class=TimedJSONResponse, route_class=BodySizeLimitRoute)
+
+
+# Blocking calls run in the bounded executor, answering 503 when it is full
+_run = functools.partial(run_or_503, fwi_executor, "Fire Weather Index (FWI)")
+
+
+def _lookup(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # Timed once per request, in the worker thread so that the executor queue is left out
+    with FWI_STAGE_SECONDS.labels(stage="lookup").time():
+        return func(*args, **kwargs)
+
+
+def _check_batch_size(n_points: int) -> None:
+    if n_points > settings.FWI_BATCH_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch queries are limited to {settings.FWI_BATCH_MAX_POINTS} points, got {n_points}.",
+        )
+
+
+def _check_upload_size(n_bytes: int) -> None:
+    if n_bytes > settings.FWI_BATCH_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch files are limited to {settings.FWI_BATCH_MAX_UPLOAD_BYTES} bytes.",
+        )
+
+
+def _parse_points(content: bytes, filename: str, content_type: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # NDJSON: one {"longitude": ..., "latitude": ...} object per line, CSV otherwise
+    if filename.endswith((".ndjson", ".jsonl")) or content_type in {"application/x-ndjson", "application/jsonl"}:
+        points = pd.read_json(BytesIO(content), lines=True)
+    else:
+        points = pd.read_csv(BytesIO(content))
+    return points["longitude"].to_numpy(dtype=np.float64), points["latitude"].to_numpy(dtype=np.float64)
+
+
+def _not_found(date: Optional[str]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Fire Weather Index (FWI) map for date {date or 'today'} was not found.",
+    )
 
 
-router = APIRouter()
+async def _lookup_batch(longitudes: np.ndarray, latitudes: np.ndarray, crs: str, date: Optional[str]) -> Dict[str, Any]:
+    date = date or datetime.date.today().strftime("%Y-%m-%d")
+    fwi_raster = await _run(load_fwi_raster, date, cache=fwi_raster_cache)
+    if fwi_raster is None:
+        raise _not_found(date)
+    return await _run(_lookup, get_fwi_batch_from_raster, fwi_raster, longitudes, latitudes, crs, date)
 
 
 @router.get(
@@ -18,11 +115,120 @@ router = APIRouter()
     response_model=Score,
     summary="Provide European Forest Fire Information System (EFFIS) Fire Weather Index (FWI) categories.",
 )
-async def get_fwi(query: ScoreQueryParams = Depends()) -> Dict[str, Any]:
-    results = _get_fwi(longitude=query.longitude, latitude=query.latitude, crs=query.crs)
+async def get_fwi(
+    response: Response, query: ScoreQueryParams = Depends(), if_none_match: Optional[str] = Header(None)
+) -> Any:
+    date = datetime.date.today().strftime("%Y-%m-%d")
+    fwi_raster = await _run(load_fwi_raster, date, cache=fwi_raster_cache)
+    if fwi_raster is None:
+        raise _not_found(date)
+    # The response only depends on the FWI raster of the day and on the query
+    headers = cache_headers(make_etag("fwi", fwi_raster.version, query.longitude, query.latitude, query.crs), date)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    results = _lookup(get_fwi_from_raster, fwi_raster, query.longitude, query.latitude, query.crs, date)
     if results is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Fire Weather Index (FWI) for longitude {query.longitude} and latitude {query.latitude} was not found.",
         )
     return results
+
+
+@router.post(
+    path="/batch",
+    response_model=BatchScore,
+    summary="Provide the EFFIS Fire Weather Index (FWI) categories of many points at once.",
+)
+async def get_fwi_batch(query: BatchScoreQuery) -> Dict[str, Any]:
+    _check_batch_size(len(query.points))
+    points = np.asarray(query.points, dtype=np.float64).reshape(-1, 2)
+    return await _lookup_batch(points[:, 0], points[:, 1], query.crs, query.date)
+
+
+@router.post(
+    path="/batch/file",
+    response_model=BatchScore,
+    summary="Provide the EFFIS Fire Weather Index (FWI) categories of the points of a CSV or NDJSON file.",
+)
+async def get_fwi_batch_file(
+    file: UploadFile = File(..., description="CSV or NDJSON file with `longitude` and `latitude` fields."),
+    crs: str = Form("EPSG:4326"),
+    date: Optional[str] = Form(None),
+) -> Dict[str, Any]:
+    try:
+        date = validate_date(date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    # The request size was checked before the upload was spooled, the file size is checked before it is read in
+    # memory, and the number of points once parsed
+    _check_upload_size(file.size or 0)
+    content = await file.read(settings.FWI_BATCH_MAX_UPLOAD_BYTES + 1)
+    _check_upload_size(len(content))
+    try:
+        longitudes, latitudes = await _run(_parse_points, content, file.filename or "", file.content_type)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Could not read longitude and latitude from {file.filename}: {e}",
+        )
+    _check_batch_size(len(longitudes))
+    return await _lookup_batch(longitudes, latitudes, crs, date)
+
+
+@router.get(
+    path="/series",
+    response_model=ScoreSeries,
+    summary="Provide the daily EFFIS Fire Weather Index (FWI) categories of a point over a range of dates.",
+)
+async def get_fwi_series(query: SeriesQueryParams = Depends()) -> Any:
+    if fwi_cube is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Fire Weather Index (FWI) time series are not available."
+        )
+    today = datetime.date.today()
+    max_range = datetime.timedelta(days=settings.FWI_SERIES_MAX_DAYS - 1)
+    try:
+        start_date = datetime.date.fromisoformat(query.start_date) if query.start_date else None
+        if query.end_date:
+            end_date = datetime.date.fromisoformat(query.end_date)
+        elif start_date is not None:
+            # The longest range from the start date, up to today
+            end_date = min(today, start_date + max_range)
+        else:
+            end_date = today
+        if start_date is None:
+            start_date = end_date - max_range
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if not 0 <= (end_date - start_date).days < settings.FWI_SERIES_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Time series are limited to {settings.FWI_SERIES_MAX_DAYS} days, from start_date to end_date.",
+        )
+    results = await _run(
+        _lookup,
+        _get_fwi_series,
+        fwi_cube,
+        query.longitude,
+        query.latitude,
+        start_date.isoformat(),
+        end_date.isoformat(),
+        crs=query.crs,
+    )
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Fire Weather Index (FWI) for longitude {query.longitude} and latitude {query.latitude} was not found.",
+        )
+    return results
+
+
+@router.get(
+    path="/cache",
+    response_model=CacheStats,
+    summary="Report the usage of the in-process cache of daily FWI rasters.",
+)
+async def get_fwi_cache_stats() -> Dict[str, Any]:
+    return fwi_raster_cache.stats()
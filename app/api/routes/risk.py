@@ -3,21 +3,60 @@
 # This program is licensed under the Apache License version 2.
 # See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
 
-from typing import List
-from fastapi import APIRouter
+import functools
+from typing import Any, Callable, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from app.api.executor import fwi_executor, run_or_503
+from app.api.http_cache import cache_headers, etag_matches, make_etag, not_modified
 from app.api.inference import predictor
-from app.api.schemas import RegionRisk
+from app.api.risk_index import risk_index
+from app.api.schemas import PredictorStats, RegionRisk, validate_date
+from app.core.config import settings
 
 
 router = APIRouter()
 
+# Blocking calls run in the bounded executor, answering 503 when it is full
+_run = functools.partial(run_or_503, fwi_executor, "wildfire risk")
+
+
+@router.get(
+    "/model",
+    response_model=PredictorStats,
+    summary="Report the load time and latency of the wildfire risk model",
+)
+async def get_predictor_stats():
+    return predictor.stats()
+
 
 @router.get(
     "/{country}/{date}",
     response_model=List[RegionRisk],
     summary="Computes the wildfire risk",
 )
-async def get_pyrorisk(country: str, date: str):
+async def get_pyrorisk(country: str, date: str, response: Response, if_none_match: Optional[str] = Header(None)):
     """Using the country identifier, this will compute the wildfire risk for all known subregions"""
-    preds = predictor.predict(date)
+    # Normalized, so that equivalent dates share the S3 key, the ETag and the memoized predictions
+    try:
+        date = validate_date(date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    # Only the country covered by the FWI pipeline is indexed
+    regions = await risk_index.get_or_load(country.upper(), date) if country.upper() == settings.RISK_COUNTRY else None
+    if regions is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Wildfire risk for country {country} on {date} was not found.",
+        )
+    if not predictor.loaded:
+        await _run(predictor.load)
+    # The risk only depends on the regional statistics of the day and on the model
+    headers = cache_headers(
+        make_etag("risk", country.upper(), date, risk_index.version(country.upper(), date), predictor.version), date
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    # Model inference is blocking
+    preds = await _run(predictor.predict, country.upper(), date, regions)
     return [RegionRisk(geocode=k, score=v["score"], explainability=v["explainability"]) for k, v in preds.items()]
@@ -3,8 +3,29 @@
 # This program is licensed under the Apache License version 2.
 # See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
 
-from typing import Optional
-from pydantic import BaseModel, Field
+import datetime
+from typing import List, Optional, Tuple, overload
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.config import settings
+
+
+@overload
+def validate_date(value: str) -> str: ...
+
+
+@overload
+def validate_date(value: None) -> None: ...
+
+
+def validate_date(value: Optional[str]) -> Optional[str]:
+    """Checks that a date is in %Y-%m-%d format, and normalizes it (e.g. "2024-1-1" to "2024-01-01")."""
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}, expected %Y-%m-%d format")
 
 
 class RegionRisk(BaseModel):
@@ -30,3 +51,77 @@ class Score(BaseModel):
     score: str = Field(..., examples=["fwi"], description="Score name.")
     value: float = Field(..., examples=[2, 1], description="Score value.")
     date: str = Field(..., examples=["2024-01-01"], description="Date in %Y-%m-%d format")
+
+
+class BatchScoreQuery(BaseModel):
+    points: List[Tuple[float, float]] = Field(
+        ...,
+        max_length=settings.FWI_BATCH_MAX_POINTS,
+        examples=[[[2.638828, 48.391842], [5.369780, 43.296482]]],
+        description="List of [longitude, latitude].",
+    )
+    crs: str = Field(
+        default="EPSG:4326",
+        examples=["EPSG:4326"],
+        description="Coordinate Reference System (CRS), Default to World Geodetic System CRS (EPSG:4326 / WGS84).",
+    )
+    date: Optional[str] = Field(None, examples=["2024-01-01"], description="Date in %Y-%m-%d format, default to today")
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: Optional[str]) -> Optional[str]:
+        # The date ends up in the EFFIS URL and in the raster cache key
+        return validate_date(value)
+
+
+class BatchScore(BaseModel):
+    crs: str = Field(..., examples=["EPSG:4326"], description="Coordinate Reference System (CRS).")
+    score: str = Field(..., examples=["fwi"], description="Score name.")
+    date: str = Field(..., examples=["2024-01-01"], description="Date in %Y-%m-%d format")
+    values: List[Optional[float]] = Field(
+        ..., examples=[[2, None]], description="Score values, in the order of the query points (null outside the map)."
+    )
+
+
+class SeriesQueryParams(ScoreQueryParams):
+    start_date: Optional[str] = Field(
+        None, examples=["2024-01-01"], description="First date in %Y-%m-%d format, default to a year before the end"
+    )
+    end_date: Optional[str] = Field(
+        None,
+        examples=["2024-12-31"],
+        description="Last date in %Y-%m-%d format, default to a year after the start, or to today",
+    )
+
+
+class ScoreSeries(BaseModel):
+    longitude: float = Field(..., gt=-90.0, lt=90.0, examples=[2.638828])
+    latitude: float = Field(..., gt=-180.0, lt=180.0, examples=[48.391842])
+    crs: str = Field(..., examples=["EPSG:4326"], description="Coordinate Reference System (CRS).")
+    score: str = Field(..., examples=["fwi"], description="Score name.")
+    dates: List[str] = Field(..., examples=[["2024-07-01", "2024-07-02"]], description="Dates in %Y-%m-%d format.")
+    values: List[Optional[float]] = Field(
+        ..., examples=[[2, 3]], description="Score values, in the order of the dates (null on the sea)."
+    )
+
+
+class PredictorStats(BaseModel):
+    model: Optional[str] = Field(
+        ..., examples=["FWIBaselineModel"], description="Class of the loaded model, null until it is loaded."
+    )
+    load_time: float = Field(..., description="Time to load and warm up the model, in seconds.")
+    batches: int = Field(..., description="Number of batch predictions computed.")
+    mean_batch_time: float = Field(..., description="Mean latency of a batch prediction, in seconds.")
+    cache: "CacheStats"
+
+
+class CacheStats(BaseModel):
+    hits: int = Field(..., description="Number of lookups served from the cache.")
+    misses: int = Field(..., description="Number of lookups that had to load the data.")
+    evictions: int = Field(..., description="Number of entries evicted to respect the cache bounds.")
+    coalesced: int = Field(..., description="Number of misses that waited for an in-flight load of the same key.")
+    hit_ratio: float = Field(..., ge=0, le=1, examples=[0.99])
+    entries: int = Field(..., description="Number of cached entries.")
+    max_entries: int
+    bytes: int = Field(..., description="Total size of the cached entries, in bytes.")
+    max_bytes: Optional[int] = None
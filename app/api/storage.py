@@ -0,0 +1,28 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+from typing import Optional
+
+from app.core.config import settings
+from pyrorisks.utils.s3 import AsyncS3Bucket, S3Bucket
+
+__all__ = ["get_s3_bucket"]
+
+_s3_bucket: Optional[AsyncS3Bucket] = None
+
+
+def get_s3_bucket() -> Optional[AsyncS3Bucket]:
+    """Lazily builds the S3 bucket of the API, sharing the process-wide S3 client. None if it is not configured."""
+    global _s3_bucket
+    if _s3_bucket is None and settings.S3_BUCKET_NAME is not None:
+        s3 = S3Bucket(
+            bucket_name=settings.S3_BUCKET_NAME,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY,
+            aws_secret_key=settings.S3_SECRET_KEY,
+        )
+        _s3_bucket = AsyncS3Bucket(s3)
+    return _s3_bucket
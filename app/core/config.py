@@ -30,5 +30,41 @@ class Settings(BaseSettings):
     S3_REGION: Optional[str] = None
     S3_ENDPOINT_URL: Optional[str] = None
 
+    # In-process cache of the decoded daily FWI rasters
+    FWI_CACHE_MAX_ENTRIES: int = 7
+    FWI_CACHE_TTL: Optional[float] = 6 * 3600
+    FWI_CACHE_MAX_BYTES: int = 256 * 1024**2
+
+    # Blocking FWI work runs in a bounded thread pool, further calls are rejected with a 503
+    FWI_MAX_WORKERS: int = 8
+    FWI_MAX_QUEUE: int = 64
+
+    # Background loading of today's and tomorrow's FWI rasters into the cache, so that no request pays the cold load
+    FWI_PREWARM_ENABLED: bool = False
+    FWI_PREWARM_INTERVAL: float = 15 * 60
+    FWI_PREWARM_RETRY_DELAY: float = 10
+    FWI_PREWARM_MAX_BACKOFF: float = 10 * 60
+
+    # Maximum number of points of a batch FWI query, and size of a batch file upload
+    FWI_BATCH_MAX_POINTS: int = 10_000
+    FWI_BATCH_MAX_UPLOAD_BYTES: int = 2 * 1024**2
+
+    # Local FWI cube maintained by the platform_fwi pipeline (--cube-path), for the point time series
+    FWI_CUBE_PATH: Optional[str] = None
+    FWI_SERIES_MAX_DAYS: int = 366
+
+    # Client and CDN caching of the FWI and risk responses, in seconds: days before today are final
+    HTTP_CACHE_MAX_AGE: int = 15 * 60
+    HTTP_CACHE_FINAL_MAX_AGE: int = 7 * 24 * 3600
+
+    # In-memory index of the daily per-region FWI statistics
+    RISK_COUNTRY: str = "FR"
+    RISK_INDEX_MAX_DATES: int = 31
+    # Dates without statistics on S3 are not looked up again for this long, in seconds
+    RISK_INDEX_MISS_TTL: float = 60
+    RISK_PRELOAD_DAYS: int = 2
+    # Pickled model with a `predict_proba` method, see `app.api.inference`. Baseline model if None
+    RISK_MODEL_PATH: Optional[str] = None
+
 
 settings = Settings()  # type: ignore[call-arg]
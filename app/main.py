@@ -3,12 +3,31 @@
 # This program is licensed under the Apache License version 2.
 # See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
 
+import asyncio
 import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.openapi.utils import get_openapi
 
 from app.core.config import settings
-from app.api.routes import fwi
+from app.api.executor import fwi_executor
+from app.api.inference import predictor
+from app.api.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT
+from app.api.prewarm import fwi_prewarmer
+from app.api.risk_index import risk_index
+from app.api.routes import fwi, metrics, risk
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The risk model is loaded (and fails) at startup, rather than on import or on the first request
+    await asyncio.to_thread(predictor.load)
+    if settings.FWI_PREWARM_ENABLED:
+        fwi_prewarmer.start()
+    await risk_index.preload(settings.RISK_COUNTRY, settings.RISK_PRELOAD_DAYS)
+    yield
+    await fwi_prewarmer.stop()
+    fwi_executor.shutdown()
 
 
 app = FastAPI(
@@ -16,10 +35,13 @@ app = FastAPI(
     description=settings.PROJECT_DESCRIPTION,
     debug=settings.DEBUG,
     version=settings.VERSION,
+    lifespan=lifespan,
 )
 
 # Routing
 app.include_router(fwi.router, prefix="/fwi", tags=["fwi"])
+app.include_router(risk.router, prefix="/risk", tags=["risk"])
+app.include_router(metrics.router, tags=["metrics"])
 
 
 # Middleware
@@ -32,6 +54,23 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start_time = time.perf_counter()
+    status = 500
+    with HTTP_REQUESTS_IN_FLIGHT.labels(method=request.method).track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            # Label by route template rather than raw path, to keep the number of series bounded
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=request.method, route=getattr(route, "path", "unmatched"), status=str(status)
+            ).observe(time.perf_counter() - start_time)
+    return response
+
+
 # Docs
 def custom_openapi():
     if app.openapi_schema:
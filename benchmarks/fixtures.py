@@ -0,0 +1,177 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import threading
+from contextlib import contextmanager
+from email.message import Message
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Tuple
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+
+__all__ = ["EFFIS_BBOX", "make_fwi_band", "make_fwi_tiff", "serve", "StubS3Server"]
+
+# Extent and resolution of the EFFIS WMS request of the platform_fwi pipeline
+EFFIS_BBOX = (-6.0, 41.0, 10.0, 52.0)
+EFFIS_WIDTH, EFFIS_HEIGHT = 1600, 1200
+
+
+def make_fwi_band(width: int = EFFIS_WIDTH, height: int = EFFIS_HEIGHT, seed: int = 0) -> np.ndarray:
+    """
+    Builds a realistic looking FWI band: smooth patches of FWI pixel values over land, 0 over the sea.
+
+    Args:
+        width (int, optional): The number of columns.
+        height (int, optional): The number of rows.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        numpy.ndarray: The uint8 FWI band.
+    """
+    rng = np.random.default_rng(seed)
+    # Coarse random field, upsampled with nearest neighbours, then smoothed by a few shifted sums
+    coarse = rng.integers(1, 256, size=(height // 20 + 1, width // 20 + 1)).astype(np.float64)
+    field = np.kron(coarse, np.ones((20, 20)))[:height, :width]
+    for axis in (0, 1):
+        field = (field + np.roll(field, 7, axis=axis) + np.roll(field, -7, axis=axis)) / 3
+    band = np.clip(field, 1, 255).astype(np.uint8)
+    # The sea covers the left and bottom borders and a disc
+    rows, cols = np.mgrid[:height, :width]
+    band[(cols < width // 8) | (rows > height * 7 // 8)] = 0
+    band[(rows - height // 3) ** 2 + (cols - width // 2) ** 2 < (min(width, height) // 10) ** 2] = 0
+    return band
+
+
+def make_fwi_tiff(band: np.ndarray, bbox: Tuple[float, float, float, float] = EFFIS_BBOX) -> bytes:
+    """
+    Encodes an FWI band as an EPSG:4326 GeoTIFF, like the EFFIS WMS responses.
+
+    Args:
+        band (numpy.ndarray): The uint8 FWI band.
+        bbox (tuple, optional): The (west, south, east, north) extent of the band.
+
+    Returns:
+        bytes: The GeoTIFF.
+    """
+    height, width = band.shape
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver="GTiff",
+            width=width,
+            height=height,
+            count=1,
+            dtype="uint8",
+            crs="EPSG:4326",
+            transform=from_bounds(*bbox, width, height),
+        ) as dst:
+            dst.write(band, 1)
+        return memfile.read()
+
+
+@contextmanager
+def serve(
+    handle: Callable[[str, str, Message, bytes], Tuple[int, Dict[str, str], bytes]], port: int = 0
+) -> Iterator[Tuple[str, ThreadingHTTPServer]]:
+    """
+    Runs a local HTTP server in a background thread.
+
+    Args:
+        handle (callable): Maps (method, path with query string, case-insensitive request headers, request body) to
+            (status, response headers, response body). HEAD responses only send the headers.
+        port (int, optional): The port to listen on, any free port if 0.
+
+    Yields:
+        (base_url, server): The URL of the server, e.g. "http://127.0.0.1:8000", and the server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, avoid the delayed ACK stall on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def _respond(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            status, headers, content = handle(self.command, self.path, self.headers, body)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(content)
+
+        do_GET = do_PUT = do_HEAD = do_DELETE = do_POST = _respond
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class StubS3Server:
+    """
+    In-memory stand-in of an S3 endpoint, for the object calls of `S3Bucket` (path-style PUT, GET with Range, HEAD,
+    DELETE), so that the real boto3 client code runs without any network or credentials.
+
+    Example:
+        >>> with StubS3Server().run() as endpoint_url:
+                s3 = S3Bucket("pyro-risk", endpoint_url, "us-east-1", "key", "secret")
+    """
+
+    def __init__(self) -> None:
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, headers: Message, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        parts = unquote(urlsplit(path).path).lstrip("/").split("/", 1)
+        if len(parts) < 2 or not parts[1]:
+            # Bucket level calls (e.g. creating the bucket) are accepted and ignored
+            return 200, {}, b""
+        key = (parts[0], parts[1])
+        if method == "PUT":
+            metadata = {
+                name: value
+                for name, value in headers.items()
+                if name.lower() in {"content-type", "content-encoding"} or name.lower().startswith("x-amz-meta-")
+            }
+            with self._lock:
+                self.objects[key] = (body, metadata)
+            return 200, {"ETag": '"stub"'}, b""
+        if method == "DELETE":
+            with self._lock:
+                self.objects.pop(key, None)
+            return 204, {}, b""
+        with self._lock:
+            stored = self.objects.get(key)
+        if stored is None:
+            error = b"<Error><Code>NoSuchKey</Code><Message>Not found</Message></Error>"
+            return 404, {"Content-Type": "application/xml"}, error
+        content, metadata = stored
+        response_headers = {**metadata, "ETag": '"stub"', "Last-Modified": formatdate(usegmt=True)}
+        byte_range = headers.get("Range")
+        if method == "GET" and byte_range:
+            start_str, end_str = byte_range.removeprefix("bytes=").split("-")
+            start, end = int(start_str), min(int(end_str or len(content) - 1), len(content) - 1)
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            return 206, response_headers, content[start : end + 1]
+        return 200, response_headers, content
+
+    @contextmanager
+    def run(self, port: int = 0) -> Iterator[str]:
+        """Serves the stub in a background thread, yielding its endpoint URL."""
+        with serve(self.handle, port=port) as (endpoint_url, _):
+            yield endpoint_url
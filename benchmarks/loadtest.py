@@ -0,0 +1,366 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from email.message import Message
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+import geopandas as gpd
+import numpy as np
+from rasterio.transform import from_bounds
+from shapely.geometry import box
+
+from benchmarks.fixtures import EFFIS_BBOX, StubS3Server, make_fwi_band, make_fwi_tiff, serve
+from pyrorisks.utils.fwi_raster import FWIRaster
+from pyrorisks.utils.fwi_regions import FWIRegions
+from pyrorisks.utils.s3 import S3Bucket
+
+# Each request kind: (method, path, body) built from a random generator
+Request = Tuple[str, str, Optional[bytes]]
+
+WARM_DATES = ["2024-07-01", "2024-07-02", "2024-07-03"]
+COLD_START = datetime.date(2023, 1, 1)
+COUNTRY = "FR"
+
+
+class FakeEFFIS:
+    """
+    Local stand-in of the EFFIS WMS server, answering GetMap requests with a synthetic FWI GeoTIFF per date.
+
+    Args:
+        latency (float, optional): A delay added to every response, in seconds, to mimic the real server.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests = 0
+        self._tiffs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def tiff(self, date: str) -> bytes:
+        with self._lock:
+            if date not in self._tiffs:
+                # A different, but reproducible, map per date
+                seed = datetime.date.fromisoformat(date).toordinal() % 16
+                self._tiffs[date] = make_fwi_tiff(make_fwi_band(seed=seed))
+            return self._tiffs[date]
+
+    def handle(self, method: str, path: str, headers: Message, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests += 1
+        dates = parse_qs(urlsplit(path).query).get("TIME")
+        if not dates:
+            return 400, {}, b"Missing TIME parameter"
+        time.sleep(self.latency)
+        return 200, {"Content-Type": "image/tiff"}, self.tiff(dates[0])
+
+
+def seed_regions(s3: S3Bucket, dates: List[str]) -> None:
+    """Stores the per-region FWI statistics read by the risk route, for a grid of 6 x 4 synthetic regions."""
+    west, south, east, north = EFFIS_BBOX
+    lons, lats = np.linspace(west, east, 7), np.linspace(south, north, 5)
+    regions = gpd.GeoDataFrame(
+        {"code": [f"{row}{col}" for row in range(4) for col in range(6)]},
+        geometry=[box(lons[col], lats[row], lons[col + 1], lats[row + 1]) for row in range(4) for col in range(6)],
+        crs="EPSG:4326",
+    )
+    band = make_fwi_band()
+    fwi_raster = FWIRaster(band, from_bounds(*EFFIS_BBOX, band.shape[1], band.shape[0]), "EPSG:4326")
+    aggregates = FWIRegions(regions).aggregate(fwi_raster)
+    for date in dates:
+        year, month, day = date.split("-")
+        s3.write_json_to_s3(
+            {"country": COUNTRY, "date": date, "regions": aggregates},
+            f"fwi/year={year}/month={month}/day={day}/fwi_regions.json",
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_api(env: Dict[str, str], workers: int, timeout: float = 60) -> Iterator[Tuple[str, int]]:
+    """
+    Starts `app.main:app` with uvicorn in a subprocess, and waits until it answers.
+
+    Args:
+        env (dict): The environment variables configuring the API.
+        workers (int): The number of uvicorn worker processes.
+        timeout (float, optional): The maximum startup time, in seconds.
+
+    Yields:
+        (host, port): The address of the API.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)]
+        + ["--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise click.ClickException("The API exited during startup")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/openapi.json")
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise click.ClickException(f"The API did not start within {timeout}s")
+            time.sleep(0.2)
+        yield "127.0.0.1", port
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def request_kinds(batch_size: int, cold_dates: int) -> Dict[str, Callable[[random.Random], Request]]:
+    """
+    Builds the request kinds of the mix.
+
+    Warm kinds query the dates loaded during the warm up. Cold kinds query a new date on every request, so that
+    the API has to download the FWI map from EFFIS (`batch_cold`) or the regional statistics from S3 (`risk_cold`).
+
+    Args:
+        batch_size (int): The number of points of the batch requests.
+        cold_dates (int): The number of dates with regional statistics on S3, cycled through by `risk_cold`.
+
+    Returns:
+        dict: The function building a request of each kind, by name.
+    """
+    west, south, east, north = EFFIS_BBOX
+    counters = {"batch_cold": itertools.count(), "risk_cold": itertools.count()}
+    lock = threading.Lock()
+
+    def cold_date(kind: str, cycle: Optional[int] = None) -> str:
+        with lock:
+            day = next(counters[kind])
+        return (COLD_START + datetime.timedelta(days=day if cycle is None else day % cycle)).isoformat()
+
+    # Points are drawn over land only, where the API has an FWI category: the sea answers 404 to point requests
+    band = make_fwi_band()
+    land = np.argwhere(band != 0)
+    height, width = band.shape
+    xres, yres = (east - west) / width, (north - south) / height
+
+    def land_point(rng: random.Random) -> Tuple[float, float]:
+        row, col = land[rng.randrange(len(land))]
+        # Away from the pixel edges, so that rounding keeps the point in its pixel
+        return west + (col + rng.uniform(0.1, 0.9)) * xres, north - (row + rng.uniform(0.1, 0.9)) * yres
+
+    def point(rng: random.Random) -> Request:
+        longitude, latitude = land_point(rng)
+        return "GET", f"/fwi/?longitude={longitude:.5f}&latitude={latitude:.5f}", None
+
+    def batch_body(rng: random.Random, date: str) -> bytes:
+        points = [list(land_point(rng)) for _ in range(batch_size)]
+        return json.dumps({"points": points, "date": date}).encode()
+
+    return {
+        "point": point,
+        "batch": lambda rng: ("POST", "/fwi/batch", batch_body(rng, rng.choice(WARM_DATES))),
+        "batch_cold": lambda rng: ("POST", "/fwi/batch", batch_body(rng, cold_date("batch_cold"))),
+        "risk": lambda rng: ("GET", f"/risk/{COUNTRY}/{rng.choice(WARM_DATES)}", None),
+        # The in-memory risk index keeps fewer dates than stored, so cycling through them stays cold
+        "risk_cold": lambda rng: ("GET", f"/risk/{COUNTRY}/{cold_date('risk_cold', cold_dates)}", None),
+    }
+
+
+def send(connection: http.client.HTTPConnection, request: Request) -> int:
+    method, path, body = request
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def run_stage(
+    address: Tuple[str, int],
+    kinds: Dict[str, Callable[[random.Random], Request]],
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> Tuple[Dict[str, List[Tuple[int, float]]], float]:
+    """
+    Sends requests from `concurrency` clients for `duration` seconds, each client waiting for its response
+    before sending the next request over its keep-alive connection.
+
+    Returns:
+        (samples, elapsed): The (status, latency in seconds) of every request, by kind, and the stage duration.
+    """
+    names, weights = list(mix), list(mix.values())
+    samples: Dict[str, List[Tuple[int, float]]] = {name: [] for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(idx: int) -> None:
+        rng = random.Random(seed * 1000 + idx)
+        connection = http.client.HTTPConnection(*address, timeout=60)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            request = kinds[name](rng)
+            start = time.perf_counter()
+            try:
+                status = send(connection, request)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(*address, timeout=60)
+                status = 0
+            latency = time.perf_counter() - start
+            with lock:
+                samples[name].append((status, latency))
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(idx,)) for idx in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples: List[Tuple[int, float]], elapsed: float) -> Dict[str, Any]:
+    latencies = np.array([latency for _, latency in samples]) * 1e3
+    errors = sum(1 for status, _ in samples if not 200 <= status < 400)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(samples) else (np.nan,) * 3
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": len(samples) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def parse_mix(mix: str, kinds: Dict[str, Any]) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in kinds:
+            raise click.BadParameter(f"Unknown request kind {name}, expected one of {', '.join(kinds)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+@click.command()
+@click.option("--mix", default="point=6,batch=2,batch_cold=1,risk=1", show_default=True, help="Weighted request kinds")
+@click.option("--concurrency", default="1,4,16", show_default=True, help="Concurrent clients of each ramp stage")
+@click.option("--duration", type=float, default=10, show_default=True, help="Duration of each stage, in seconds")
+@click.option("--batch-size", type=int, default=100, show_default=True, help="Number of points of batch requests")
+@click.option("--workers", type=int, default=1, show_default=True, help="Number of uvicorn worker processes")
+@click.option("--effis-latency", type=float, default=0.0, show_default=True, help="Delay of the fake EFFIS, in s")
+@click.option("--cold-dates", type=int, default=100, show_default=True, help="Dates stored for the risk_cold kind")
+@click.option("--s3-endpoint-url", default=None, help="S3 endpoint, e.g. localstack's. Defaults to an in-memory stub")
+@click.option("--s3-bucket", default="pyro-risk", show_default=True)
+@click.option("--output", type=click.Path(), default=None, help="Path of the JSON report")
+def main(
+    mix: str,
+    concurrency: str,
+    duration: float,
+    batch_size: int,
+    workers: int,
+    effis_latency: float,
+    cold_dates: int,
+    s3_endpoint_url: Optional[str],
+    s3_bucket: str,
+    output: Optional[str],
+) -> None:
+    """
+    Load tests the API, started against a local fake EFFIS WMS server and a local S3 stand-in.
+
+    Runs one stage per concurrency level and reports the throughput and latency percentiles of each request kind.
+    """
+    kinds = request_kinds(batch_size, cold_dates)
+    weights = parse_mix(mix, kinds)
+    stages = [int(level) for level in concurrency.split(",")]
+
+    with ExitStack() as stack:
+        effis = FakeEFFIS(latency=effis_latency)
+        effis_url, _ = stack.enter_context(serve(effis.handle))
+        if s3_endpoint_url is None:
+            s3_endpoint_url = stack.enter_context(StubS3Server().run())
+        s3 = S3Bucket(s3_bucket, s3_endpoint_url, "us-east-1", "test", "test")
+        click.echo("Storing the regional FWI statistics...")
+        seed_regions(
+            s3, WARM_DATES + [(COLD_START + datetime.timedelta(days=day)).isoformat() for day in range(cold_dates)]
+        )
+
+        env = {
+            "EFFIS_URL": effis_url,
+            "S3_BUCKET_NAME": s3_bucket,
+            "S3_ENDPOINT_URL": s3_endpoint_url,
+            "S3_REGION": "us-east-1",
+            "S3_ACCESS_KEY": "test",
+            "S3_SECRET_KEY": "test",
+            "FWI_PREWARM_ENABLED": "false",
+        }
+        address = stack.enter_context(run_api(env, workers))
+        click.echo(f"API started on http://{address[0]}:{address[1]} with {workers} worker(s)")
+
+        # Warm up: every worker process has its own caches, so each warm request is sent a few times
+        connection = http.client.HTTPConnection(*address, timeout=120)
+        rng = random.Random(0)
+        for _ in range(4 * workers):
+            send(connection, kinds["point"](rng))
+            for date in WARM_DATES:
+                send(connection, ("POST", "/fwi/batch", json.dumps({"points": [[2.0, 47.0]], "date": date}).encode()))
+                send(connection, ("GET", f"/risk/{COUNTRY}/{date}", None))
+        connection.close()
+
+        report: Dict[str, Any] = {"mix": weights, "batch_size": batch_size, "workers": workers, "stages": []}
+        for level in stages:
+            upstream_before = effis.requests
+            samples, elapsed = run_stage(address, kinds, weights, level, duration, seed=level)
+            stage = {
+                "concurrency": level,
+                "seconds": elapsed,
+                "effis_requests": effis.requests - upstream_before,
+                "total": summarize([sample for kind in samples.values() for sample in kind], elapsed),
+                "kinds": {name: summarize(kind_samples, elapsed) for name, kind_samples in samples.items()},
+            }
+            report["stages"].append(stage)
+
+            click.echo(f"\nConcurrency {level} ({elapsed:.1f}s, {stage['effis_requests']} EFFIS downloads)")
+            click.echo(
+                f"{'kind':<12}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            )
+            for name, summary in [*stage["kinds"].items(), ("total", stage["total"])]:
+                click.echo(
+                    f"{name:<12}{summary['requests']:>10}{summary['errors']:>8}{summary['throughput_rps']:>10.1f}"
+                    f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}"
+                )
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"\nReport saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+import numpy as np
+
+from benchmarks.fixtures import EFFIS_BBOX, StubS3Server, make_fwi_band, make_fwi_tiff, serve
+from pyrorisks.platform_fwi.get_fwi_effis_score import EFFIS_FWI_LAYER, get_fwi, get_score
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_polygons import FWIPolygons
+from pyrorisks.utils.s3 import S3Bucket
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DATE = "2024-07-01"
+
+Benchmark = Tuple[Callable[[], Any], int]
+
+_REFERENCE_VALUES = np.random.default_rng(0).random(100_000)
+
+
+def reference_workload() -> None:
+    """A fixed mix of numpy and pure Python work, timed along every benchmark to normalize its durations."""
+    np.sort(_REFERENCE_VALUES)
+    json.dumps([{"value": float(value)} for value in _REFERENCE_VALUES[:5_000]])
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Times a function and measures its peak Python memory allocation.
+
+    Like `timeit`, the garbage collector is paused during the timed calls. Each call is preceded by a call of the
+    `reference_workload`, so that its duration can be expressed relative to the speed of the machine at that
+    moment (CPU model, frequency scaling, other load). The peak memory is measured on a separate call, as tracing
+    allocations slows the timed calls down.
+
+    Args:
+        func (callable): The function to benchmark, without arguments.
+        repeat (int): The number of timed calls, after one warm up call.
+
+    Returns:
+        dict: The median and min duration of a call, in seconds, its median duration relative to the reference
+            workload timed just before, and the peak memory of a call, in MiB.
+    """
+    func()
+    reference_workload()
+    durations, reference_durations = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            reference_durations.append(_timed(reference_workload))
+            durations.append(_timed(func))
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "relative": statistics.median(
+            duration / reference for duration, reference in zip(durations, reference_durations)
+        ),
+        "peak_mib": peak / 1024**2,
+    }
+
+
+def build_benchmarks(stack: ExitStack, scale: float) -> Dict[str, Benchmark]:
+    """
+    Builds the synthetic fixtures, starts the local servers and returns the benchmarks with their repeat count.
+
+    Args:
+        stack (contextlib.ExitStack): Closes the local servers once the benchmarks are done.
+        scale (float): The size of the FWI band, relative to the EFFIS one (1600 x 1200).
+
+    Returns:
+        dict: The benchmarked functions and their number of timed calls, by name.
+    """
+    band = make_fwi_band(width=int(1600 * scale), height=int(1200 * scale))
+    tiff = make_fwi_tiff(band)
+    tiff_url, _ = stack.enter_context(serve(lambda method, path, headers, body: (200, {}, tiff)))
+
+    helpers = FWIHelpers()
+    fwi_raster = helpers.get_fwi_raster(tiff_url)
+    if fwi_raster is None:
+        raise click.ClickException("Could not decode the synthetic GeoTIFF")
+    gdf = helpers.fwi_polygonize(fwi_raster, categorize=True)
+    land_gdf = helpers.fwi_sea_remover(gdf)
+    geojson = helpers.fwi_geojson_maker(land_gdf)
+    fwi_polygons = FWIPolygons.from_features(geojson["features"])
+
+    endpoint_url = stack.enter_context(StubS3Server().run())
+    s3 = S3Bucket("pyro-risk", endpoint_url, "us-east-1", "key", "secret")
+    s3.write_json_to_s3(geojson, "fwi/fwi_values.json")
+    s3.write_json_to_s3(geojson, "fwi/fwi_values.json.gz", compression="gzip")
+
+    rng = np.random.default_rng(0)
+    west, south, east, north = EFFIS_BBOX
+    points = np.column_stack([rng.uniform(west, east, 1000), rng.uniform(south, north, 1000)])
+    pixel_values = band.ravel()[rng.integers(0, band.size, 10_000)]
+
+    raster_cache = LRUCache()
+    raster_cache.put((EFFIS_FWI_LAYER, DATE), fwi_raster)
+    polygons_cache = LRUCache()
+    polygons_cache.put(("fwi_polygons", DATE), fwi_polygons)
+
+    return {
+        "fwi_helpers.get_fwi": (lambda: helpers.get_fwi(tiff_url, categorize=True), 10),
+        "fwi_helpers.fwi_polygonize_land": (
+            lambda: helpers.fwi_polygonize(fwi_raster, categorize=True, land_only=True),
+            5,
+        ),
+        "fwi_helpers.fwi_simplify": (lambda: helpers.fwi_simplify(land_gdf, min(fwi_raster.resolution)), 5),
+        "fwi_helpers.fwi_category_x10000": (lambda: [helpers.fwi_category(value) for value in pixel_values], 20),
+        "fwi_helpers.fwi_sea_remover": (lambda: helpers.fwi_sea_remover(gdf), 20),
+        "fwi_helpers.fwi_geojson_maker": (lambda: helpers.fwi_geojson_maker(land_gdf), 5),
+        "s3.write_json_to_s3": (lambda: s3.write_json_to_s3(geojson, "fwi/fwi_values_copy.json"), 5),
+        "s3.read_json_from_s3": (lambda: s3.read_json_from_s3("fwi/fwi_values.json"), 5),
+        "s3.write_json_to_s3_gzip": (
+            lambda: s3.write_json_to_s3(geojson, "fwi/fwi_values_copy.json.gz", compression="gzip"),
+            5,
+        ),
+        "s3.read_json_from_s3_gzip": (lambda: s3.read_json_from_s3("fwi/fwi_values.json.gz"), 5),
+        "get_fwi.point_lookup_x1000": (
+            lambda: [get_fwi(lon, lat, date=DATE, cache=raster_cache) for lon, lat in points],
+            10,
+        ),
+        "get_score.point_lookup_x1000": (
+            lambda: [get_score(lat, lon, date=DATE, cache=polygons_cache) for lon, lat in points],
+            10,
+        ),
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], threshold: float
+) -> List[str]:
+    """
+    Lists the benchmarks slower, or using more memory, than their baseline by more than `threshold`.
+
+    Durations are compared relative to the reference workload timed along them, so that baselines recorded on
+    another machine, or while the machine was busier, stay comparable. Baselines without relative durations are
+    compared on the fastest call.
+
+    Args:
+        results (dict): The measures of this run, by benchmark name.
+        baselines (dict): The stored measures, by benchmark name.
+        threshold (float): The tolerated relative increase, e.g. 0.25 for 25%.
+
+    Returns:
+        list: A description of each regression.
+    """
+    regressions = []
+    for name, measures in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        # Otherwise the fastest call is the least sensitive to the noise of the machine
+        for metric in ("relative" if "relative" in baseline else "min_s", "peak_mib"):
+            # Tiny peaks are dominated by allocator noise
+            if metric == "peak_mib" and baseline[metric] < 1:
+                continue
+            if measures[metric] > baseline[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {measures[metric]:.4g} vs baseline {baseline[metric]:.4g} "
+                    f"(+{measures[metric] / baseline[metric] - 1:.0%})"
+                )
+    return regressions
+
+
+@click.command()
+@click.option("--filter", "name_filter", type=str, default=None, help="Only run the benchmarks containing this text")
+@click.option("--scale", type=float, default=1.0, show_default=True, help="FWI band size, relative to EFFIS")
+@click.option("--threshold", type=float, default=0.5, show_default=True, help="Tolerated relative regression")
+@click.option("--baselines", "baselines_path", type=click.Path(), default=BASELINES_PATH, show_default=True)
+@click.option("--save-baselines", is_flag=True, default=False, help="Store this run as the new baselines")
+def main(name_filter: Optional[str], scale: float, threshold: float, baselines_path: str, save_baselines: bool) -> None:
+    """
+    Runs the microbenchmarks of the FWI pipeline hot paths, offline, on synthetic fixtures.
+
+    Exits with an error if a benchmark regressed beyond the threshold compared to the stored baselines. Durations
+    are compared relative to a reference workload, which absorbs most of the differences between machines, but
+    baselines are best regenerated on the machine running the comparison.
+    """
+    results = {}
+    with ExitStack() as stack:
+        for name, (func, repeat) in build_benchmarks(stack, scale).items():
+            if name_filter is not None and name_filter not in name:
+                continue
+            results[name] = measure(func, repeat)
+            click.echo(
+                f"{name:<34} median {results[name]['median_s'] * 1e3:10.3f} ms"
+                f"  min {results[name]['min_s'] * 1e3:10.3f} ms  relative {results[name]['relative']:8.3f}"
+                f"  peak {results[name]['peak_mib']:8.2f} MiB"
+            )
+
+    if save_baselines:
+        # A filtered run only updates the baselines of the benchmarks it ran
+        if name_filter is not None and os.path.exists(baselines_path):
+            with open(baselines_path) as f:
+                results = {**json.load(f)["results"], **results}
+        with open(baselines_path, "w") as f:
+            json.dump({"machine": platform.platform(), "scale": scale, "results": results}, f, indent=2)
+        click.echo(f"Baselines saved to {baselines_path}")
+        return
+
+    if not os.path.exists(baselines_path):
+        click.echo("No baselines to compare to, run with --save-baselines to store them")
+        return
+    with open(baselines_path) as f:
+        baselines = json.load(f)
+    if baselines.get("scale") != scale:
+        raise click.ClickException(f"The baselines were recorded with --scale {baselines.get('scale')}")
+    regressions = compare(results, baselines["results"], threshold)
+    if regressions:
+        raise click.ClickException("Regressions beyond {:.0%}:\n".format(threshold) + "\n".join(regressions))
+    click.echo(f"No regression beyond {threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
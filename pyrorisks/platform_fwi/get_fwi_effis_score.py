@@ -1,76 +1,295 @@
-from dotenv import load_dotenv
 import os
 import datetime
-import geopandas as gpd
-from shapely.geometry import Point, Polygon
+import numpy as np
 from pyrorisks.utils.s3 import S3Bucket
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_catalog import fwi_partition
+from pyrorisks.utils.fwi_cube import FWICube
 from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_polygons import FWIPolygons
+from pyrorisks.utils.fwi_raster import FWIGridReader, FWIRaster
 
-__all__ = ["get_score"]
+__all__ = [
+    "get_score",
+    "get_scores",
+    "get_grid_score",
+    "load_fwi_polygons",
+    "get_fwi",
+    "get_fwi_from_raster",
+    "get_fwi_batch",
+    "get_fwi_batch_from_raster",
+    "get_fwi_series",
+    "load_fwi_raster",
+    "effis_fwi_url",
+]
 
-
-def point_fwi_category(row, point_coords):
-    if row["geometry"].contains(point_coords):
-        return row["fwi_category"]
-    else:
-        return None
+EFFIS_FWI_LAYER = "ecmwf007.fwi"
+# Overridden by the EFFIS_URL environment variable, e.g. to point to a local WMS server
+EFFIS_URL = "https://ies-ows.jrc.ec.europa.eu/effis"
 
 
-def get_score(lat, lon):
-    point_coords = Point(lon, lat)
+def effis_fwi_url(date: str, layer: str = EFFIS_FWI_LAYER) -> str:
+    """
+    Builds the EFFIS WMS URL of the FWI GeoTIFF of a date, over metropolitan France.
 
-    load_dotenv()
+    Args:
+        date (str): The date of the FWI map, in %Y-%m-%d format.
+        layer (str, optional): The EFFIS WMS layer to retrieve.
 
-    s3 = S3Bucket(
-        bucket_name=os.environ["BUCKET_NAME"],
-        endpoint_url=os.environ["ENDPOINT_URL"],
-        region_name=os.environ["REGION_NAME"],
-        aws_access_key_id=os.environ["AWS_ACCESS_KEY"],
-        aws_secret_key=os.environ["AWS_SECRET_KEY"],
+    Returns:
+        str: The URL of the GeoTIFF.
+    """
+    return (
+        f"{os.environ.get('EFFIS_URL', EFFIS_URL)}?LAYERS={layer}&FORMAT=image/tiff&TRANSPARENT=true&SINGLETILE=false"
+        "&SERVICE=wms&VERSION=1.1.1&REQUEST=GetMap&STYLES=&SRS=EPSG:4326&BBOX=-6.0,41.0,10.0,52.0&WIDTH=1600"
+        f"&HEIGHT=1200&TIME={date}"
     )
 
-    retrieved_date = datetime.date.today().strftime("%Y-%m-%d")
-    year, month, day = retrieved_date.split("-")
 
-    json_content = s3.read_json_from_s3(
-        object_key=f"fwi/year={year}/month={month}/day={day}/fwi_values.json",
-    )
+def _get_s3_bucket() -> S3Bucket:
+    # Imported here: the platform_fwi pipeline imports this module
+    from pyrorisks.platform_fwi.main import get_s3_bucket
+
+    return get_s3_bucket()
+
+
+def load_fwi_polygons(date: Optional[str] = None, cache: Optional[LRUCache] = None) -> FWIPolygons:
+    """
+    Loads the daily FWI polygons stored on S3 by the platform_fwi pipeline, with their spatial index.
+
+    Args:
+        date (str, optional): The date of the FWI polygons, in %Y-%m-%d format. Defaults to today.
+        cache (LRUCache, optional): The cache of indexed daily polygons, keyed by ("fwi_polygons", date).
+
+    Returns:
+        FWIPolygons: The indexed FWI polygons.
+    """
+    retrieved_date = datetime.date.today().strftime("%Y-%m-%d") if date is None else date
+
+    def _load() -> FWIPolygons:
+        s3 = _get_s3_bucket()
+        json_content = s3.read_json_from_s3(object_key=fwi_partition(retrieved_date) + "fwi_values.json")
+        return FWIPolygons.from_features(json_content["features"])
+
+    if cache is None:
+        return _load()
+    return cache.get_or_load(("fwi_polygons", retrieved_date), _load)
+
+
+def get_score(lat, lon, date: Optional[str] = None, cache: Optional[LRUCache] = None):
+    return load_fwi_polygons(date, cache=cache).category(lon, lat)
+
+
+def get_scores(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    date: Optional[str] = None,
+    cache: Optional[LRUCache] = None,
+) -> List[Optional[float]]:
+    """
+    Retrieves the FWI categories of many points from the daily FWI polygons stored on S3.
 
-    gdf = gpd.GeoDataFrame.from_features(json_content["features"])
+    Args:
+        latitudes (sequence of float): The latitudes of the points.
+        longitudes (sequence of float): The longitudes of the points, in the same order.
+        date (str, optional): The date of the FWI polygons, in %Y-%m-%d format. Defaults to today.
+        cache (LRUCache, optional): The cache of indexed daily polygons.
 
-    gdf["fwi_category_for_point"] = gdf.apply(lambda row: point_fwi_category(row, point_coords), axis=1)
-    point_fwi_score = gdf.dropna().iloc[0]["fwi_category"]
-    return point_fwi_score
+    Returns:
+        list: The FWI categories of the points, None for the points within no polygon.
+    """
+    fwi_categories = load_fwi_polygons(date, cache=cache).categories(np.asarray(longitudes), np.asarray(latitudes))
+    return [None if np.isnan(v) else v for v in fwi_categories.tolist()]
+
+
+def get_grid_score(lat: float, lon: float, date: Optional[str] = None) -> Optional[int]:
+    """
+    Retrieves the FWI category of a point from the daily FWI grid stored on S3, with ranged reads of a few bytes
+    instead of downloading the whole day.
+
+    Args:
+        lat (float): The latitude of the point.
+        lon (float): The longitude of the point.
+        date (str, optional): The date of the FWI grid, in %Y-%m-%d format. Defaults to today.
+
+    Returns:
+        int or None: The FWI category of the point, or None if it is on the sea or outside the EFFIS map.
+    """
+    retrieved_date = datetime.date.today().strftime("%Y-%m-%d") if date is None else date
+    object_key = fwi_partition(retrieved_date) + "fwi_values.bin"
+
+    s3 = _get_s3_bucket()
+    reader = FWIGridReader(lambda start, end: s3.read_bytes_from_s3(object_key, start, end))
+    fwi_pixel_value = reader.pixel_value(lon, lat)
+    if not fwi_pixel_value:  # outside the map, or on the sea
+        return None
+    return FWIHelpers().fwi_category(fwi_pixel_value)
+
+
+def load_fwi_raster(date: str, layer: str = EFFIS_FWI_LAYER, cache: Optional[LRUCache] = None) -> Optional[FWIRaster]:
+    """
+    Loads the EFFIS FWI raster of a given date, going through an in-process cache when one is provided.
+
+    With a cache, concurrent calls for the same (layer, date) share a single download.
+
+    Args:
+        date (str): The date of the FWI map, in %Y-%m-%d format.
+        layer (str, optional): The EFFIS WMS layer to retrieve.
+        cache (LRUCache, optional): The cache of decoded daily rasters, keyed by (layer, date).
+
+    Returns:
+        FWIRaster or None: The decoded FWI raster, or None if it could not be retrieved.
+    """
+    effis_tiff_file_url = effis_fwi_url(date, layer)
+    if cache is None:
+        return FWIHelpers().get_fwi_raster(effis_tiff_file_url)
+    # Failed downloads are not cached, so that the next request tries again
+    return cache.get_or_load((layer, date), lambda: FWIHelpers().get_fwi_raster(effis_tiff_file_url))
 
 
 def get_fwi(
-    longitude: float, latitude: float, crs: str = "EPSG:4326", date: Optional[str] = None
+    longitude: float,
+    latitude: float,
+    crs: str = "EPSG:4326",
+    date: Optional[str] = None,
+    cache: Optional[LRUCache] = None,
 ) -> Optional[Dict[str, Any]]:
     today_date_str_url = datetime.date.today().strftime("%Y-%m-%d") if date is None else date
-    effis_tiff_file_url = (
-        "https://ies-ows.jrc.ec.europa.eu/effis?LAYERS=ecmwf007.fwi&FORMAT=image/tiff&TRANSPARENT=true&SINGLETILE=false&SERVICE=wms&VERSION=1.1.1&REQUEST=GetMap&STYLES=&SRS=EPSG:4326&BBOX=-6.0,41.0,10.0,52.0&WIDTH=1600&HEIGHT=1200&TIME="
-        + today_date_str_url
-    )
-    fwi = FWIHelpers()
-    point = Point(longitude, latitude)
-    gdf_fwi = fwi.get_fwi(effis_tiff_file_url)
-
-    if gdf_fwi is not None:
-        gdf_fwi["fwi_category"] = gdf_fwi.apply(lambda row: fwi.fwi_category(row["fwi_pixel_value"]), axis=1)
-        gdf_fwi["fwi_category_for_point"] = gdf_fwi.apply(lambda row: point_fwi_category(row, point), axis=1)
-        gdf_fwi = gdf_fwi.drop("fwi_pixel_value", axis=1)
-        point_fwi_score = gdf_fwi.dropna().iloc[0]["fwi_category"]
-
-        results = {
-            "longitude": longitude,
-            "latitude": latitude,
-            "crs": crs,
-            "score": "fwi",
-            "value": float(point_fwi_score),
-            "date": today_date_str_url,
-        }
-
-    else:
-        results = None
+    fwi_raster = load_fwi_raster(today_date_str_url, cache=cache)
+    if fwi_raster is None:
+        return None
+    return get_fwi_from_raster(fwi_raster, longitude, latitude, crs, today_date_str_url)
+
+
+def get_fwi_from_raster(
+    fwi_raster: FWIRaster, longitude: float, latitude: float, crs: str, date: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves the FWI category of a point from an already loaded FWI raster.
+
+    Args:
+        fwi_raster (FWIRaster): The FWI raster of the date.
+        longitude (float): The longitude of the point.
+        latitude (float): The latitude of the point.
+        crs (str): The Coordinate Reference System (CRS) of the point.
+        date (str): The date of the FWI raster, in %Y-%m-%d format.
+
+    Returns:
+        dict or None: The FWI category of the point, or None if the point is on the sea or outside the EFFIS map.
+    """
+    fwi_pixel_value = fwi_raster.pixel_value(longitude, latitude)
+    if not fwi_pixel_value:  # outside the map, or on the sea, where EFFIS has no data
+        return None
+
+    point_fwi_score = FWIHelpers().fwi_category(fwi_pixel_value)
+    results = {
+        "longitude": longitude,
+        "latitude": latitude,
+        "crs": crs,
+        "score": "fwi",
+        "value": float(point_fwi_score),
+        "date": date,
+    }
     return results
+
+
+def get_fwi_batch(
+    longitudes: Sequence[float],
+    latitudes: Sequence[float],
+    crs: str = "EPSG:4326",
+    date: Optional[str] = None,
+    cache: Optional[LRUCache] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves the FWI categories of many points at once, from a single raster for the date.
+
+    Args:
+        longitudes (sequence of float): The longitudes of the points.
+        latitudes (sequence of float): The latitudes of the points, in the same order.
+        crs (str, optional): The Coordinate Reference System (CRS) of the points.
+        date (str, optional): The date of the FWI map, in %Y-%m-%d format. Defaults to today.
+        cache (LRUCache, optional): The cache of decoded daily rasters.
+
+    Returns:
+        dict or None: The FWI categories of the points, in input order, with None for the points on the sea or
+            outside the EFFIS map. None if the FWI map could not be retrieved.
+    """
+    today_date_str_url = datetime.date.today().strftime("%Y-%m-%d") if date is None else date
+    fwi_raster = load_fwi_raster(today_date_str_url, cache=cache)
+    if fwi_raster is None:
+        return None
+    return get_fwi_batch_from_raster(fwi_raster, longitudes, latitudes, crs, today_date_str_url)
+
+
+def get_fwi_batch_from_raster(
+    fwi_raster: FWIRaster, longitudes: Sequence[float], latitudes: Sequence[float], crs: str, date: str
+) -> Dict[str, Any]:
+    """
+    Retrieves the FWI categories of many points at once from an already loaded FWI raster.
+
+    Args:
+        fwi_raster (FWIRaster): The FWI raster of the date.
+        longitudes (sequence of float): The longitudes of the points.
+        latitudes (sequence of float): The latitudes of the points, in the same order.
+        crs (str): The Coordinate Reference System (CRS) of the points.
+        date (str): The date of the FWI raster, in %Y-%m-%d format.
+
+    Returns:
+        dict: The FWI categories of the points, in input order, with None for the points on the sea or outside the
+            EFFIS map.
+    """
+    fwi_pixel_values, inside = fwi_raster.pixel_values(np.asarray(longitudes), np.asarray(latitudes))
+    # EFFIS has no data over the sea
+    on_land = inside & (fwi_pixel_values != 0)
+    point_fwi_scores = np.where(on_land, FWIHelpers().fwi_category_lut()[np.clip(fwi_pixel_values, 0, 255)], np.nan)
+
+    results = {
+        "crs": crs,
+        "score": "fwi",
+        "date": date,
+        "values": [None if np.isnan(v) else v for v in point_fwi_scores.tolist()],
+    }
+    return results
+
+
+def get_fwi_series(
+    cube: FWICube,
+    longitude: float,
+    latitude: float,
+    start_date: str,
+    end_date: Optional[str] = None,
+    crs: str = "EPSG:4326",
+) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves the FWI categories of a point over a range of dates, from the stacked daily FWI grids of a cube.
+
+    Args:
+        cube (FWICube): The FWI cube maintained by the platform_fwi pipeline.
+        longitude (float): The longitude of the point.
+        latitude (float): The latitude of the point.
+        start_date (str): The first date of the range (included), in %Y-%m-%d format.
+        end_date (str, optional): The last date of the range (included), in %Y-%m-%d format. Defaults to the
+            latest date of the cube.
+        crs (str, optional): The Coordinate Reference System (CRS) of the point.
+
+    Returns:
+        dict or None: The dates of the range stored in the cube and the FWI categories of the point at these
+            dates, None on the sea. None if the point is outside the EFFIS map.
+    """
+    series = cube.series(longitude, latitude, start_date, end_date)
+    if series is None:
+        return None
+    dates, fwi_pixel_values = series
+    # EFFIS has no data over the sea
+    point_fwi_scores = np.where(
+        fwi_pixel_values != 0, FWIHelpers().fwi_category_lut()[np.clip(fwi_pixel_values, 0, 255)], np.nan
+    )
+    return {
+        "longitude": longitude,
+        "latitude": latitude,
+        "crs": crs,
+        "score": "fwi",
+        "dates": dates,
+        "values": [None if np.isnan(v) else v for v in point_fwi_scores.tolist()],
+    }
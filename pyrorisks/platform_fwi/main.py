@@ -1,47 +1,36 @@
 # Usual Imports
 import click
 import os
-from datetime import date
+import platform
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
 
 # Pyro Risks Imports
+from pyrorisks.platform_fwi.get_fwi_effis_score import effis_fwi_url
+from pyrorisks.utils.fwi_catalog import FWICatalog, fwi_partition
+from pyrorisks.utils.fwi_cube import FWICube
 from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_regions import FRANCE_DEPARTMENTS_URL, FWIRegions
+from pyrorisks.utils.profiler import StageProfiler, profile_stage
 from pyrorisks.utils.s3 import S3Bucket
 
-BASE_URL = "https://ies-ows.jrc.ec.europa.eu/effis"
+# Name of the daily output file of each format, in the fwi/year=/month=/day= partition
+OUTPUT_FILES = {"geojson": "fwi_values.json", "grid": "fwi_values.bin", "regions": "fwi_regions.json"}
+# Per-stage time and memory report of a date processed with --profile, stored in its partition
+PROFILE_FILE = "fwi_profile.json"
 
+# The EFFIS extent we retrieve covers metropolitan France
+COUNTRY = "FR"
 
-@click.command()
-@click.option(
-    "--retrieved-date",
-    type=str,
-    default=None,
-    help="Date to retrieve the FWI data from EFFIS. Format: YYYY-MM-DD.",
-)
-def main(retrieved_date):
-    # Get the FWI GeoJSON from EFFIS
-    if retrieved_date is None:
-        retrieved_date = date.today().strftime("%Y-%m-%d")
-
-    effis_tiff_file_url = (
-        f"{BASE_URL}?LAYERS=ecmwf007.fwi&FORMAT=image/tiff&TRANSPARENT=true&SINGLETILE=false&SERVICE=wms&VERSION=1.1.1&REQUEST=GetMap&STYLES=&SRS=EPSG:4326&BBOX=-6.0,41.0,10.0,52.0&WIDTH=1600&HEIGHT=1200&TIME="  # noqa: E501
-        + retrieved_date
-    )
-
-    # Download file from EFFIS and convert it to a geodf
-    fwi = FWIHelpers()
-    gdf_fwi = fwi.get_fwi(effis_tiff_file_url)
-    gdf_fwi = fwi.fwi_sea_remover(gdf_fwi)
-    gdf_fwi["fwi_category"] = gdf_fwi.apply(lambda row: fwi.fwi_category(row["fwi_pixel_value"]), axis=1)
-    gdf_fwi = gdf_fwi.drop("fwi_pixel_value", axis=1)
-
-    new_json_fwi = fwi.fwi_geojson_maker(gdf_fwi)
-
-    # Store the JSON data to S3
 
+def get_s3_bucket() -> S3Bucket:
     load_dotenv()
 
-    s3 = S3Bucket(
+    return S3Bucket(
         bucket_name=os.environ["BUCKET_NAME"],
         endpoint_url=os.environ["ENDPOINT_URL"],
         region_name=os.environ["REGION_NAME"],
@@ -49,11 +38,379 @@ def main(retrieved_date):
         aws_secret_key=os.environ["AWS_SECRET_KEY"],
     )
 
-    year, month, day = retrieved_date.split("-")
-    s3.write_json_to_s3(
-        object_key=f"fwi/year={year}/month={month}/day={day}/fwi_values.json",
-        json_data=new_json_fwi,
-    )
+
+@lru_cache(maxsize=1)
+def load_regions(regions_path: str) -> FWIRegions:
+    # Loaded once per process, and rasterized once per FWI grid
+    return FWIRegions.from_file(regions_path)
+
+
+def update_catalog(dates: Sequence[str]) -> None:
+    """
+    Records the files of some dates in the catalog manifest of the FWI partitions, see `FWICatalog`.
+
+    Only the driver process updates the catalog, once the dates are processed. Concurrent jobs, e.g. a backfill
+    and the daily run, retry on the catalog saved by the other, see `FWICatalog.update`.
+
+    Args:
+        dates (sequence of str): The processed dates. Format: YYYY-MM-DD.
+    """
+    FWICatalog.update(get_s3_bucket(), dates)
+
+
+def process_date(
+    retrieved_date: str,
+    output_format: Sequence[str],
+    skip_existing: bool = False,
+    regions_path: str = FRANCE_DEPARTMENTS_URL,
+    profile: bool = False,
+    simplify_tolerance: Optional[float] = None,
+    compression: Optional[str] = None,
+    cube_path: Optional[str] = None,
+) -> bool:
+    """
+    Retrieves the FWI data of a date from EFFIS and stores it on S3.
+
+    Every output file is written with a single PUT or a completed multipart upload, so a crash never leaves a
+    partial file behind, and a date is skipped only once all its outputs exist.
+
+    Args:
+        retrieved_date (str): Date to retrieve the FWI data from EFFIS. Format: YYYY-MM-DD.
+        output_format (sequence of str): Format(s) of the daily FWI output, see `OUTPUT_FILES`.
+        skip_existing (bool, optional): Whether to skip the date if all its outputs already exist on S3.
+        regions_path (str, optional): Path or URL of the boundaries of the regions aggregated in the `regions` output.
+        profile (bool, optional): Whether to record the time and memory of each stage, stored as `PROFILE_FILE` in
+            the partition of the date.
+        simplify_tolerance (float, optional): If set, the GeoJSON polygons are merged by category, simplified with
+            this tolerance, in pixels, and their coordinates quantized, see `FWIHelpers.fwi_simplify`.
+        compression (str, optional): The compression of the JSON outputs ("gzip" or "zstd"), which
+            `S3Bucket.read_json_from_s3` detects and decompresses. Uncompressed if None.
+        cube_path (str, optional): If set, the FWI grid is also written to the local FWI cube of this folder,
+            see `FWICube`. The date is only visible once the caller commits it to the cube.
+
+    Returns:
+        bool: False if the date was skipped, True otherwise.
+    """
+    s3 = get_s3_bucket()
+    partition = fwi_partition(retrieved_date)
+    if (
+        skip_existing
+        and all(s3.object_exists(partition + OUTPUT_FILES[fmt]) for fmt in output_format)
+        and (cube_path is None or retrieved_date in FWICube(cube_path).dates)
+    ):
+        return False
+
+    profiler = StageProfiler() if profile else None
+    with profiler if profiler is not None else nullcontext():
+        effis_tiff_file_url = effis_fwi_url(retrieved_date)
+
+        # Download file from EFFIS
+        fwi = FWIHelpers()
+        fwi_raster = fwi.get_fwi_raster(effis_tiff_file_url)
+        if fwi_raster is None:
+            raise RuntimeError(f"Could not retrieve the FWI data of {retrieved_date} from EFFIS.")
+
+        # Store the data to S3
+        if "geojson" in output_format:
+            # Convert the land to a geodf, the sea is masked out before polygonization
+            gdf_fwi = fwi.fwi_polygonize(fwi_raster, categorize=True, land_only=True)
+            if simplify_tolerance is not None:
+                gdf_fwi = fwi.fwi_simplify(gdf_fwi, min(fwi_raster.resolution), simplify_tolerance)
+
+            # Stream the GeoJSON to S3, without building the whole document in memory
+            with s3.open_multipart_writer(
+                object_key=partition + OUTPUT_FILES["geojson"],
+                compression=compression,
+                ContentType="application/geo+json",
+            ) as f:
+                fwi.fwi_geojson_writer(gdf_fwi, f)
+
+        if "grid" in output_format:
+            # Raw FWI pixel values, see `FWIRaster.to_bytes`
+            with profile_stage("grid_encoding"):
+                grid = fwi_raster.to_bytes()
+            with profile_stage("upload"):
+                s3.write_bytes_to_s3(object_key=partition + OUTPUT_FILES["grid"], data=grid)
+
+        if "regions" in output_format:
+            # Zonal statistics of each department, served by the risk route of the API
+            with profile_stage("regions_aggregation"):
+                regions = load_regions(regions_path).aggregate(fwi_raster)
+            with profile_stage("upload"):
+                s3.write_json_to_s3(
+                    object_key=partition + OUTPUT_FILES["regions"],
+                    json_data={"country": COUNTRY, "date": retrieved_date, "regions": regions},
+                    compression=compression,
+                )
+
+        if cube_path is not None:
+            with profile_stage("cube_write"):
+                FWICube(cube_path).write(retrieved_date, fwi_raster)
+
+    if profiler is not None:
+        report = profile_report(profiler, retrieved_date, output_format, fwi_raster.width, fwi_raster.height)
+        s3.write_json_to_s3(object_key=partition + PROFILE_FILE, json_data=report)
+        click.echo(format_profile(report))
+    return True
+
+
+def profile_report(
+    profiler: StageProfiler, retrieved_date: str, output_format: Sequence[str], width: int, height: int
+) -> Dict[str, Any]:
+    """Builds the profile report of a date, with the context needed to compare it to other runs."""
+    return {
+        "date": retrieved_date,
+        "output_format": list(output_format),
+        "raster": {"width": width, "height": height},
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        **profiler.report(),
+    }
+
+
+def format_profile(report: Dict[str, Any]) -> str:
+    """Formats a profile report as one line per stage, for the console."""
+    lines = [f"{report['date']}: profile of {', '.join(report['output_format'])}"]
+    for name, stats in [*report["stages"].items(), ("total", report["total"])]:
+        lines.append(
+            f"  {name:<20} wall {stats['wall_s']:8.3f} s  cpu {stats['cpu_s']:8.3f} s"
+            f"  peak {stats['peak_mib']:8.1f} MiB  max rss {stats['max_rss_mib']:8.1f} MiB"
+        )
+    return "\n".join(lines)
+
+
+def check_date(ctx: click.Context, param: click.Parameter, value: Optional[str]) -> Optional[str]:
+    """Validates a date option, in YYYY-MM-DD format."""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise click.BadParameter(f"{value!r} is not a date in YYYY-MM-DD format.")
+
+
+def date_range(start_date: str, end_date: str) -> List[str]:
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    return [(start + timedelta(days=n)).strftime("%Y-%m-%d") for n in range((end - start).days + 1)]
+
+
+def backfill(
+    start_date: str,
+    end_date: str,
+    output_format: Sequence[str],
+    workers: int,
+    skip_existing: bool = True,
+    regions_path: str = FRANCE_DEPARTMENTS_URL,
+    profile: bool = False,
+    simplify_tolerance: Optional[float] = None,
+    compression: Optional[str] = None,
+    cube_path: Optional[str] = None,
+) -> None:
+    """
+    Processes a range of dates in a process pool.
+
+    The dates already stored are skipped, so an interrupted backfill resumes where it stopped when run again.
+    The stored dates are then recorded in the catalog manifest, and the processed dates committed to the FWI cube.
+
+    Args:
+        start_date (str): First date of the range (included). Format: YYYY-MM-DD.
+        end_date (str): Last date of the range (included). Format: YYYY-MM-DD.
+        output_format (sequence of str): Format(s) of the daily FWI output, see `OUTPUT_FILES`.
+        workers (int): Maximum number of dates processed concurrently.
+        skip_existing (bool, optional): Whether to skip the dates whose outputs already exist on S3.
+        regions_path (str, optional): Path or URL of the boundaries of the regions aggregated in the `regions` output.
+        profile (bool, optional): Whether to store the per-stage time and memory report of each date.
+        simplify_tolerance (float, optional): If set, the tolerance of the simplified GeoJSON polygons, in pixels.
+        compression (str, optional): The compression of the JSON outputs ("gzip" or "zstd").
+        cube_path (str, optional): If set, the folder of the local FWI cube the FWI grids are appended to.
+    """
+    dates = date_range(start_date, end_date)
+    processed: List[str] = []
+    skipped: List[str] = []
+    failed: List[str] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                process_date,
+                d,
+                tuple(output_format),
+                skip_existing,
+                regions_path,
+                profile,
+                simplify_tolerance,
+                compression,
+                cube_path,
+            ): d
+            for d in dates
+        }
+        for future in as_completed(futures):
+            retrieved_date = futures[future]
+            try:
+                done = future.result()
+            except Exception as e:
+                failed.append(retrieved_date)
+                status = f"failed ({e})"
+            else:
+                (processed if done else skipped).append(retrieved_date)
+                status = "done" if done else "skipped"
+            click.echo(f"[{len(processed) + len(skipped) + len(failed)}/{len(dates)}] {retrieved_date}: {status}")
+
+    click.echo(f"{len(processed)} dates processed, {len(skipped)} skipped, {len(failed)} failed.")
+    if cube_path is not None and processed:
+        # The workers only write their dates, the driver is the single writer of the cube index
+        FWICube(cube_path).commit(processed)
+    if processed or skipped:
+        update_catalog(processed + skipped)
+    if failed:
+        raise click.ClickException(f"Failed dates: {', '.join(sorted(failed))}. Run the same command to retry them.")
+
+
+@click.command()
+@click.option(
+    "--retrieved-date",
+    type=str,
+    default=None,
+    callback=check_date,
+    help="Date to retrieve the FWI data from EFFIS. Format: YYYY-MM-DD.",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["geojson", "grid", "regions"]),
+    multiple=True,
+    default=["geojson"],
+    show_default=True,
+    help="Format(s) of the daily FWI output: GeoJSON polygons, a compact FWI grid for ranged reads, "
+    "and/or per-region FWI statistics.",
+)
+@click.option(
+    "--regions-path",
+    type=str,
+    default=FRANCE_DEPARTMENTS_URL,
+    show_default=True,
+    help="Path or URL of the region boundaries (with a `code` geocode property) for the `regions` output.",
+)
+@click.option(
+    "--start-date",
+    type=str,
+    default=None,
+    callback=check_date,
+    help="Backfill mode: first date to retrieve (included). Format: YYYY-MM-DD.",
+)
+@click.option(
+    "--end-date",
+    type=str,
+    default=None,
+    callback=check_date,
+    help="Backfill mode: last date to retrieve (included), default to today. Format: YYYY-MM-DD.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Backfill mode: maximum number of dates processed concurrently.",
+)
+@click.option(
+    "--overwrite",
+    is_flag=True,
+    default=False,
+    help="Backfill mode: process the dates already stored on S3 again instead of skipping them.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help=f"Record the wall time, CPU time and peak memory of each stage, stored as {PROFILE_FILE} next to the outputs.",
+)
+@click.option(
+    "--simplify-tolerance",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="GeoJSON output: merge the polygons of each FWI category, quantize their coordinates and simplify them "
+    "with this tolerance, in pixels (0 keeps every pixel in its category, 1 removes the pixel staircases). "
+    "Default to pixel polygons.",
+)
+@click.option(
+    "--compression",
+    type=click.Choice(["gzip", "zstd"]),
+    default=None,
+    help="Compression of the JSON outputs, stored as their Content-Encoding (zstd requires the zstd extra). "
+    "Readers detect it, uncompressed outputs are still read as is.",
+)
+@click.option(
+    "--cube-path",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Also append the FWI grids to the local FWI cube of this folder, which serves the point time series "
+    "of the API (FWI_CUBE_PATH).",
+)
+@click.option(
+    "--rebuild-catalog",
+    is_flag=True,
+    default=False,
+    help="Rebuild the catalog manifest of the dates from every partition stored on S3, then exit.",
+)
+def main(
+    retrieved_date,
+    output_format,
+    regions_path,
+    start_date,
+    end_date,
+    workers,
+    overwrite,
+    profile,
+    simplify_tolerance,
+    compression,
+    cube_path,
+    rebuild_catalog,
+):
+    if rebuild_catalog:
+        s3 = get_s3_bucket()
+        catalog = FWICatalog.rebuild(s3)
+        catalog.save(s3)
+        click.echo(f"Catalog rebuilt: {len(catalog.dates)} dates, latest {catalog.latest_date()}.")
+        return
+
+    if start_date is not None:
+        if retrieved_date is not None:
+            raise click.UsageError("--retrieved-date cannot be used with --start-date.")
+        end_date = date.today().strftime("%Y-%m-%d") if end_date is None else end_date
+        if end_date < start_date:
+            raise click.BadParameter(f"{end_date} is before the start date {start_date}.", param_hint="--end-date")
+        backfill(
+            start_date,
+            end_date,
+            output_format,
+            workers,
+            skip_existing=not overwrite,
+            regions_path=regions_path,
+            profile=profile,
+            simplify_tolerance=simplify_tolerance,
+            compression=compression,
+            cube_path=cube_path,
+        )
+        return
+
+    # Get the FWI data of a single date from EFFIS
+    if retrieved_date is None:
+        retrieved_date = date.today().strftime("%Y-%m-%d")
+
+    try:
+        process_date(
+            retrieved_date,
+            output_format,
+            regions_path=regions_path,
+            profile=profile,
+            simplify_tolerance=simplify_tolerance,
+            compression=compression,
+            cube_path=cube_path,
+        )
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if cube_path is not None:
+        FWICube(cube_path).commit([retrieved_date])
+    update_catalog([retrieved_date])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,228 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+__all__ = ["LRUCache"]
+
+
+def _default_sizeof(value: Any) -> int:
+    return int(getattr(value, "nbytes", 0))
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded in-process cache with LRU eviction, optional TTL and memory cap.
+
+    Example:
+        >>> from pyrorisks.utils.cache import LRUCache
+
+        >>> cache = LRUCache(max_entries=7, ttl=6 * 3600, max_bytes=256 * 1024**2)
+        >>> cache.put("2024-07-01", fwi_raster)
+        >>> cache.get("2024-07-01")
+        >>> cache.stats()
+
+        To load missing values once, even under concurrent requests for the same key, use:
+
+        >>> cache.get_or_load("2024-07-01", lambda: load_fwi_raster("2024-07-01"))
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 8,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = _default_sizeof,
+    ) -> None:
+        """
+        Initializes a new instance of the LRUCache class.
+
+        Args:
+            max_entries (int, optional): The maximum number of entries kept in the cache.
+            ttl (float, optional): The time to live of an entry, in seconds. Entries never expire if None.
+            max_bytes (int, optional): The maximum total size of the cached values, in bytes. Unbounded if None.
+            sizeof (callable, optional): Returns the size in bytes of a value. Defaults to its `nbytes` attribute.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: OrderedDict[Hashable, Tuple[Any, float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, float, int]]:
+        # Must be called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        # Must be called with the lock held
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retrieves a value from the cache and marks it as recently used.
+
+        Args:
+            key (hashable): The cache key.
+            default (any, optional): The value returned on a cache miss.
+
+        Returns:
+            The cached value, or `default` if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value in the cache, evicting the least recently used entries if needed.
+
+        Values bigger than `max_bytes` on their own are not cached.
+
+        Args:
+            key (hashable): The cache key.
+            value (any): The value to cache.
+        """
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Retrieves a value from the cache, loading it on a miss.
+
+        Concurrent callers missing the same key share a single in-flight load: the first one runs `loader`,
+        the others wait for its result (or exception). Loads returning None are not cached.
+
+        Args:
+            key (hashable): The cache key.
+            loader (callable): Loads the value of `key` when it is not cached.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                is_loader = False
+            else:
+                future = self._inflight[key] = Future()
+                is_loader = True
+
+        if not is_loader:
+            return future.result()
+
+        try:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        # The value is cached before the load is marked as done, so later callers hit the cache
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """
+        Reports how long ago a value was stored, without marking it as recently used nor counting a hit.
+
+        Args:
+            key (hashable): The cache key.
+
+        Returns:
+            float or None: The age of the entry in seconds, or None if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            return None if entry is None else time.monotonic() - entry[1]
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Removes a key from the cache, if present.
+
+        Args:
+            key (hashable): The cache key.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Reports the cache usage, to help sizing it.
+
+        Returns:
+            A dictionary with the hit/miss/eviction/coalesced counters, the hit ratio, the number of entries and their size.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
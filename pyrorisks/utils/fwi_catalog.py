@@ -0,0 +1,236 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from pyrorisks.utils.s3 import S3Bucket
+
+__all__ = ["FWICatalog", "fwi_partition", "partition_date", "CATALOG_KEY"]
+
+# The catalog manifest of the daily FWI partitions, next to them
+CATALOG_KEY = "fwi/catalog.json"
+CATALOG_FORMAT_VERSION = 1
+# Errors of a conditional PUT of the catalog, when another writer replaced it in the meantime
+_CONFLICTS = {"PreconditionFailed", "412", "ConditionalRequestConflict", "409"}
+
+_PARTITION = re.compile(r"year=(\d{4})/month=(\d{2})/day=(\d{2})/")
+
+
+def fwi_partition(retrieved_date: str) -> str:
+    """Maps a date, in %Y-%m-%d format, to the S3 key (path) of its partition, e.g. "fwi/year=2024/month=07/day=01/"."""
+    year, month, day = retrieved_date.split("-")
+    return f"fwi/year={year}/month={month}/day={day}/"
+
+
+def partition_date(partition: str) -> Optional[str]:
+    """Maps the S3 key (path) of a partition, or of a file in it, to its date in %Y-%m-%d format."""
+    match = _PARTITION.search(partition)
+    return None if match is None else "-".join(match.groups())
+
+
+class FWICatalog:
+    """
+    The manifest of the daily FWI partitions stored on S3: the available dates, with the size and checksum (ETag)
+    of each of their files.
+
+    The catalog is a single small JSON object, so that readers find the latest date, or check whether a date
+    exists, with one GET instead of listing the bucket. It is only written by the ingestion job, once its
+    dates are processed, and replaced with a single PUT, so readers never see a partial catalog. The PUT is
+    conditional on the ETag of the loaded catalog, so that concurrent jobs retry on the catalog saved by the
+    others, see `update`, instead of overwriting their dates.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_catalog import FWICatalog
+
+        >>> catalog = FWICatalog.load(s3)
+        >>> catalog.latest_date()
+        '2024-07-01'
+        >>> catalog.has_date("2024-06-30", "fwi_values.json")
+        True
+    """
+
+    def __init__(
+        self,
+        dates: Optional[Dict[str, Dict[str, Any]]] = None,
+        updated: Optional[str] = None,
+        etag: Optional[str] = None,
+    ) -> None:
+        """
+        Initializes a new instance of the FWICatalog class.
+
+        Args:
+            dates (dict, optional): The files of each date, by date, see `to_json`.
+            updated (str, optional): When the catalog was last saved, in ISO 8601 format.
+            etag (str, optional): The ETag of the saved catalog, None if it does not exist on the S3 bucket.
+        """
+        self.dates = dict(sorted((dates or {}).items()))
+        self.updated = updated
+        self.etag = etag
+
+    @classmethod
+    def from_json(cls, json_content: Dict[str, Any]) -> "FWICatalog":
+        """
+        Builds the catalog from its JSON manifest.
+
+        Args:
+            json_content (dict): The manifest, as written by `to_json`.
+
+        Returns:
+            FWICatalog: The catalog.
+        """
+        if json_content.get("format_version") != CATALOG_FORMAT_VERSION:
+            raise ValueError(f"Unsupported FWI catalog format version {json_content.get('format_version')}")
+        return cls(json_content["dates"], updated=json_content.get("updated"))
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Builds the JSON manifest of the catalog.
+
+        Returns:
+            dict: The `format_version`, the `updated` date, the `latest` date, and the `dates`, each with the `size`
+                (in bytes) and `etag` of its files, by file name.
+        """
+        return {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "updated": self.updated,
+            "latest": self.latest_date(),
+            "dates": self.dates,
+        }
+
+    @classmethod
+    def load(cls, s3: S3Bucket) -> "FWICatalog":
+        """
+        Reads the catalog from the S3 bucket, with a single GET.
+
+        Args:
+            s3 (S3Bucket): The bucket of the FWI partitions.
+
+        Returns:
+            FWICatalog: The catalog, empty if it was never saved.
+        """
+        try:
+            json_content, etag = s3.read_json_with_etag(CATALOG_KEY)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return cls()
+            raise
+        catalog = cls.from_json(json_content)
+        catalog.etag = etag
+        return catalog
+
+    def save(self, s3: S3Bucket) -> None:
+        """
+        Replaces the catalog on the S3 bucket, with a single PUT, if it was not saved by another writer since
+        it was loaded. Otherwise, the PUT fails with a "PreconditionFailed" `ClientError`.
+
+        Args:
+            s3 (S3Bucket): The bucket of the FWI partitions.
+        """
+        self.updated = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        if self.etag is None:
+            self.etag = s3.write_json_to_s3(self.to_json(), CATALOG_KEY, if_none_match="*")
+        else:
+            self.etag = s3.write_json_to_s3(self.to_json(), CATALOG_KEY, if_match=self.etag)
+
+    @classmethod
+    def update(cls, s3: S3Bucket, dates: Iterable[str], max_attempts: int = 5, max_workers: int = 8) -> "FWICatalog":
+        """
+        Records the files of some dates in the catalog on the S3 bucket, see `refresh`.
+
+        The catalog is loaded, refreshed and saved again until no other writer saved it in the meantime.
+
+        Args:
+            s3 (S3Bucket): The bucket of the FWI partitions.
+            dates (iterable of str): The dates to update, in %Y-%m-%d format.
+            max_attempts (int, optional): The number of attempts before giving up on concurrent writes.
+            max_workers (int, optional): The number of partitions listed in parallel.
+
+        Returns:
+            FWICatalog: The saved catalog.
+        """
+        dates = list(dates)
+        attempt = 1
+        while True:
+            catalog = cls.load(s3)
+            catalog.refresh(s3, dates, max_workers=max_workers)
+            try:
+                catalog.save(s3)
+                return catalog
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in _CONFLICTS or attempt >= max_attempts:
+                    raise
+            attempt += 1
+
+    def latest_date(self) -> Optional[str]:
+        """The latest available date, in %Y-%m-%d format, or None if the catalog is empty."""
+        return next(reversed(self.dates), None)
+
+    def has_date(self, date: str, file_name: Optional[str] = None) -> bool:
+        """
+        Checks whether a date is available.
+
+        Args:
+            date (str): The date, in %Y-%m-%d format.
+            file_name (str, optional): Only consider the date available if it has this file, e.g. "fwi_values.bin".
+
+        Returns:
+            bool: Whether the date, or its file, is available.
+        """
+        files = self.dates.get(date)
+        return files is not None and (file_name is None or file_name in files)
+
+    def refresh(self, s3: S3Bucket, dates: Iterable[str], max_workers: int = 8) -> None:
+        """
+        Updates the files of some dates from the S3 bucket, listing their partitions in parallel.
+
+        The dates without any file are removed from the catalog.
+
+        Args:
+            s3 (S3Bucket): The bucket of the FWI partitions.
+            dates (iterable of str): The dates to update, in %Y-%m-%d format.
+            max_workers (int, optional): The number of partitions listed in parallel.
+        """
+        dates = list(dates)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = list(executor.map(lambda date: s3.list_objects(fwi_partition(date)), dates))
+        for date, objects in zip(dates, listings):
+            files = {
+                obj["key"].rsplit("/", 1)[-1]: {"size": obj["size"], "etag": obj["etag"]}
+                for obj in objects
+                # Nested folders are not FWI outputs
+                if "/" not in obj["key"][len(fwi_partition(date)) :]
+            }
+            if files:
+                self.dates[date] = files
+            else:
+                self.dates.pop(date, None)
+        self.dates = dict(sorted(self.dates.items()))
+
+    @classmethod
+    def rebuild(cls, s3: S3Bucket, max_workers: int = 8) -> "FWICatalog":
+        """
+        Builds the catalog of every partition of the S3 bucket, e.g. to create it for existing partitions.
+
+        Saving it replaces the stored catalog, unless another writer saved it during the rebuild.
+
+        Args:
+            s3 (S3Bucket): The bucket of the FWI partitions.
+            max_workers (int, optional): The number of partitions listed in parallel.
+
+        Returns:
+            FWICatalog: The catalog, to be saved.
+        """
+        # The catalog stored before listing the partitions, which may miss some of their files
+        etag = cls.load(s3).etag
+        partitions = s3.list_partitions("fwi/", depth=3, max_workers=max_workers)
+        dates: List[str] = [date for date in map(partition_date, partitions) if date is not None]
+        catalog = cls(etag=etag)
+        catalog.refresh(s3, dates, max_workers=max_workers)
+        return catalog
@@ -0,0 +1,230 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import json
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple
+
+import numpy as np
+from affine import Affine
+
+from pyrorisks.utils.fwi_raster import FWIRaster
+
+__all__ = ["FWICube"]
+
+# FWI cube year file: magic | header length (uint32, little endian) | JSON header, padded to HEADER_SIZE |
+# band of every day of the year, day-major (day of year x row x col)
+FWI_CUBE_MAGIC = b"PYROCUB1"
+FWI_CUBE_VERSION = 1
+HEADER_SIZE = 4096
+DAYS_PER_YEAR = 366
+INDEX_FILE = "index.json"
+_FWI_CUBE_PREFIX = struct.Struct("<8sI")
+
+
+def _day_slot(date: str) -> Tuple[int, int]:
+    """Maps a date, in %Y-%m-%d format, to its year and the index of its day in the year file."""
+    day = datetime.date.fromisoformat(date)
+    return day.year, day.timetuple().tm_yday - 1
+
+
+class FWICube:
+    """
+    An append-only local store of the daily FWI grids, stacked along time, answering point time series queries.
+
+    Each year is a memory-mapped file holding one band per day of the year (day of year x row x col), so that
+    appending a day writes a single contiguous band, and the series of a point over a year is a single strided
+    read of the file. The dates are only visible once committed to the index, which is replaced atomically, so
+    readers never see a partially written day.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_cube import FWICube
+
+        >>> cube = FWICube("fwi_cube")
+        >>> cube.append("2024-07-01", fwi_raster)
+        >>> dates, values = cube.series(longitude=2.638828, latitude=48.391842, start_date="2024-01-01")
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes a new instance of the FWICube class.
+
+        Args:
+            path (str): The local folder of the cube, created on first write.
+        """
+        self.path = path
+        self._years: Dict[Tuple[int, str], Tuple[Dict[str, Any], np.memmap]] = {}
+        self._dates: List[str] = []
+        self._index_version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _year_path(self, year: int) -> str:
+        return os.path.join(self.path, f"year={year}.bin")
+
+    def _create_year(self, year: int, fwi_raster: FWIRaster) -> None:
+        """Creates the (sparse) file of a year, unless another writer created it first."""
+        header = json.dumps({
+            "version": FWI_CUBE_VERSION,
+            "year": year,
+            "days": DAYS_PER_YEAR,
+            "width": fwi_raster.width,
+            "height": fwi_raster.height,
+            "dtype": fwi_raster.band.dtype.str,
+            "transform": list(fwi_raster.transform)[:6],
+            "crs": fwi_raster.crs,
+        }).encode("utf-8")
+        prefix = _FWI_CUBE_PREFIX.pack(FWI_CUBE_MAGIC, len(header)) + header
+        if len(prefix) > HEADER_SIZE:
+            raise ValueError(f"The FWI cube header is larger than {HEADER_SIZE} bytes")
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(prefix.ljust(HEADER_SIZE, b" "))
+                f.truncate(HEADER_SIZE + DAYS_PER_YEAR * fwi_raster.nbytes)
+            # Fails if the file exists, so that concurrent writers all end up with the same file
+            os.link(tmp_path, self._year_path(year))
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+
+    def _open_year(self, year: int, mode: Literal["r", "r+"]) -> Optional[Tuple[Dict[str, Any], np.memmap]]:
+        """Memory-maps the file of a year, None if it does not exist."""
+        key = (year, mode)
+        if key not in self._years:
+            file_path = self._year_path(year)
+            if not os.path.exists(file_path):
+                return None
+            with open(file_path, "rb") as f:
+                prefix = f.read(HEADER_SIZE)
+            magic, header_length = _FWI_CUBE_PREFIX.unpack_from(prefix)
+            if magic != FWI_CUBE_MAGIC:
+                raise ValueError(f"Not an FWI cube file: {file_path}")
+            header = json.loads(prefix[_FWI_CUBE_PREFIX.size : _FWI_CUBE_PREFIX.size + header_length])
+            cube = np.memmap(
+                file_path,
+                dtype=np.dtype(header["dtype"]),
+                mode=mode,
+                offset=HEADER_SIZE,
+                shape=(header["days"], header["height"], header["width"]),
+            )
+            # Maps points to pixels, without reading the band of the first day
+            header["grid"] = FWIRaster(cube[0], Affine(*header["transform"]), header["crs"])
+            self._years[key] = (header, cube)
+        return self._years[key]
+
+    @property
+    def dates(self) -> List[str]:
+        """The committed dates, sorted, reloaded when the index changes."""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            return []
+        # The index is replaced on every commit, hence a new inode
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if version != self._index_version:
+                with open(index_path) as f:
+                    index = json.load(f)
+                if index.get("version") != FWI_CUBE_VERSION:
+                    raise ValueError(f"Unsupported FWI cube version {index.get('version')}")
+                self._dates, self._index_version = sorted(index["dates"]), version
+            return self._dates
+
+    def write(self, date: str, fwi_raster: FWIRaster) -> None:
+        """
+        Writes the FWI grid of a date, without committing it: it stays invisible to readers until `commit`.
+
+        Several processes can write different dates concurrently.
+
+        Args:
+            date (str): The date of the FWI grid, in %Y-%m-%d format.
+            fwi_raster (FWIRaster): The FWI grid of the date.
+        """
+        year, slot = _day_slot(date)
+        if not os.path.exists(self._year_path(year)):
+            self._create_year(year, fwi_raster)
+        opened = self._open_year(year, "r+")
+        if opened is None:
+            raise FileNotFoundError(f"The FWI cube file of {year} is missing")
+        header, cube = opened
+        grid = (header["height"], header["width"], header["dtype"], header["transform"], header["crs"])
+        if grid != (*fwi_raster.band.shape, fwi_raster.band.dtype.str, list(fwi_raster.transform)[:6], fwi_raster.crs):
+            raise ValueError(f"The FWI grid of {date} does not match the grid of the FWI cube of {year}")
+        cube[slot] = fwi_raster.band
+        cube.flush()
+
+    def commit(self, dates: Iterable[str]) -> None:
+        """
+        Makes written dates visible to readers, by atomically replacing the index.
+
+        Only a single process should commit, e.g. the driver of a backfill once its workers wrote their dates.
+
+        Args:
+            dates (iterable of str): The written dates, in %Y-%m-%d format.
+        """
+        index = {"version": FWI_CUBE_VERSION, "dates": sorted(set(self.dates) | set(dates))}
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def append(self, date: str, fwi_raster: FWIRaster) -> None:
+        """
+        Writes and commits the FWI grid of a date.
+
+        Args:
+            date (str): The date of the FWI grid, in %Y-%m-%d format.
+            fwi_raster (FWIRaster): The FWI grid of the date.
+        """
+        self.write(date, fwi_raster)
+        self.commit([date])
+
+    def series(
+        self, longitude: float, latitude: float, start_date: str, end_date: Optional[str] = None
+    ) -> Optional[Tuple[List[str], np.ndarray]]:
+        """
+        Reads the FWI pixel values of a point over a range of dates, with one strided read per year.
+
+        Args:
+            longitude (float): The x coordinate of the point, in the cube CRS.
+            latitude (float): The y coordinate of the point, in the cube CRS.
+            start_date (str): The first date of the range (included), in %Y-%m-%d format.
+            end_date (str, optional): The last date of the range (included), in %Y-%m-%d format. Defaults to the
+                latest committed date.
+
+        Returns:
+            (dates, values) or None: The committed dates of the range and the FWI pixel values of the point at
+                these dates, or None if the point falls outside the FWI grid.
+        """
+        dates = [date for date in self.dates if start_date <= date and (end_date is None or date <= end_date)]
+        values = np.zeros(len(dates), dtype=np.int64)
+        position = 0
+        for year in sorted({int(date[:4]) for date in dates}):
+            year_dates = [date for date in dates if int(date[:4]) == year]
+            opened = self._open_year(year, "r")
+            if opened is None:
+                raise FileNotFoundError(f"The FWI cube file of {year} is missing")
+            header, cube = opened
+            idx = header["grid"].index(longitude, latitude)
+            if idx is None:
+                return None
+            slots = np.array([_day_slot(date)[1] for date in year_dates])
+            # A single strided read of the days of the year, then the committed days are kept
+            days = np.asarray(cube[slots.min() : slots.max() + 1, idx[0], idx[1]])
+            values[position : position + len(year_dates)] = days[slots - slots.min()]
+            position += len(year_dates)
+        return dates, values
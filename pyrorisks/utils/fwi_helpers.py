@@ -2,9 +2,23 @@ from rasterio.features import shapes
 import rasterio
 import geopandas as gpd
 import requests
-from io import BytesIO
+from io import BufferedIOBase, BytesIO
 import json
-from typing import Optional, Dict, Any
+import math
+import numpy as np
+import shapely
+from typing import Any, Dict, Optional
+
+from pyrorisks.utils.fwi_raster import FWIRaster
+from pyrorisks.utils.metrics import EFFIS_ERRORS, FWI_STAGE_SECONDS
+from pyrorisks.utils.profiler import profile_stage
+
+_FWI_CATEGORY_LUT: Optional[np.ndarray] = None
+
+FWI_GEOJSON_CRS = {
+    "type": "name",
+    "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"},
+}
 
 
 class FWIHelpers:
@@ -18,43 +32,118 @@ class FWIHelpers:
         """
         rasterio.Env()
 
-    def get_fwi(self, tiff_url: str) -> Optional[gpd.GeoDataFrame]:
+    def get_fwi(self, tiff_url: str, categorize: bool = False, land_only: bool = False) -> Optional[gpd.GeoDataFrame]:
         """
         Retrieves Fire Weather Index (FWI) data from a GeoTIFF file hosted at a given URL.
 
         This function downloads a GeoTIFF file from the provided URL, converts it to a GeoDataFrame
         containing FWI information, and returns the resulting GeoDataFrame.
 
+        With `categorize`, the band is mapped to fire risk categories before being polygonized, so that
+        neighbouring pixels of the same category are merged into a single polygon.
+
         Args:
             tiff_url (str): The URL of the GeoTIFF file to retrieve FWI data from.
+            categorize (bool, optional): Whether to polygonize the FWI categories (`fwi_category` column, 0 for
+                the sea) rather than the raw FWI pixel values (`fwi_pixel_value` column).
+            land_only (bool, optional): Whether to skip the sea when polygonizing, see `fwi_polygonize`.
 
         Returns:
             geopandas.GeoDataFrame or None: A GeoDataFrame containing FWI data if successful,
             or None if an error occurs during the retrieval or conversion.
         """
+        fwi_raster = self.get_fwi_raster(tiff_url)
+        if fwi_raster is None:
+            return None
+
         try:
-            response = requests.get(tiff_url, stream=True)
-            mask = None
-            data = rasterio.open(BytesIO(response.content)).meta
+            return self.fwi_polygonize(fwi_raster, categorize=categorize, land_only=land_only)
+
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    def fwi_polygonize(
+        self, fwi_raster: FWIRaster, categorize: bool = False, land_only: bool = False
+    ) -> gpd.GeoDataFrame:
+        """
+        Converts a decoded FWI raster into a GeoDataFrame of polygons.
 
-            with rasterio.open(BytesIO(response.content)) as src:
-                image = src.read(1)  # first band
+        With `land_only`, the land mask of the raster is passed to the polygonization, so that the sea is never
+        vectorized: the result is the same as `fwi_sea_remover` applied afterwards, at a fraction of the cost.
+
+        Args:
+            fwi_raster (FWIRaster): The decoded FWI raster.
+            categorize (bool, optional): Whether to polygonize the FWI categories (`fwi_category` column, 0 for
+                the sea) rather than the raw FWI pixel values (`fwi_pixel_value` column).
+            land_only (bool, optional): Whether to skip the sea (FWI pixel value = 0).
+
+        Returns:
+            geopandas.GeoDataFrame: A GeoDataFrame containing FWI data.
+        """
+        mask = fwi_raster.land_mask if land_only else None
+        image = fwi_raster.band
+        with FWI_STAGE_SECONDS.labels(stage="polygonize").time():
+            if categorize:
+                with profile_stage("categorize"):
+                    image = self.fwi_categorize(image)
+                results = (
+                    {"properties": {"fwi_category": int(v)}, "geometry": s}
+                    for s, v in shapes(image, mask=mask, transform=fwi_raster.transform)
+                )
+            else:
                 results = (
                     {"properties": {"fwi_pixel_value": v}, "geometry": s}
-                    for i, (s, v) in enumerate(shapes(image, mask=mask, transform=data["transform"]))
+                    for s, v in shapes(image, mask=mask, transform=fwi_raster.transform)
                 )
 
-            geoms = list(results)
-            gpd_polygonized_raster = gpd.GeoDataFrame.from_features(geoms, crs=str(data["crs"]))
-            return gpd_polygonized_raster
+            with profile_stage("shapes"):
+                geoms = list(results)
+            with profile_stage("geodataframe"):
+                gpd_polygonized_raster = gpd.GeoDataFrame.from_features(geoms, crs=fwi_raster.crs)
+        return gpd_polygonized_raster
+
+    def get_fwi_raster(self, tiff_url: str) -> Optional[FWIRaster]:
+        """
+        Retrieves Fire Weather Index (FWI) data from a GeoTIFF file hosted at a given URL, without polygonizing it.
+
+        This function downloads a GeoTIFF file from the provided URL and keeps its first band as an array,
+        along with the affine transform and CRS, so that point queries are answered by a direct pixel lookup.
+
+        Args:
+            tiff_url (str): The URL of the GeoTIFF file to retrieve FWI data from.
+
+        Returns:
+            FWIRaster or None: The decoded FWI raster if successful,
+            or None if an error occurs during the retrieval or decoding.
+        """
+        try:
+            with FWI_STAGE_SECONDS.labels(stage="download").time(), profile_stage("download"):
+                response = requests.get(tiff_url, stream=True)
+                content = response.content
+        except Exception as e:
+            EFFIS_ERRORS.labels(reason="download").inc()
+            print(f"Error: {e}")
+            return None
+
+        try:
+            # EFFIS answers with an XML error document when the map is not available
+            with (
+                FWI_STAGE_SECONDS.labels(stage="decode").time(),
+                profile_stage("decode"),
+                rasterio.open(BytesIO(content)) as src,
+            ):
+                fwi_raster = FWIRaster(band=src.read(1), transform=src.transform, crs=str(src.crs))
+            return fwi_raster
 
         except Exception as e:
+            EFFIS_ERRORS.labels(reason="decode").inc()
             print(f"Error: {e}")
             return None
 
     def fwi_sea_remover(self, geodataframe: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         """
-        Removes the sea from the dataset (FWI pixel value = 0).
+        Removes the sea from the dataset (FWI pixel value = 0, or FWI category = 0 once categorized).
 
         Args:
             geodataframe (geopandas.GeoDataFrame): The GeoDataFrame we reomve the sea from.
@@ -62,7 +151,8 @@ class FWIHelpers:
         Returns:
             geodataframe (geopandas.GeoDataFrame): The GeoDataFrame without the sea.
         """
-        geodataframe = geodataframe.loc[(geodataframe["fwi_pixel_value"] != 0)]  # remove the sea
+        column = "fwi_pixel_value" if "fwi_pixel_value" in geodataframe.columns else "fwi_category"
+        geodataframe = geodataframe.loc[(geodataframe[column] != 0)]  # remove the sea
         return geodataframe
 
     def fwi_category(self, fwi_pixel_val: int) -> int:
@@ -96,6 +186,75 @@ class FWIHelpers:
 
         return 3
 
+    def fwi_category_lut(self) -> np.ndarray:
+        """
+        Builds the lookup table of the fire risk category of every 8-bit FWI pixel value.
+
+        Returns:
+            numpy.ndarray: A 256-entry array, such that `lut[v] == fwi_category(v)`.
+        """
+        global _FWI_CATEGORY_LUT
+        if _FWI_CATEGORY_LUT is None:
+            _FWI_CATEGORY_LUT = np.array([self.fwi_category(v) for v in range(256)], dtype=np.uint8)
+        return _FWI_CATEGORY_LUT
+
+    def fwi_categorize(self, image: np.ndarray) -> np.ndarray:
+        """
+        Categorizes a whole band of integer FWI pixel values into fire risk categories, in one vectorized pass.
+
+        Unlike `fwi_category`, the sea (FWI pixel value = 0) is given its own category, 0.
+
+        Args:
+            image (numpy.ndarray): The FWI pixel values.
+
+        Returns:
+            numpy.ndarray: The uint8 risk categories, from 1 to 6 (see `fwi_category`), and 0 for the sea.
+        """
+        # Every value above 255 has the same category as 255
+        indices = image if image.dtype == np.uint8 else np.clip(image, 0, 255).astype(np.uint8)
+        categories = self.fwi_category_lut()[indices]
+        categories[image == 0] = 0
+        return categories
+
+    def fwi_simplify(
+        self, geodataframe: gpd.GeoDataFrame, pixel_size: float, tolerance: float = 1.0
+    ) -> gpd.GeoDataFrame:
+        """
+        Compacts categorized FWI polygons: coordinates are quantized, adjacent polygons of the same category are
+        merged, and their pixel staircases are simplified without opening gaps or overlaps between polygons.
+
+        Coordinates are snapped to the largest power of ten not above half a pixel, e.g. 0.001 degree for the
+        EFFIS map, which keeps them short once serialized. The shared edges of neighbouring polygons are
+        simplified once, with `shapely.coverage_simplify`, which requires shapely >= 2.1.
+
+        Args:
+            geodataframe (geopandas.GeoDataFrame): The polygons, with a `fwi_category` column, e.g. from
+                `fwi_polygonize` with `categorize` and `land_only`.
+            pixel_size (float): The size of a pixel of the polygonized raster, in CRS units.
+            tolerance (float, optional): The simplification tolerance, in pixels. With 0, polygons are only merged
+                and quantized, and every pixel center keeps its category. With 1, the pixel staircases are
+                removed, and only pixels along the category boundaries may change category.
+
+        Returns:
+            geopandas.GeoDataFrame: The compacted polygons, with a `fwi_category` column.
+        """
+        if geodataframe.empty:
+            return geodataframe
+        with FWI_STAGE_SECONDS.labels(stage="simplify").time(), profile_stage("simplify"):
+            grid_size = 10 ** math.floor(math.log10(pixel_size / 2))
+            gdf = gpd.GeoDataFrame(
+                {"fwi_category": geodataframe["fwi_category"].to_numpy()},
+                geometry=shapely.set_precision(geodataframe.geometry.values, grid_size),
+                crs=geodataframe.crs,
+            )
+            gdf = gdf.dissolve("fwi_category", as_index=False).explode(index_parts=False).reset_index(drop=True)
+            if tolerance > 0:
+                # Simplifying polygon by polygon would open gaps and overlaps between neighbours
+                if not hasattr(shapely, "coverage_simplify"):
+                    raise ImportError("FWI polygon simplification requires shapely >= 2.1: pip install 'shapely>=2.1'")
+                gdf = gdf.set_geometry(shapely.coverage_simplify(gdf.geometry.values, tolerance * pixel_size))
+            return gdf[~gdf.geometry.is_empty].reset_index(drop=True)
+
     def fwi_geojson_maker(self, geodataframe: gpd.GeoDataFrame) -> Dict[str, Any]:
         """
         Converts a GeoDataFrame into a GeoJSON.
@@ -117,10 +276,26 @@ class FWIHelpers:
             del feature_dict["id"]
         new_json_fwi = {
             "type": "FeatureCollection",
-            "crs": {
-                "type": "name",
-                "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"},
-            },
+            "crs": FWI_GEOJSON_CRS,
             "features": json_fwi["features"],
         }
         return new_json_fwi
+
+    def fwi_geojson_writer(self, geodataframe: gpd.GeoDataFrame, fileobj: BufferedIOBase) -> None:
+        """
+        Writes a GeoDataFrame as a GeoJSON into a binary file object, one feature at a time.
+
+        This produces the same GeoJSON as `fwi_geojson_maker`, without ever holding the whole document
+        in memory, so that it can be streamed to a local file or to an S3 multipart upload.
+
+        Args:
+            geodataframe (geopandas.GeoDataFrame): The GeoDataFrame to be converted into GeoJSON.
+            fileobj (binary file object): Where the GeoJSON is written, e.g. `S3Bucket.open_multipart_writer`.
+        """
+        header = json.dumps({"type": "FeatureCollection", "crs": FWI_GEOJSON_CRS})
+        with FWI_STAGE_SECONDS.labels(stage="serialization").time(), profile_stage("serialization"):
+            # Leave the object open to append the features
+            fileobj.write((header[:-1] + ', "features": [').encode("utf-8"))
+            for idx, feature in enumerate(geodataframe.iterfeatures(drop_id=True)):
+                fileobj.write(((", " if idx > 0 else "") + json.dumps(feature)).encode("utf-8"))
+            fileobj.write(b"]}")
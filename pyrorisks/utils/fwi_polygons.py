@@ -0,0 +1,85 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import numpy as np
+import geopandas as gpd
+import shapely
+from typing import Any, Dict, List, Optional
+
+__all__ = ["FWIPolygons"]
+
+
+class FWIPolygons:
+    """
+    A daily set of FWI category polygons, kept alongside a prebuilt STRtree spatial index for point queries.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_polygons import FWIPolygons
+
+        >>> fwi_polygons = FWIPolygons.from_features(json_content["features"])
+        >>> fwi_polygons.category(longitude=2.638828, latitude=48.391842)
+    """
+
+    def __init__(self, geodataframe: gpd.GeoDataFrame) -> None:
+        """
+        Initializes a new instance of the FWIPolygons class, building its spatial index.
+
+        Args:
+            geodataframe (geopandas.GeoDataFrame): The FWI polygons, with a `fwi_category` column.
+        """
+        self.geodataframe = geodataframe.reset_index(drop=True)
+        self.fwi_categories = self.geodataframe["fwi_category"].to_numpy(dtype=np.float64)
+        # Build the index now rather than on the first query
+        self.sindex = self.geodataframe.sindex
+
+    @classmethod
+    def from_features(cls, features: List[Dict[str, Any]]) -> "FWIPolygons":
+        """
+        Builds the FWI polygons from GeoJSON features, as written by `FWIHelpers.fwi_geojson_maker`.
+
+        Args:
+            features (list): The GeoJSON features, with a `fwi_category` property.
+
+        Returns:
+            FWIPolygons: The indexed FWI polygons.
+        """
+        return cls(gpd.GeoDataFrame.from_features(features))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size in bytes of the polygons and their categories."""
+        n_coords = int(shapely.get_num_coordinates(self.geodataframe.geometry.values).sum())
+        return 16 * n_coords + int(self.fwi_categories.nbytes)
+
+    def categories(self, longitudes: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+        """
+        Retrieves the FWI categories of many points, through an indexed candidate lookup.
+
+        Args:
+            longitudes (numpy.ndarray): The longitudes of the points.
+            latitudes (numpy.ndarray): The latitudes of the points.
+
+        Returns:
+            numpy.ndarray: The FWI categories of the points, NaN for the points within no polygon.
+        """
+        points = shapely.points(np.asarray(longitudes, dtype=np.float64), np.asarray(latitudes, dtype=np.float64))
+        point_idx, polygon_idx = self.sindex.query(points, predicate="within")
+        fwi_categories = np.full(len(points), np.nan)
+        fwi_categories[point_idx] = self.fwi_categories[polygon_idx]
+        return fwi_categories
+
+    def category(self, longitude: float, latitude: float) -> Optional[float]:
+        """
+        Retrieves the FWI category of a point.
+
+        Args:
+            longitude (float): The longitude of the point.
+            latitude (float): The latitude of the point.
+
+        Returns:
+            float or None: The FWI category of the point, or None if it is within no polygon.
+        """
+        fwi_category = self.categories(np.array([longitude]), np.array([latitude]))[0]
+        return None if np.isnan(fwi_category) else float(fwi_category)
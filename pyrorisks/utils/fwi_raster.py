@@ -0,0 +1,307 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import hashlib
+import json
+import math
+import struct
+import numpy as np
+from affine import Affine
+from typing import Any, Callable, Dict, Optional, Tuple
+
+__all__ = ["FWIRaster", "FWIGridReader", "read_fwi_grid_header"]
+
+# FWI grid format: magic | header length (uint32, little endian) | JSON header | row-major band bytes
+FWI_GRID_MAGIC = b"PYROFWI1"
+FWI_GRID_VERSION = 1
+_FWI_GRID_PREFIX = struct.Struct("<8sI")
+
+
+def _pixel_index(
+    inverse_transform: Affine, height: int, width: int, longitude: float, latitude: float
+) -> Optional[Tuple[int, int]]:
+    col, row = inverse_transform * (longitude, latitude)
+    if not (math.isfinite(col) and math.isfinite(row)):
+        return None
+    row, col = math.floor(row), math.floor(col)
+    if not (0 <= row < height and 0 <= col < width):
+        return None
+    return row, col
+
+
+def read_fwi_grid_header(prefix: bytes) -> Tuple[Dict[str, Any], int]:
+    """
+    Parses the header of an FWI grid.
+
+    Args:
+        prefix (bytes): The first bytes of the FWI grid, at least up to the end of its header.
+
+    Returns:
+        (header, data_offset): The header (width, height, dtype, transform and crs) and the offset of the band
+            bytes in the FWI grid.
+    """
+    magic, header_length = _FWI_GRID_PREFIX.unpack_from(prefix)
+    if magic != FWI_GRID_MAGIC:
+        raise ValueError("Not an FWI grid")
+    data_offset = _FWI_GRID_PREFIX.size + header_length
+    if len(prefix) < data_offset:
+        raise ValueError(f"The FWI grid header needs {data_offset} bytes, got {len(prefix)}")
+    header = json.loads(prefix[_FWI_GRID_PREFIX.size : data_offset].decode("utf-8"))
+    return header, data_offset
+
+
+class FWIRaster:
+    """
+    A decoded FWI GeoTIFF band kept in memory, answering point queries through the raster's affine transform.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_helpers import FWIHelpers
+
+        >>> fwi_raster = FWIHelpers().get_fwi_raster(tiff_url)
+        >>> fwi_raster.pixel_value(longitude=2.638828, latitude=48.391842)
+
+        To store it as a compact FWI grid (a JSON header followed by the raw band), and memory-map it back, use:
+
+        >>> fwi_raster.to_file("fwi_values.bin")
+        >>> fwi_raster = FWIRaster.from_file("fwi_values.bin")
+    """
+
+    def __init__(self, band: np.ndarray, transform: Affine, crs: str) -> None:
+        """
+        Initializes a new instance of the FWIRaster class.
+
+        Args:
+            band (numpy.ndarray): The 2D array of FWI pixel values (first band of the GeoTIFF).
+            transform (affine.Affine): The affine transform mapping pixel (col, row) to (x, y) coordinates.
+            crs (str): The Coordinate Reference System (CRS) of the raster.
+        """
+        self.band = band
+        self.transform = transform
+        self.crs = crs
+        self.height, self.width = band.shape
+        self._inverse_transform = ~transform
+        self._version: Optional[str] = None
+        self._land_mask: Optional[np.ndarray] = None
+
+    @property
+    def nbytes(self) -> int:
+        """Size in bytes of the decoded band."""
+        return int(self.band.nbytes)
+
+    @property
+    def resolution(self) -> Tuple[float, float]:
+        """Width and height of a pixel, in CRS units."""
+        return abs(self.transform.a), abs(self.transform.e)
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the grid and pixel values, computed once. Equal rasters have the same version."""
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(
+                json.dumps([self.band.dtype.str, self.band.shape, list(self.transform)[:6], self.crs]).encode()
+            )
+            digest.update(np.ascontiguousarray(self.band).data)
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def land_mask(self) -> np.ndarray:
+        """Boolean mask of the land pixels (FWI pixel value != 0, EFFIS has no data over the sea), computed once."""
+        if self._land_mask is None:
+            self._land_mask = self.band != 0
+        return self._land_mask
+
+    def index(self, longitude: float, latitude: float) -> Optional[Tuple[int, int]]:
+        """
+        Maps a point to the (row, col) index of the pixel containing it.
+
+        Args:
+            longitude (float): The x coordinate of the point, in the raster CRS.
+            latitude (float): The y coordinate of the point, in the raster CRS.
+
+        Returns:
+            (row, col) or None: The pixel index, or None if the point falls outside the raster.
+        """
+        return _pixel_index(self._inverse_transform, self.height, self.width, longitude, latitude)
+
+    def pixel_value(self, longitude: float, latitude: float) -> Optional[int]:
+        """
+        Reads the FWI pixel value at a given point.
+
+        Args:
+            longitude (float): The x coordinate of the point, in the raster CRS.
+            latitude (float): The y coordinate of the point, in the raster CRS.
+
+        Returns:
+            int or None: The FWI pixel value, or None if the point falls outside the raster.
+        """
+        idx = self.index(longitude, latitude)
+        if idx is None:
+            return None
+        return int(self.band[idx])
+
+    def indices(self, longitudes: np.ndarray, latitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Maps many points to the (row, col) indices of the pixels containing them, in one vectorized pass.
+
+        Args:
+            longitudes (numpy.ndarray): The x coordinates of the points, in the raster CRS.
+            latitudes (numpy.ndarray): The y coordinates of the points, in the raster CRS.
+
+        Returns:
+            (rows, cols, inside): The pixel indices and a boolean mask of the points falling inside the raster.
+                Indices of the points outside the raster are set to 0.
+        """
+        inv = self._inverse_transform
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        cols = np.floor(inv.a * longitudes + inv.b * latitudes + inv.c)
+        rows = np.floor(inv.d * longitudes + inv.e * latitudes + inv.f)
+        # NaN coordinates fail every comparison, hence are outside
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        rows = np.where(inside, rows, 0).astype(np.intp)
+        cols = np.where(inside, cols, 0).astype(np.intp)
+        return rows, cols, inside
+
+    def pixel_values(self, longitudes: np.ndarray, latitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reads the FWI pixel values at many points, in one vectorized pass.
+
+        Args:
+            longitudes (numpy.ndarray): The x coordinates of the points, in the raster CRS.
+            latitudes (numpy.ndarray): The y coordinates of the points, in the raster CRS.
+
+        Returns:
+            (values, inside): The FWI pixel values and a boolean mask of the points falling inside the raster.
+                Values of the points outside the raster are meaningless.
+        """
+        rows, cols, inside = self.indices(longitudes, latitudes)
+        return self.band[rows, cols], inside
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the raster as an FWI grid: a small JSON header describing the band, then the raw band bytes.
+
+        Returns:
+            bytes: The FWI grid.
+        """
+        header = json.dumps({
+            "version": FWI_GRID_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "dtype": self.band.dtype.str,
+            "transform": list(self.transform)[:6],
+            "crs": self.crs,
+        }).encode("utf-8")
+        band = np.ascontiguousarray(self.band)
+        return _FWI_GRID_PREFIX.pack(FWI_GRID_MAGIC, len(header)) + header + band.tobytes()
+
+    def to_file(self, file_path: str) -> None:
+        """
+        Writes the raster as an FWI grid file.
+
+        Args:
+            file_path (str): The local path of the FWI grid.
+        """
+        with open(file_path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes) -> "FWIRaster":
+        """
+        Reads a raster from an FWI grid, without copying its band.
+
+        Args:
+            buffer (bytes): The FWI grid.
+
+        Returns:
+            FWIRaster: The decoded FWI raster.
+        """
+        header, data_offset = read_fwi_grid_header(buffer)
+        band = np.frombuffer(
+            buffer, dtype=np.dtype(header["dtype"]), count=header["height"] * header["width"], offset=data_offset
+        )
+        return cls(band.reshape(header["height"], header["width"]), Affine(*header["transform"]), header["crs"])
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "FWIRaster":
+        """
+        Memory-maps a raster from an FWI grid file, so that point reads only touch the pages they need.
+
+        Args:
+            file_path (str): The local path of the FWI grid.
+
+        Returns:
+            FWIRaster: The memory-mapped FWI raster.
+        """
+        with open(file_path, "rb") as f:
+            prefix = f.read(_FWI_GRID_PREFIX.size)
+            _, header_length = _FWI_GRID_PREFIX.unpack(prefix)
+            header, data_offset = read_fwi_grid_header(prefix + f.read(header_length))
+        band = np.memmap(
+            file_path,
+            dtype=np.dtype(header["dtype"]),
+            mode="r",
+            offset=data_offset,
+            shape=(header["height"], header["width"]),
+        )
+        return cls(band, Affine(*header["transform"]), header["crs"])
+
+
+class FWIGridReader:
+    """
+    Reads pixels of a remote FWI grid through byte range reads, without downloading the whole grid.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_raster import FWIGridReader
+
+        >>> reader = FWIGridReader(lambda start, end: s3.read_bytes_from_s3("fwi_values.bin", start, end))
+        >>> reader.pixel_value(longitude=2.638828, latitude=48.391842)
+    """
+
+    def __init__(self, read_range: Callable[[int, int], bytes], header_size_hint: int = 4096) -> None:
+        """
+        Initializes a new instance of the FWIGridReader class.
+
+        Args:
+            read_range (callable): Reads the bytes of the FWI grid from `start` to `end` (both included).
+            header_size_hint (int, optional): The number of bytes read at once to parse the header.
+        """
+        self.read_range = read_range
+        self.header_size_hint = header_size_hint
+        self._header: Optional[Dict[str, Any]] = None
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        """The FWI grid header, read on first access."""
+        if self._header is None:
+            prefix = self.read_range(0, self.header_size_hint - 1)
+            _, header_length = _FWI_GRID_PREFIX.unpack_from(prefix)
+            if _FWI_GRID_PREFIX.size + header_length > len(prefix):
+                prefix = self.read_range(0, _FWI_GRID_PREFIX.size + header_length - 1)
+            header, data_offset = read_fwi_grid_header(prefix)
+            inverse_transform = ~Affine(*header["transform"])
+            self._header = {**header, "data_offset": data_offset, "inverse_transform": inverse_transform}
+        return self._header
+
+    def pixel_value(self, longitude: float, latitude: float) -> Optional[int]:
+        """
+        Reads the FWI pixel value at a given point, with a single range read once the header is known.
+
+        Args:
+            longitude (float): The x coordinate of the point, in the grid CRS.
+            latitude (float): The y coordinate of the point, in the grid CRS.
+
+        Returns:
+            int or None: The FWI pixel value, or None if the point falls outside the grid.
+        """
+        header = self.header
+        idx = _pixel_index(header["inverse_transform"], header["height"], header["width"], longitude, latitude)
+        if idx is None:
+            return None
+        dtype = np.dtype(header["dtype"])
+        start = header["data_offset"] + (idx[0] * header["width"] + idx[1]) * dtype.itemsize
+        return int(np.frombuffer(self.read_range(start, start + dtype.itemsize - 1), dtype=dtype)[0])
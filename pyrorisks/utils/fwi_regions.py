@@ -0,0 +1,120 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import numpy as np
+import geopandas as gpd
+from rasterio.features import rasterize
+from typing import Any, Dict, Optional, Tuple
+
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_raster import FWIRaster
+
+__all__ = ["FWIRegions", "FRANCE_DEPARTMENTS_URL"]
+
+# Boundaries of the French departments, with their geocode in the `code` property
+FRANCE_DEPARTMENTS_URL = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson"
+
+N_FWI_CATEGORIES = 6
+
+
+class FWIRegions:
+    """
+    Computes zonal statistics of the FWI categories for each administrative subregion.
+
+    Regions are rasterized once per FWI grid, so the daily aggregation is a single pass of `numpy.bincount`.
+
+    Example:
+        >>> from pyrorisks.utils.fwi_regions import FWIRegions, FRANCE_DEPARTMENTS_URL
+
+        >>> fwi_regions = FWIRegions.from_file(FRANCE_DEPARTMENTS_URL)
+        >>> fwi_regions.aggregate(fwi_raster)["01"]
+        {'max_category': 4, 'mean_category': 2.1, 'category_shares': {'1': 0.3, ...}, 'n_pixels': 1234}
+    """
+
+    def __init__(self, geodataframe: gpd.GeoDataFrame, geocode_column: str = "code") -> None:
+        """
+        Initializes a new instance of the FWIRegions class.
+
+        Args:
+            geodataframe (geopandas.GeoDataFrame): The boundaries of the regions.
+            geocode_column (str, optional): The column holding the geocode of the regions.
+        """
+        self.geodataframe = geodataframe.reset_index(drop=True)
+        self.geocodes = self.geodataframe[geocode_column].astype(str).to_numpy()
+        self._labels: Optional[Tuple[Tuple[Any, ...], np.ndarray]] = None
+
+    @classmethod
+    def from_file(cls, path: str, geocode_column: str = "code") -> "FWIRegions":
+        """
+        Reads the boundaries of the regions from a local or remote vector file (e.g. GeoJSON).
+
+        Args:
+            path (str): The path or URL of the file.
+            geocode_column (str, optional): The property holding the geocode of the regions.
+
+        Returns:
+            FWIRegions: The regions.
+        """
+        return cls(gpd.read_file(path), geocode_column=geocode_column)
+
+    def labels(self, fwi_raster: FWIRaster) -> np.ndarray:
+        """
+        Rasterizes the regions on the grid of an FWI raster, reusing the last result for the same grid.
+
+        Args:
+            fwi_raster (FWIRaster): The FWI raster whose grid is used.
+
+        Returns:
+            numpy.ndarray: For every pixel, 1 + the index of the region it belongs to, 0 outside every region.
+        """
+        grid = (fwi_raster.band.shape, tuple(fwi_raster.transform), fwi_raster.crs)
+        if self._labels is None or self._labels[0] != grid:
+            regions = self.geodataframe
+            if regions.crs is not None and fwi_raster.crs and regions.crs != fwi_raster.crs:
+                regions = regions.to_crs(fwi_raster.crs)
+            labels = rasterize(
+                ((geom, idx + 1) for idx, geom in enumerate(regions.geometry) if geom is not None),
+                out_shape=fwi_raster.band.shape,
+                transform=fwi_raster.transform,
+                fill=0,
+                dtype=np.int32,
+            )
+            self._labels = (grid, labels)
+        return self._labels[1]
+
+    def aggregate(self, fwi_raster: FWIRaster) -> Dict[str, Dict[str, Any]]:
+        """
+        Computes, for each region, the max and mean FWI category and the share of its land pixels in each category.
+
+        Args:
+            fwi_raster (FWIRaster): The FWI raster of the day.
+
+        Returns:
+            dict: The statistics of each region, by geocode. Regions without any land pixel are left out.
+        """
+        labels = self.labels(fwi_raster).ravel()
+        categories = FWIHelpers().fwi_categorize(fwi_raster.band).ravel()
+        land = (labels > 0) & (categories > 0)
+        n_regions, n_classes = len(self.geocodes) + 1, N_FWI_CATEGORIES + 1
+        counts = np.bincount(
+            labels[land].astype(np.int64) * n_classes + categories[land], minlength=n_regions * n_classes
+        ).reshape(n_regions, n_classes)[1:, 1:]
+
+        n_pixels = counts.sum(axis=1)
+        category_values = np.arange(1, n_classes)
+        aggregates = {}
+        for geocode, region_counts, region_n_pixels in zip(self.geocodes, counts, n_pixels):
+            if region_n_pixels == 0:
+                continue
+            aggregates[str(geocode)] = {
+                "max_category": int(category_values[region_counts > 0].max()),
+                "mean_category": float(region_counts @ category_values / region_n_pixels),
+                "category_shares": {
+                    str(category): float(count / region_n_pixels)
+                    for category, count in zip(category_values, region_counts)
+                },
+                "n_pixels": int(region_n_pixels),
+            }
+        return aggregates
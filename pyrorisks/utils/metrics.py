@@ -0,0 +1,24 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+from prometheus_client import Counter, Histogram
+
+__all__ = ["DURATION_BUCKETS", "FWI_STAGE_SECONDS", "EFFIS_ERRORS"]
+
+# From a pixel lookup (about 10 µs) to an EFFIS download (seconds)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Metrics of the FWI path, shared by the platform_fwi pipeline and the API, in the default prometheus_client registry
+FWI_STAGE_SECONDS = Histogram(
+    "pyrorisks_fwi_stage_seconds",
+    "Duration of the stages of the FWI path (download, decode, polygonize, simplify, lookup, serialization).",
+    ["stage"],
+    buckets=DURATION_BUCKETS,
+)
+EFFIS_ERRORS = Counter(
+    "pyrorisks_effis_errors_total",
+    "Failed retrievals of an FWI map from EFFIS, by reason (download or decode).",
+    ["reason"],
+)
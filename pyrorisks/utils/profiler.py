@@ -0,0 +1,132 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional
+
+__all__ = ["StageProfiler", "profile_stage"]
+
+_MIB = 1024**2
+# ru_maxrss is in kilobytes on Linux, in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_active_profiler: ContextVar[Optional["StageProfiler"]] = ContextVar("pyrorisks_profiler", default=None)
+
+
+def _max_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT / _MIB
+
+
+class StageProfiler:
+    """
+    Records the wall time, CPU time and peak memory of the stages of a job.
+
+    Stages are declared with `profile_stage`, which does nothing unless a profiler is active, so that library code
+    can be instrumented at no cost. Stages can be nested, and a stage entered several times is aggregated.
+
+    Peak memory is measured with `tracemalloc` (Python and numpy allocations, peak and increase during the stage)
+    and with the maximum resident set size of the process (which includes native allocations, e.g. GDAL's, but
+    never decreases).
+
+    Example:
+        >>> from pyrorisks.utils.profiler import StageProfiler, profile_stage
+
+        >>> with StageProfiler() as profiler:
+                with profile_stage("download"):
+                    ...
+        >>> profiler.report()
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._stack: List[Dict[str, float]] = []
+        self._token: Optional[Token] = None
+        self._started_tracing = False
+        self._start: Dict[str, float] = {}
+        self.total: Dict[str, float] = {}
+
+    def __enter__(self) -> "StageProfiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._token = _active_profiler.set(self)
+        self._start = {"wall": time.perf_counter(), "cpu": time.process_time()}
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        peak = max(
+            [float(tracemalloc.get_traced_memory()[1])] + [stage["peak_mib"] * _MIB for stage in self.stages.values()]
+        )
+        self.total = {
+            "wall_s": time.perf_counter() - self._start["wall"],
+            "cpu_s": time.process_time() - self._start["cpu"],
+            "peak_mib": peak / _MIB,
+            "max_rss_mib": _max_rss_mib(),
+        }
+        if self._token is not None:
+            _active_profiler.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Profiles a block of code as the stage `name`."""
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # Keep the peak of the enclosing stage before resetting it for this one
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"peak": float(current)}
+        self._stack.append(frame)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], frame["peak"])
+            stats = self.stages.setdefault(
+                name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mib": 0.0, "allocated_mib": 0.0}
+            )
+            stats["calls"] += 1
+            stats["wall_s"] += wall
+            stats["cpu_s"] += cpu
+            stats["peak_mib"] = max(stats["peak_mib"], frame["peak"] / _MIB)
+            stats["allocated_mib"] = max(stats["allocated_mib"], (frame["peak"] - current) / _MIB)
+            stats["max_rss_mib"] = _max_rss_mib()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarizes the profiled stages, in the order they were first entered.
+
+        Returns:
+            dict: The `stages` (calls, wall and CPU time in seconds, peak and allocated traced memory and max RSS
+                in MiB, by stage name) and the `total` of the profiled job.
+        """
+        return {"stages": self.stages, "total": self.total}
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """
+    Profiles a block of code as the stage `name` of the active `StageProfiler`, if any.
+
+    Args:
+        name (str): The name of the stage, e.g. "download".
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
@@ -1,10 +1,290 @@
+import asyncio
 import boto3
+import functools
+import gzip
+import hashlib
+import io
+import itertools
 import json
-from typing import Dict, Any, Optional
+import threading
+import time
+import zlib
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from pyrorisks.utils.profiler import profile_stage
 
 import os
 
-__all__ = ["S3Bucket"]
+__all__ = ["S3Bucket", "AsyncS3Bucket", "S3MultipartWriter", "get_s3_client"]
+
+# Connection pool shared by every S3Bucket of the process, see `get_s3_client`
+S3_CONFIG = Config(
+    max_pool_connections=int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 50)),
+    retries={"max_attempts": 5, "mode": "standard"},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+)
+
+# Multipart transfers of the large files, on top of the files transferred in parallel
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024**2,
+    multipart_chunksize=16 * 1024**2,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+_s3_clients: Dict[Tuple[Optional[str], ...], Any] = {}
+_s3_clients_lock = threading.Lock()
+
+
+def get_s3_client(
+    endpoint_url: Optional[str] = None,
+    region_name: Optional[str] = None,
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_key: Optional[str] = None,
+) -> Any:
+    """
+    Retrieves the process-wide S3 client of a set of credentials, creating it on first use.
+
+    The client and its connection pool (see `S3_CONFIG`) are created once and reused by every S3Bucket,
+    so that small reads do not pay for a new session and TLS handshake. Only the low-level client is shared:
+    boto3 clients are thread-safe, whereas sessions and resources are not.
+
+    Args:
+        endpoint_url (str, optional): The AWS endpoint URL.
+        region_name (str, optional): The AWS region where the bucket is located.
+        aws_access_key_id (str, optional): The AWS access key ID for the account.
+        aws_secret_key (str, optional): The AWS secret access key for the account.
+
+    Returns:
+        botocore.client.S3: The shared S3 client.
+    """
+    key = (endpoint_url, region_name, aws_access_key_id, aws_secret_key)
+    with _s3_clients_lock:
+        if key not in _s3_clients:
+            session_args = {}
+            if region_name:
+                session_args["region_name"] = region_name
+            if aws_access_key_id and aws_secret_key:
+                session_args["aws_access_key_id"] = aws_access_key_id
+                session_args["aws_secret_access_key"] = aws_secret_key
+            session = boto3.Session(**session_args)
+            _s3_clients[key] = session.client("s3", endpoint_url=endpoint_url, config=S3_CONFIG)
+        return _s3_clients[key]
+
+
+# S3 requires every part of a multipart upload but the last one to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024**2
+
+# Compressions of the JSON files, stored as their Content-Encoding, with their magic number
+COMPRESSIONS = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+
+
+def _zstandard() -> Any:
+    """Imports the optional zstandard package, only needed for zstd compressed files."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires the zstandard package, see the zstd extra of pyrorisks") from None
+    return zstandard
+
+
+def _compressor(compression: str) -> Any:
+    """Creates an incremental compressor, with `compress(data)` and `flush()` methods."""
+    if compression == "gzip":
+        # Gzip container, without timestamp so that equal contents give equal objects
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor(level=3).compressobj()
+    raise ValueError(f"Unsupported compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+
+
+def _decompressed(fileobj: Any, compression: str) -> Any:
+    """Wraps a binary file object, e.g. a boto3 streaming body, in a file object decompressing it on the fly."""
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "zstd":
+        return _zstandard().ZstdDecompressor().stream_reader(fileobj)
+    raise ValueError(f"Unsupported compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+
+
+def _is_unchanged(file_path: str, size: int, e_tag: str) -> bool:
+    """Whether a local file has the size and, for single part uploads, the MD5 checksum of an S3 object."""
+    if not os.path.isfile(file_path) or os.path.getsize(file_path) != size:
+        return False
+    e_tag = e_tag.strip('"')
+    # Multipart ETags are not the MD5 checksum of the object, the size has to do
+    if "-" in e_tag:
+        return True
+    md5 = hashlib.md5(usedforsecurity=False)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024**2), b""):
+            md5.update(chunk)
+    return md5.hexdigest() == e_tag
+
+
+def _run_transfers(
+    transfers: List[Tuple[Callable[[], Any], str, int]],
+    n_files: int,
+    max_workers: int,
+    progress: Optional[Callable[[str, int], None]],
+) -> Dict[str, Any]:
+    """Runs file transfers in a thread pool and reports their throughput."""
+    start = time.perf_counter()
+    transferred_bytes = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(transfer): (key, size) for transfer, key, size in transfers}
+        for future in as_completed(futures):
+            future.result()
+            key, size = futures[future]
+            transferred_bytes += size
+            if progress is not None:
+                progress(key, size)
+    seconds = time.perf_counter() - start
+    return {
+        "files": n_files,
+        "transferred": len(transfers),
+        "skipped": n_files - len(transfers),
+        "bytes": transferred_bytes,
+        "seconds": round(seconds, 3),
+        "throughput_mb_s": round(transferred_bytes / 1024**2 / seconds, 2) if seconds > 0 else 0.0,
+    }
+
+
+class S3MultipartWriter(io.BufferedIOBase):
+    """
+    A writable binary file object streaming its content to an S3 object through a multipart upload.
+
+    Parts are uploaded as soon as `part_size` bytes are buffered, so that memory stays bounded whatever
+    the object size. Objects smaller than one part are sent with a single PUT. The upload is aborted if
+    the `with` block raises.
+
+    With a `compression`, the written bytes are compressed on the fly and the object is stored with the matching
+    Content-Encoding, which `S3Bucket.read_json_from_s3` uses to decompress it.
+
+    Example:
+        >>> with s3.open_multipart_writer('path/to/my_file.json') as f:
+                f.write(b'...')
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket_name: str,
+        object_key: str,
+        part_size: int = 8 * 1024**2,
+        extra_args: Optional[Dict[str, Any]] = None,
+        compression: Optional[str] = None,
+    ) -> None:
+        """
+        Initializes a new instance of the S3MultipartWriter class.
+
+        Args:
+            client (botocore.client.S3): The S3 client.
+            bucket_name (str): The name of the S3 bucket.
+            object_key (str): The S3 key (path) where the file will be stored.
+            part_size (int, optional): The size of the uploaded parts, in bytes (at least 5 MiB).
+            extra_args (dict, optional): Extra arguments of the upload, e.g. `ContentType`.
+            compression (str, optional): The compression of the object, one of `COMPRESSIONS`.
+        """
+        super().__init__()
+        self.client = client
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.extra_args = dict(extra_args or {})
+        self._compressor = None if compression is None else _compressor(compression)
+        if compression is not None:
+            self.extra_args["ContentEncoding"] = compression
+        # Bytes written by the caller, before compression
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        self._buffer += b if self._compressor is None else self._compressor.compress(bytes(b))
+        self.bytes_written += len(b)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(b)
+
+    def _upload_part(self, data: bytes) -> None:
+        with profile_stage("upload"):
+            if self._upload_id is None:
+                self._upload_id = self.client.create_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.object_key, **self.extra_args
+                )["UploadId"]
+            part_number = len(self._parts) + 1
+            response = self.client.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.object_key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def close(self) -> None:
+        """Uploads the remaining bytes and completes the upload."""
+        if self.closed:
+            return
+        try:
+            if self._compressor is not None:
+                self._buffer += self._compressor.flush()
+            if self._upload_id is None:
+                with profile_stage("upload"):
+                    self.client.put_object(
+                        Bucket=self.bucket_name, Key=self.object_key, Body=bytes(self._buffer), **self.extra_args
+                    )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                with profile_stage("upload"):
+                    self.client.complete_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=self.object_key,
+                        UploadId=self._upload_id,
+                        MultipartUpload={"Parts": self._parts},
+                    )
+        except Exception:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self) -> None:
+        """Aborts the upload: nothing is written to the bucket."""
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.object_key, UploadId=self._upload_id)
+            self._upload_id = None
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def __del__(self) -> None:
+        # Never complete a partial upload on garbage collection
+        if not self.closed:
+            try:
+                self.abort()
+            except Exception:
+                pass
 
 
 class S3Bucket:
@@ -26,10 +306,22 @@ class S3Bucket:
 
         NOTE: credentials should never be in the code.
 
+        Every instance created with the same credentials shares one pooled client (see `get_s3_client`),
+        so creating an S3Bucket per call is cheap.
+
         To upload a file to the bucket, use:
 
         >>> s3.upload_file('my_file.txt', 'path/to/my_file.txt')
 
+        To read a byte range of a file from the bucket, use:
+
+        >>> first_kilobyte = s3.read_bytes_from_s3('path/to/my_file.bin', start=0, end=1023)
+
+        To stream a large file to the bucket, use:
+
+        >>> with s3.open_multipart_writer('path/to/my_file.json') as f:
+                f.write(b'...')
+
         To download a file from the bucket, use:
 
         >>> s3.download_file('path/to/my_file.txt', 'my_downloaded_file.txt')
@@ -38,6 +330,10 @@ class S3Bucket:
 
         >>> s3.download_folder('path/to/my_folder', 'my_downloaded_folder')
 
+        To upload a folder to the bucket, 16 files at a time, use:
+
+        >>> report = s3.upload_folder('my_folder', 'path/to/my_folder', max_workers=16)
+
         To delete a file from the bucket, use:
 
         >>> s3.delete_file('path/to/my_file.txt')
@@ -46,6 +342,10 @@ class S3Bucket:
 
         >>> files = s3.list_files()
 
+        To list the partitions of a dataset, e.g. `fwi/year=/month=/day=/`, one level at a time, use:
+
+        >>> partitions = s3.list_partitions("fwi/", depth=3)
+
         To filter files by a pattern, use:
 
         >>> pattern_files = s3.list_files(patterns=["pattern1", "pattern2"])
@@ -62,10 +362,10 @@ class S3Bucket:
     def __init__(
         self,
         bucket_name: str,
-        endpoint_url: str,
-        region_name: str,
-        aws_access_key_id: str,
-        aws_secret_key: str,
+        endpoint_url: Optional[str],
+        region_name: Optional[str],
+        aws_access_key_id: Optional[str],
+        aws_secret_key: Optional[str],
     ) -> None:
         """
         Initializes a new instance of the S3Bucket class.
@@ -77,17 +377,15 @@ class S3Bucket:
             aws_access_key_id (str): The AWS access key ID for the account.
             aws_secret_key (str): The AWS secret access key for the account.
         """
-        session_args = {}
-        if region_name:
-            session_args["region_name"] = region_name
-        if aws_access_key_id and aws_secret_key:
-            session_args["aws_access_key_id"] = aws_access_key_id
-            session_args["aws_secret_access_key"] = aws_secret_key
-        self.session = boto3.Session(**session_args)
-        self.s3 = self.session.resource("s3", endpoint_url=endpoint_url)
-        self.bucket = self.s3.Bucket(bucket_name)
+        self.client = get_s3_client(endpoint_url, region_name, aws_access_key_id, aws_secret_key)
         self.bucket_name = bucket_name
 
+    def _iter_objects(self, prefix: str = "", delimiter: str = "") -> Iterator[Dict[str, Any]]:
+        """Lists the files under a prefix, one listing page (1000 files) at a time, as `list_objects_v2` contents."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter=delimiter):
+            yield from page.get("Contents", [])
+
     def upload_file(self, file_path: str, object_key: str) -> None:
         """
         Uploads a file to the S3 bucket.
@@ -96,29 +394,135 @@ class S3Bucket:
             file_path (str): The local path of the file to upload.
             object_key (str): The S3 key (path) where the file will be stored.
         """
-        self.bucket.upload_file(file_path, object_key)
+        self.client.upload_file(file_path, self.bucket_name, object_key)
 
-    def write_json_to_s3(self, json_data: Dict[str, Any], object_key: str) -> None:
+    def write_json_to_s3(
+        self,
+        json_data: Dict[str, Any],
+        object_key: str,
+        compression: Optional[str] = None,
+        if_match: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+    ) -> Optional[str]:
         """
         Writes a JSON file on the S3 bucket.
 
+        With `if_match` or `if_none_match`, the write is conditional and fails with a "PreconditionFailed"
+        `ClientError` if the file was changed, or created, in the meantime.
+
         Args:
             json_data (json): The JSON data we want to upload.
             object_key (str): The S3 key (path) where the file will be stored.
+            compression (str, optional): The compression of the file, one of `COMPRESSIONS` ("gzip", or "zstd"
+                with the zstandard package), stored as its Content-Encoding. Uncompressed if None.
+            if_match (str, optional): Only replace the file if it still has this ETag.
+            if_none_match (str, optional): "*" to only create the file if it does not exist.
+
+        Returns:
+            The ETag of the written file, if returned by the S3 server.
+        """
+        body = json.dumps(json_data).encode("UTF-8")
+        put_args: Dict[str, Any] = {}
+        if if_match is not None:
+            put_args["IfMatch"] = if_match
+        if if_none_match is not None:
+            put_args["IfNoneMatch"] = if_none_match
+        if compression is not None:
+            compressor = _compressor(compression)
+            body = compressor.compress(body) + compressor.flush()
+            put_args["ContentEncoding"] = compression
+        response = self.client.put_object(Bucket=self.bucket_name, Key=object_key, Body=body, **put_args)
+        return response.get("ETag")
+
+    def open_multipart_writer(
+        self, object_key: str, compression: Optional[str] = None, **extra_args: Any
+    ) -> S3MultipartWriter:
+        """
+        Opens a writable binary file object streaming to a file on the S3 bucket.
+
+        Args:
+            object_key (str): The S3 key (path) where the file will be stored.
+            compression (str, optional): The compression of the file, one of `COMPRESSIONS`. Uncompressed if None.
+            extra_args: Extra arguments of the upload, e.g. `ContentType`.
+
+        Returns:
+            S3MultipartWriter: The file object, to be used as a context manager.
         """
-        self.bucket.put_object(Key=object_key, Body=bytes(json.dumps(json_data).encode("UTF-8")))
+        return S3MultipartWriter(
+            self.client, self.bucket_name, object_key, extra_args=extra_args, compression=compression
+        )
 
-    def read_json_from_s3(self, object_key: str) -> None:
+    def read_json_from_s3(self, object_key: str) -> Dict[str, Any]:
         """
         Read a JSON file from the S3 bucket.
 
+        Compressed files are detected from their Content-Encoding, and decompressed while they are downloaded.
+        Compressed files stored without a Content-Encoding are detected from their magic number.
+
+        Args:
+            object_key (str): The S3 key (path) where the file is stored.
+
+        Returns:
+            The parsed JSON content.
+        """
+        return self.read_json_with_etag(object_key)[0]
+
+    def read_json_with_etag(self, object_key: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Reads a JSON file from the S3 bucket with its ETag, e.g. to replace it with a conditional write.
+
         Args:
             object_key (str): The S3 key (path) where the file is stored.
+
+        Returns:
+            The parsed JSON content, and the ETag of the file, if returned by the S3 server.
         """
-        file_content = self.bucket.Object(object_key).get()["Body"].read().decode("utf-8")
-        json_content = json.loads(file_content)
+        response = self.client.get_object(Bucket=self.bucket_name, Key=object_key)
+        return self._read_json(response), response.get("ETag")
+
+    @staticmethod
+    def _read_json(response: Dict[str, Any]) -> Dict[str, Any]:
+        """Parses the body of a `get_object` response, decompressing it if needed, see `read_json_from_s3`."""
+        compression = response.get("ContentEncoding")
+        if compression in COMPRESSIONS:
+            with _decompressed(response["Body"], compression) as f:
+                return json.load(f)
+
+        file_content = response["Body"].read()
+        for compression, magic in COMPRESSIONS.items():
+            if file_content.startswith(magic):
+                with _decompressed(io.BytesIO(file_content), compression) as f:
+                    return json.load(f)
+        json_content = json.loads(file_content.decode("utf-8"))
         return json_content
 
+    def write_bytes_to_s3(self, data: bytes, object_key: str) -> None:
+        """
+        Writes raw bytes to a file on the S3 bucket.
+
+        Args:
+            data (bytes): The bytes we want to upload.
+            object_key (str): The S3 key (path) where the file will be stored.
+        """
+        self.client.put_object(Bucket=self.bucket_name, Key=object_key, Body=data)
+
+    def read_bytes_from_s3(self, object_key: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """
+        Reads a file, or a byte range of a file, from the S3 bucket.
+
+        Args:
+            object_key (str): The S3 key (path) where the file is stored.
+            start (int, optional): The first byte to read. Reads the whole file if None.
+            end (int, optional): The last byte to read (included). Reads up to the end of the file if None.
+
+        Returns:
+            The bytes read.
+        """
+        get_args = {}
+        if start is not None:
+            get_args["Range"] = f"bytes={start}-{'' if end is None else end}"
+        return self.client.get_object(Bucket=self.bucket_name, Key=object_key, **get_args)["Body"].read()
+
     def download_file(self, object_key: str, file_path: str) -> None:
         """
         Downloads a file from the S3 bucket.
@@ -127,22 +531,91 @@ class S3Bucket:
             object_key (str): The S3 key (path) of the file to download.
             file_path (str): The local path where the file will be saved.
         """
-        self.bucket.download_file(object_key, file_path)
+        self.client.download_file(self.bucket_name, object_key, file_path)
 
-    def download_folder(self, prefix: str, save_path: str = "") -> None:
+    def download_folder(
+        self,
+        prefix: str,
+        save_path: str = "",
+        max_workers: int = 8,
+        skip_unchanged: bool = True,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ) -> Dict[str, Any]:
         """
-        Downloads a folder from the S3 bucket.
+        Downloads a folder from the S3 bucket, transferring several files in parallel.
 
         Args:
             prefix (str): The S3 key (path) of the folder to download.
             save_path (str, optional): The local folder where the folder tree will be saved.
+            max_workers (int, optional): The number of files transferred in parallel.
+            skip_unchanged (bool, optional): Whether to skip the files already saved with the same size and ETag.
+            progress (callable, optional): Called with the key and size of every transferred file.
+
+        Returns:
+            A dictionary reporting the number of files, transferred and skipped files, bytes, duration and throughput.
         """
         if save_path != "" and not (save_path.endswith("/")):
             save_path += "/"
-        for obj in self.bucket.objects.filter(Prefix=prefix):
-            if not os.path.exists(os.path.dirname(save_path + obj.key)):
-                os.makedirs(os.path.dirname(save_path + obj.key))
-            self.bucket.download_file(obj.key, save_path + obj.key)
+        objects = [(obj["Key"], obj["Size"], obj["ETag"]) for obj in self._iter_objects(prefix)]
+        for folder in {os.path.dirname(save_path + key) for key, _, _ in objects}:
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+        transfers: List[Tuple[Callable[[], Any], str, int]] = [
+            (
+                functools.partial(
+                    self.client.download_file, self.bucket_name, key, save_path + key, Config=TRANSFER_CONFIG
+                ),
+                key,
+                size,
+            )
+            for key, size, e_tag in objects
+            if not (skip_unchanged and _is_unchanged(save_path + key, size, e_tag))
+        ]
+        return _run_transfers(transfers, len(objects), max_workers, progress)
+
+    def upload_folder(
+        self,
+        folder_path: str,
+        prefix: str = "",
+        max_workers: int = 8,
+        skip_unchanged: bool = True,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Uploads a local folder to the S3 bucket, transferring several files in parallel.
+
+        Args:
+            folder_path (str): The local folder to upload.
+            prefix (str, optional): The S3 key (path) of the folder where the files will be stored.
+            max_workers (int, optional): The number of files transferred in parallel.
+            skip_unchanged (bool, optional): Whether to skip the files already stored with the same size and ETag.
+            progress (callable, optional): Called with the key and size of every transferred file.
+
+        Returns:
+            A dictionary reporting the number of files, transferred and skipped files, bytes, duration and throughput.
+        """
+        if prefix != "" and not (prefix.endswith("/")):
+            prefix += "/"
+        files = []
+        for root, _, file_names in os.walk(folder_path):
+            for file_name in file_names:
+                file_path = os.path.join(root, file_name)
+                object_key = prefix + os.path.relpath(file_path, folder_path).replace(os.sep, "/")
+                files.append((file_path, object_key, os.path.getsize(file_path)))
+
+        # A single listing rather than a HEAD request per file
+        remote = {obj["Key"]: (obj["Size"], obj["ETag"]) for obj in self._iter_objects(prefix)}
+        transfers: List[Tuple[Callable[[], Any], str, int]] = [
+            (
+                functools.partial(self.client.upload_file, file_path, self.bucket_name, key, Config=TRANSFER_CONFIG),
+                key,
+                size,
+            )
+            for file_path, key, size in files
+            if not (skip_unchanged and key in remote and _is_unchanged(file_path, *remote[key]))
+        ]
+        return _run_transfers(transfers, len(files), max_workers, progress)
 
     def delete_file(self, object_key: str) -> None:
         """
@@ -151,7 +624,7 @@ class S3Bucket:
         Args:
             object_key (str): The S3 key (path) of the file to delete.
         """
-        self.bucket.Object(object_key).delete()
+        self.client.delete_object(Bucket=self.bucket_name, Key=object_key)
 
     def list_folders(self, prefix: str = "", delimiter: str = "") -> list[str]:
         """
@@ -165,16 +638,56 @@ class S3Bucket:
             A list of folder keys (paths) in the bucket.
         """
         folders = []
-        try:
-            for obj in self.bucket.meta.client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=prefix, Delimiter=delimiter
-            )["CommonPrefixes"]:
+        # A listing page holds at most 1000 folders
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter=delimiter):
+            # If no objects in the bucket match the given prefix and delimiter
+            for obj in page.get("CommonPrefixes", []):
                 folders.append(obj["Prefix"])
-        # If no objects in the bucket match the given prefix and delimiter
-        except KeyError:
-            pass
         return folders
 
+    def list_partitions(self, prefix: str, depth: int, max_workers: int = 8) -> List[str]:
+        """
+        Lists the partitions of a dataset, e.g. the `fwi/year=/month=/day=/` folders, without listing their files.
+
+        Each level of partitions is listed with a delimiter, the folders of a level being listed in parallel,
+        so that the cost depends on the number of partitions rather than on the number of files.
+
+        Args:
+            prefix (str): The S3 key (path) of the dataset, e.g. "fwi/".
+            depth (int): The number of partition levels, e.g. 3 for year, month and day.
+            max_workers (int, optional): The number of folders listed in parallel.
+
+        Returns:
+            The sorted keys (paths) of the partitions, ending with "/".
+        """
+        partitions = [prefix]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _ in range(depth):
+                listings = executor.map(lambda folder: self.list_folders(folder, delimiter="/"), partitions)
+                partitions = [folder for folders in listings for folder in folders]
+        return sorted(partitions)
+
+    def list_objects(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """
+        Lists the files under a prefix with their size, ETag and last modified date.
+
+        Args:
+            prefix (str, optional): Only files with keys starting with this prefix will be listed.
+
+        Returns:
+            A list of dictionaries with the `key`, `size` (in bytes), `etag` and `last_modified` date of the files.
+        """
+        return [
+            {
+                "key": obj["Key"],
+                "size": obj["Size"],
+                "etag": obj["ETag"].strip('"'),
+                "last_modified": obj["LastModified"],
+            }
+            for obj in self._iter_objects(prefix)
+        ]
+
     def list_files(
         self,
         patterns: Optional[list[str]] = None,
@@ -195,14 +708,32 @@ class S3Bucket:
             A list of file keys (paths) in the bucket.
         """
         files = []
-        object_filter = self.bucket.objects.filter(Prefix=prefix, Delimiter=delimiter)
+        objects = self._iter_objects(prefix, delimiter)
         if limit != 0:
-            object_filter = object_filter.limit(limit)
-        for obj in object_filter:
-            if not patterns or (isinstance(patterns, list) and any([p in obj.key for p in patterns])):
-                files.append(obj.key)
+            objects = itertools.islice(objects, limit)
+        for obj in objects:
+            if not patterns or (isinstance(patterns, list) and any([p in obj["Key"] for p in patterns])):
+                files.append(obj["Key"])
         return files
 
+    def object_exists(self, object_key: str) -> bool:
+        """
+        Checks whether a file exists in the S3 bucket, with a single HEAD request.
+
+        Args:
+            object_key (str): The S3 key (path) of the file.
+
+        Returns:
+            True if the file exists, False otherwise.
+        """
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return False
+            raise
+        return True
+
     def get_file_metadata(self, object_key: str) -> dict:
         """
         Retrieves metadata for a file in the S3 bucket.
@@ -213,8 +744,7 @@ class S3Bucket:
         Returns:
             A dictionary containing the metadata for the file.
         """
-        obj = self.bucket.Object(object_key)
-        metadata = obj.metadata
+        metadata = self.client.head_object(Bucket=self.bucket_name, Key=object_key)["Metadata"]
         return metadata
 
     def get_files_metadata(
@@ -232,16 +762,54 @@ class S3Bucket:
             A dictionnary of file keys (paths), file sizes en GB and last modified dates in the bucket.
         """
         files = []
-        for obj in self.bucket.objects.filter(Prefix=prefix, Delimiter=delimiter):
-            if not patterns or (isinstance(patterns, list) and any([p in obj.key for p in patterns])):
+        for obj in self._iter_objects(prefix, delimiter):
+            if not patterns or (isinstance(patterns, list) and any([p in obj["Key"] for p in patterns])):
                 files.append({
-                    "file_name": obj.key,
-                    "file_size": round(obj.size * 1.0 / (1024), 2),
-                    "file_last_modified": obj.last_modified,
+                    "file_name": obj["Key"],
+                    "file_size": round(obj["Size"] * 1.0 / (1024), 2),
+                    "file_last_modified": obj["LastModified"],
                 })
         return files
 
 
+class AsyncS3Bucket:
+    """
+    Exposes the methods of an S3Bucket as coroutines, for use from async code such as FastAPI handlers.
+
+    The blocking boto3 calls run in worker threads, which share the pooled and thread-safe S3 client.
+
+    Example:
+        >>> from pyrorisks.utils.s3 import AsyncS3Bucket, S3Bucket
+
+        >>> s3 = AsyncS3Bucket(S3Bucket(...))
+        >>> json_content = await s3.read_json_from_s3('path/to/my_file.json')
+    """
+
+    def __init__(self, s3: S3Bucket, executor: Optional[Executor] = None) -> None:
+        """
+        Initializes a new instance of the AsyncS3Bucket class.
+
+        Args:
+            s3 (S3Bucket): The wrapped S3 bucket.
+            executor (concurrent.futures.Executor, optional): Where the blocking calls run.
+                Defaults to the event loop default executor.
+        """
+        self.s3 = s3
+        self.executor = executor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.s3, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args: Any, **kwargs: Any) -> Any:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(attr, *args, **kwargs))
+
+        return method
+
+
 def read_credentials(
     credentials_path: str,
 ) -> dict:
@@ -0,0 +1,109 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+from pyrorisks.utils.cache import LRUCache
+
+
+class LRUCacheTester(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # "b" is the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=0.0):
+            cache.put("a", 1)
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=5.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=11.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_age(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=0.0):
+            cache.put("a", 1)
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=4.0):
+            self.assertEqual(cache.age("a"), 4.0)
+            self.assertIsNone(cache.age("b"))
+        with mock.patch("pyrorisks.utils.cache.time.monotonic", return_value=11.0):
+            self.assertIsNone(cache.age("a"))
+        # Ages are not cache lookups
+        self.assertEqual(cache.stats()["hits"] + cache.stats()["misses"], 0)
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_entries=10, max_bytes=250)
+        cache.put("a", np.zeros(100, dtype=np.uint8))
+        cache.put("b", np.zeros(100, dtype=np.uint8))
+        cache.put("c", np.zeros(100, dtype=np.uint8))
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.stats()["bytes"], 200)
+        # Values bigger than the cap are never cached
+        cache.put("d", np.zeros(300, dtype=np.uint8))
+        self.assertNotIn("d", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_stats(self):
+        cache = LRUCache()
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3)
+
+    def test_get_or_load_single_flight(self):
+        cache = LRUCache()
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return "raster"
+
+        def query():
+            barrier.wait()
+            return cache.get_or_load(("ecmwf007.fwi", "2024-07-01"), loader)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: query(), range(8)))
+
+        self.assertEqual(results, ["raster"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 7)
+
+    def test_get_or_load_failures(self):
+        cache = LRUCache()
+
+        def failing_loader():
+            raise ValueError("EFFIS is down")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_load("a", failing_loader)
+        # Neither failures nor None values are cached
+        self.assertIsNone(cache.get_or_load("a", lambda: None))
+        self.assertEqual(cache.get_or_load("a", lambda: 1), 1)
+        self.assertEqual(cache.get_or_load("a", lambda: 2), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
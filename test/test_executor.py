@@ -0,0 +1,78 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.api.executor import BoundedExecutor, ExecutorFullError, fwi_executor
+from app.main import app
+
+
+class BoundedExecutorTester(unittest.TestCase):
+    def test_saturation(self):
+        executor = BoundedExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def saturate():
+            # One call running and one queued fill the executor
+            running = asyncio.ensure_future(executor.run(release.wait, 5))
+            queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+            await asyncio.sleep(0)
+            self.assertEqual(executor.pending, 2)
+            with self.assertRaises(ExecutorFullError):
+                await executor.run(lambda: "rejected")
+            release.set()
+            return await asyncio.gather(running, queued)
+
+        try:
+            self.assertEqual(asyncio.run(saturate()), [True, "queued"])
+            # Slots are released once the calls complete
+            self.assertEqual(executor.pending, 0)
+        finally:
+            release.set()
+            executor.shutdown()
+
+    def test_cancellation(self):
+        executor = BoundedExecutor(max_workers=1, max_queue=0)
+        started, release = threading.Event(), threading.Event()
+
+        def busy():
+            started.set()
+            release.wait(5)
+
+        async def cancel():
+            call = asyncio.ensure_future(executor.run(busy))
+            await asyncio.to_thread(started.wait, 5)
+            call.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await call
+            # The worker thread is still busy, so the slot is still taken
+            self.assertEqual(executor.pending, 1)
+            with self.assertRaises(ExecutorFullError):
+                await executor.run(lambda: "rejected")
+
+        try:
+            asyncio.run(cancel())
+            release.set()
+            executor.shutdown()
+            executor._executor.shutdown(wait=True)
+            self.assertEqual(executor.pending, 0)
+        finally:
+            release.set()
+
+    def test_route_unavailable(self):
+        client = TestClient(app)
+        with mock.patch.object(fwi_executor, "pending", fwi_executor.max_workers + fwi_executor.max_queue):
+            response = client.post("/fwi/batch", json={"points": [[2.0, 45.0]]})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
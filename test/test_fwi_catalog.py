@@ -0,0 +1,123 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import hashlib
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from pyrorisks.utils.fwi_catalog import CATALOG_KEY, FWICatalog, fwi_partition, partition_date
+from pyrorisks.utils.s3 import S3Bucket
+from test.test_s3 import StubS3Client
+
+FILES = {
+    "fwi/year=2023/month=12/day=31/fwi_values.json": 1000,
+    "fwi/year=2024/month=01/day=01/fwi_values.json": 1200,
+    "fwi/year=2024/month=01/day=01/fwi_values.bin": 1900,
+    "fwi/year=2024/month=01/day=02/fwi_values.bin": 1900,
+}
+
+
+def make_s3() -> S3Bucket:
+    """An S3Bucket storing `FILES` in memory, listed one file or folder per page."""
+    s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+    s3.client = StubS3Client({key: b"x" * size for key, size in FILES.items()}, page_size=1)
+    return s3
+
+
+class FWICatalogTester(unittest.TestCase):
+    def test_partitions(self):
+        self.assertEqual(fwi_partition("2024-07-01"), "fwi/year=2024/month=07/day=01/")
+        self.assertEqual(partition_date("fwi/year=2024/month=07/day=01/fwi_values.json"), "2024-07-01")
+        self.assertIsNone(partition_date("fwi/catalog.json"))
+
+    def test_list_partitions(self):
+        s3 = make_s3()
+        with (
+            mock.patch.object(s3, "list_folders", wraps=s3.list_folders) as list_folders,
+            mock.patch.object(s3, "list_objects", wraps=s3.list_objects) as list_objects,
+        ):
+            self.assertEqual(
+                s3.list_partitions("fwi/", depth=3, max_workers=2),
+                ["fwi/year=2023/month=12/day=31/", "fwi/year=2024/month=01/day=01/", "fwi/year=2024/month=01/day=02/"],
+            )
+        # One listing per year and per month, with a delimiter, never a listing of the files
+        self.assertEqual(list_folders.call_count, 1 + 2 + 2)
+        list_objects.assert_not_called()
+
+    def test_catalog(self):
+        s3 = make_s3()
+        self.assertEqual(FWICatalog.load(s3).dates, {})
+
+        catalog = FWICatalog.rebuild(s3, max_workers=2)
+        catalog.save(s3)
+        self.assertIn(CATALOG_KEY, s3.client.objects)
+
+        # A single GET answers the reader questions
+        with mock.patch.object(s3.client, "get_object", wraps=s3.client.get_object) as get_object:
+            catalog = FWICatalog.load(s3)
+        get_object.assert_called_once_with(Bucket="risk", Key=CATALOG_KEY)
+        self.assertEqual(catalog.latest_date(), "2024-01-02")
+        self.assertTrue(catalog.has_date("2024-01-01", "fwi_values.json"))
+        self.assertFalse(catalog.has_date("2024-01-02", "fwi_values.json"))
+        self.assertFalse(catalog.has_date("2024-01-03"))
+        etag = hashlib.md5(b"x" * 1000).hexdigest()
+        self.assertEqual(catalog.dates["2023-12-31"], {"fwi_values.json": {"size": 1000, "etag": etag}})
+        self.assertIsNotNone(catalog.updated)
+
+        # Refreshing a date without files removes it
+        catalog.refresh(s3, ["2024-01-02", "2024-01-03"])
+        self.assertTrue(catalog.has_date("2024-01-02"))
+        catalog.dates["2024-01-03"] = {"fwi_values.json": {"size": 1, "etag": "etag-1"}}
+        catalog.refresh(s3, ["2024-01-03"])
+        self.assertEqual(catalog.latest_date(), "2024-01-02")
+
+        with self.assertRaises(ValueError):
+            FWICatalog.from_json({**catalog.to_json(), "format_version": 99})
+
+    def test_concurrent_update(self):
+        s3 = make_s3()
+        FWICatalog.update(s3, ["2023-12-31"])
+        # Saved by another job since it was loaded
+        stale = FWICatalog.load(s3)
+        FWICatalog.update(s3, ["2024-01-01"])
+        with self.assertRaises(ClientError):
+            stale.save(s3)
+        # Nor is a catalog created by another job during a rebuild replaced
+        with mock.patch.object(FWICatalog, "load", return_value=FWICatalog()):
+            with self.assertRaises(ClientError):
+                FWICatalog.rebuild(s3).save(s3)
+
+        # Another job creates the catalog while the dates are listed: retried on its catalog
+        s3 = make_s3()
+        refresh = FWICatalog.refresh
+
+        def refresh_with_concurrent_job(catalog, s3, dates, max_workers=8):
+            refresh(catalog, s3, dates, max_workers)
+            if refresh_dates.call_count == 1:
+                FWICatalog.update(s3, ["2023-12-31"])
+
+        with mock.patch.object(
+            FWICatalog, "refresh", side_effect=refresh_with_concurrent_job, autospec=True
+        ) as refresh_dates:
+            catalog = FWICatalog.update(s3, ["2024-01-02"])
+        self.assertEqual(list(catalog.dates), ["2023-12-31", "2024-01-02"])
+        self.assertEqual(FWICatalog.load(s3).dates, catalog.dates)
+        self.assertEqual(refresh_dates.call_count, 3)
+
+        # Given up after a few attempts
+        conflict = ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        with (
+            mock.patch.object(s3, "write_json_to_s3", side_effect=conflict),
+            mock.patch.object(FWICatalog, "load", wraps=FWICatalog.load) as load,
+        ):
+            with self.assertRaises(ClientError):
+                FWICatalog.update(s3, ["2024-01-02"], max_attempts=2)
+        self.assertEqual(load.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
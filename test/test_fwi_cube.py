@@ -0,0 +1,79 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import tempfile
+import unittest
+
+import numpy as np
+from rasterio.transform import from_bounds
+
+from pyrorisks.platform_fwi.get_fwi_effis_score import get_fwi_series
+from pyrorisks.utils.fwi_cube import FWICube
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_raster import FWIRaster
+
+BBOX = (-6.0, 41.0, 10.0, 52.0)
+WIDTH, HEIGHT = 32, 24
+DATES = ["2023-12-30", "2023-12-31", "2024-01-01", "2024-03-01"]
+
+
+def make_raster(value: int) -> FWIRaster:
+    band = np.full((HEIGHT, WIDTH), value, dtype=np.uint8)
+    # The upper left pixel is on the sea
+    band[0, 0] = 0
+    return FWIRaster(band, from_bounds(*BBOX, WIDTH, HEIGHT), "EPSG:4326")
+
+
+class FWICubeTester(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cube = FWICube(self.tmp_dir.name)
+        for n, date in enumerate(DATES):
+            self.cube.append(date, make_raster(10 * (n + 1)))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_series(self):
+        # Across a year boundary, in date order
+        dates, values = self.cube.series(2.0, 45.0, "2023-12-31")
+        self.assertEqual(dates, DATES[1:])
+        self.assertEqual(values.tolist(), [20, 30, 40])
+        dates, values = self.cube.series(2.0, 45.0, "2023-01-01", "2024-01-01")
+        self.assertEqual(dates, DATES[:3])
+        self.assertEqual(values.tolist(), [10, 20, 30])
+        self.assertEqual(self.cube.series(2.0, 45.0, "2025-01-01")[0], [])
+        # Outside of the map
+        self.assertIsNone(self.cube.series(-6.01, 45.0, "2023-01-01"))
+
+    def test_commit(self):
+        # Written dates are only visible once committed, also to the other readers of the cube
+        reader = FWICube(self.tmp_dir.name)
+        self.assertEqual(reader.dates, DATES)
+        self.cube.write("2024-03-02", make_raster(50))
+        self.assertEqual(reader.series(2.0, 45.0, "2024-03-01")[0], ["2024-03-01"])
+        self.cube.commit(["2024-03-02"])
+        dates, values = reader.series(2.0, 45.0, "2024-03-01")
+        self.assertEqual(dates, ["2024-03-01", "2024-03-02"])
+        self.assertEqual(values.tolist(), [40, 50])
+
+    def test_grid_mismatch(self):
+        band = np.zeros((HEIGHT, WIDTH + 1), dtype=np.uint8)
+        with self.assertRaises(ValueError):
+            self.cube.write("2024-03-02", FWIRaster(band, from_bounds(*BBOX, WIDTH + 1, HEIGHT), "EPSG:4326"))
+
+    def test_get_fwi_series(self):
+        results = get_fwi_series(self.cube, 2.0, 45.0, "2024-01-01")
+        lut = FWIHelpers().fwi_category_lut()
+        self.assertEqual(results["dates"], DATES[2:])
+        self.assertEqual(results["values"], [lut[30], lut[40]])
+        self.assertEqual(results["score"], "fwi")
+        # No FWI over the sea
+        self.assertEqual(get_fwi_series(self.cube, -5.99, 51.99, "2024-01-01")["values"], [None, None])
+        self.assertIsNone(get_fwi_series(self.cube, -6.01, 45.0, "2024-01-01"))
+
+
+if __name__ == "__main__":
+    unittest.main()
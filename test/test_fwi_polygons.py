@@ -0,0 +1,146 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import io
+import json
+import unittest
+from unittest import mock
+
+import numpy as np
+import shapely
+
+from pyrorisks.platform_fwi.get_fwi_effis_score import get_score, get_scores
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_polygons import FWIPolygons
+from pyrorisks.utils.fwi_raster import FWIRaster
+from test.test_fwi_raster import make_band, make_tiff
+
+
+class FWIPolygonsTester(unittest.TestCase):
+    def setUp(self):
+        fwi = FWIHelpers()
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = make_tiff(make_band())
+            gdf_fwi = fwi.get_fwi("http://effis")
+            self.fwi_raster = fwi.get_fwi_raster("http://effis")
+        gdf_fwi = fwi.fwi_sea_remover(gdf_fwi)
+        gdf_fwi["fwi_category"] = gdf_fwi.apply(lambda row: fwi.fwi_category(row["fwi_pixel_value"]), axis=1)
+        self.json_fwi = fwi.fwi_geojson_maker(gdf_fwi.drop("fwi_pixel_value", axis=1))
+
+        rng = np.random.default_rng(3)
+        # Pixel centers, away from the polygon edges
+        cols = rng.integers(0, self.fwi_raster.width, size=100) + 0.5
+        rows = rng.integers(0, self.fwi_raster.height, size=100) + 0.5
+        self.longitudes, self.latitudes = self.fwi_raster.transform * (cols, rows)
+
+    def test_categories(self):
+        fwi_polygons = FWIPolygons.from_features(self.json_fwi["features"])
+        fwi_categories = fwi_polygons.categories(self.longitudes, self.latitudes)
+
+        fwi = FWIHelpers()
+        for lon, lat, fwi_category in zip(self.longitudes, self.latitudes, fwi_categories):
+            pixel_value = self.fwi_raster.pixel_value(lon, lat)
+            if pixel_value == 0:  # the sea was removed
+                self.assertTrue(np.isnan(fwi_category))
+            else:
+                self.assertEqual(fwi_category, fwi.fwi_category(pixel_value))
+        self.assertIsNone(fwi_polygons.category(20.0, 45.0))
+
+    def test_categorized_polygons(self):
+        fwi = FWIHelpers()
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = make_tiff(make_band())
+            gdf_fwi = fwi.fwi_sea_remover(fwi.get_fwi("http://effis", categorize=True))
+        fwi_polygons = FWIPolygons.from_features(fwi.fwi_geojson_maker(gdf_fwi)["features"])
+
+        # Same categories as when categorizing the polygonized pixel values
+        np.testing.assert_array_equal(
+            fwi_polygons.categories(self.longitudes, self.latitudes),
+            FWIPolygons.from_features(self.json_fwi["features"]).categories(self.longitudes, self.latitudes),
+        )
+        self.assertLess(len(fwi_polygons.geodataframe), self.fwi_raster.width * self.fwi_raster.height)
+
+    def test_land_only(self):
+        fwi = FWIHelpers()
+        gdf_fwi = fwi.fwi_sea_remover(fwi.fwi_polygonize(self.fwi_raster, categorize=True))
+        land_gdf = fwi.fwi_polygonize(self.fwi_raster, categorize=True, land_only=True)
+
+        # The sea is never polygonized, and the land polygons are the same
+        self.assertNotIn(0, land_gdf["fwi_category"].tolist())
+        self.assertEqual(len(land_gdf), len(gdf_fwi))
+        self.assertTrue(land_gdf.geometry.union_all().equals(gdf_fwi.geometry.union_all()))
+        self.assertEqual(sorted(land_gdf["fwi_category"]), sorted(gdf_fwi["fwi_category"]))
+
+    def test_fwi_simplify(self):
+        fwi = FWIHelpers()
+        # Diagonal category boundaries, polygonized as staircases
+        rows, cols = np.mgrid[: self.fwi_raster.height, : self.fwi_raster.width]
+        fwi_raster = FWIRaster((rows + cols).astype(np.uint8) * 4 + 1, self.fwi_raster.transform, "EPSG:4326")
+        gdf_fwi = fwi.fwi_polygonize(fwi_raster, categorize=True, land_only=True)
+        longitudes, latitudes = fwi_raster.transform * (cols + 0.5, rows + 0.5)
+        expected = FWIPolygons(gdf_fwi).categories(longitudes.ravel(), latitudes.ravel()).reshape(rows.shape)
+
+        # Merged and quantized only: shorter coordinates, and every pixel center keeps its category
+        merged = fwi.fwi_simplify(gdf_fwi, min(fwi_raster.resolution), tolerance=0)
+        self.assertLess(len(json.dumps(fwi.fwi_geojson_maker(merged))), len(json.dumps(fwi.fwi_geojson_maker(gdf_fwi))))
+        np.testing.assert_array_equal(
+            FWIPolygons(merged).categories(longitudes.ravel(), latitudes.ravel()).reshape(rows.shape), expected
+        )
+
+        # Simplified: fewer coordinates, and only pixels next to another category may change
+        simplified = fwi.fwi_simplify(gdf_fwi, min(fwi_raster.resolution))
+        self.assertTrue(shapely.is_valid(simplified.geometry.values).all())
+        self.assertLess(
+            shapely.get_num_coordinates(simplified.geometry.values).sum(),
+            shapely.get_num_coordinates(gdf_fwi.geometry.values).sum() / 2,
+        )
+        categories = FWIPolygons(simplified).categories(longitudes.ravel(), latitudes.ravel()).reshape(rows.shape)
+        padded = np.pad(expected, 1, mode="edge")
+        boundary = np.zeros(rows.shape, dtype=bool)
+        for d_row, d_col in ((0, 1), (2, 1), (1, 0), (1, 2)):
+            boundary |= padded[d_row : d_row + rows.shape[0], d_col : d_col + rows.shape[1]] != expected
+        self.assertTrue(np.all((categories == expected) | boundary))
+
+        # Without coverage_simplify, polygons are still merged, but not simplified one by one, which opens gaps
+        legacy_shapely = mock.Mock(wraps=shapely, spec=[name for name in dir(shapely) if name != "coverage_simplify"])
+        with mock.patch("pyrorisks.utils.fwi_helpers.shapely", legacy_shapely):
+            self.assertTrue(fwi.fwi_simplify(gdf_fwi, min(fwi_raster.resolution), tolerance=0).equals(merged))
+            with self.assertRaises(ImportError):
+                fwi.fwi_simplify(gdf_fwi, min(fwi_raster.resolution))
+
+    def test_fwi_geojson_writer(self):
+        fwi = FWIHelpers()
+        gdf_fwi = FWIPolygons.from_features(self.json_fwi["features"]).geodataframe
+        buffer = io.BytesIO()
+        fwi.fwi_geojson_writer(gdf_fwi, buffer)
+        self.assertEqual(json.loads(buffer.getvalue()), fwi.fwi_geojson_maker(gdf_fwi))
+
+    def test_fwi_categorize(self):
+        fwi = FWIHelpers()
+        expected = [0] + [fwi.fwi_category(v) for v in range(1, 512)]
+        np.testing.assert_array_equal(fwi.fwi_categorize(np.arange(256, dtype=np.uint8)), expected[:256])
+        np.testing.assert_array_equal(fwi.fwi_categorize(np.arange(512, dtype=np.int32)), expected)
+
+    def test_get_scores(self):
+        cache = LRUCache()
+        env = dict.fromkeys(["BUCKET_NAME", "ENDPOINT_URL", "REGION_NAME", "AWS_ACCESS_KEY", "AWS_SECRET_KEY"], "")
+        with (
+            mock.patch.dict("os.environ", env),
+            mock.patch("pyrorisks.platform_fwi.main.S3Bucket") as s3_bucket,
+        ):
+            s3_bucket.return_value.read_json_from_s3.return_value = self.json_fwi
+            fwi_categories = get_scores(self.latitudes, self.longitudes, date="2024-07-01", cache=cache)
+            fwi_category = get_score(self.latitudes[0], self.longitudes[0], date="2024-07-01", cache=cache)
+
+        s3_bucket.return_value.read_json_from_s3.assert_called_once_with(
+            object_key="fwi/year=2024/month=07/day=01/fwi_values.json"
+        )
+        self.assertEqual(len(fwi_categories), len(self.longitudes))
+        self.assertEqual(fwi_category, fwi_categories[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+from shapely.geometry import Point
+
+from pyrorisks.platform_fwi.get_fwi_effis_score import get_fwi, get_fwi_batch
+from pyrorisks.utils.cache import LRUCache
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_raster import FWIGridReader, FWIRaster
+
+# Same extent as the EFFIS request, at a lower resolution
+BBOX = (-6.0, 41.0, 10.0, 52.0)
+WIDTH, HEIGHT = 32, 24
+
+
+def make_band(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(HEIGHT, WIDTH), dtype=np.uint8)
+
+
+def make_tiff(band: np.ndarray) -> bytes:
+    transform = from_bounds(*BBOX, WIDTH, HEIGHT)
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver="GTiff",
+            width=WIDTH,
+            height=HEIGHT,
+            count=1,
+            dtype="uint8",
+            crs="EPSG:4326",
+            transform=transform,
+        ) as dst:
+            dst.write(band, 1)
+        return memfile.read()
+
+
+class FWIRasterTester(unittest.TestCase):
+    def setUp(self):
+        self.band = make_band()
+        self.fwi_raster = FWIRaster(self.band, from_bounds(*BBOX, WIDTH, HEIGHT), "EPSG:4326")
+
+    def test_pixel_value(self):
+        # Upper left and lower right corners
+        self.assertEqual(self.fwi_raster.pixel_value(-5.99, 51.99), self.band[0, 0])
+        self.assertEqual(self.fwi_raster.pixel_value(9.99, 41.01), self.band[-1, -1])
+        # Outside of the map
+        self.assertIsNone(self.fwi_raster.pixel_value(-6.01, 45.0))
+        self.assertIsNone(self.fwi_raster.pixel_value(0.0, 52.01))
+        self.assertIsNone(self.fwi_raster.pixel_value(float("nan"), 45.0))
+
+    def test_pixel_values(self):
+        rng = np.random.default_rng(2)
+        longitudes = rng.uniform(-8.0, 12.0, size=200)
+        latitudes = rng.uniform(40.0, 53.0, size=200)
+        longitudes[0] = np.nan
+        values, inside = self.fwi_raster.pixel_values(longitudes, latitudes)
+        for lon, lat, value, is_inside in zip(longitudes, latitudes, values, inside):
+            expected = self.fwi_raster.pixel_value(lon, lat)
+            self.assertEqual(is_inside, expected is not None)
+            if is_inside:
+                self.assertEqual(value, expected)
+
+    def test_fwi_grid(self):
+        fwi_grid = self.fwi_raster.to_bytes()
+        self.assertLess(len(fwi_grid), self.band.nbytes + 512)
+
+        from_bytes = FWIRaster.from_bytes(fwi_grid)
+        np.testing.assert_array_equal(from_bytes.band, self.band)
+        self.assertEqual(from_bytes.transform, self.fwi_raster.transform)
+        self.assertEqual(from_bytes.crs, "EPSG:4326")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "fwi_values.bin")
+            self.fwi_raster.to_file(file_path)
+            from_file = FWIRaster.from_file(file_path)
+            np.testing.assert_array_equal(from_file.band, self.band)
+            del from_file
+
+        ranges = []
+
+        def read_range(start, end):
+            ranges.append((start, end))
+            return fwi_grid[start : end + 1]
+
+        reader = FWIGridReader(read_range, header_size_hint=16)
+        self.assertEqual(reader.pixel_value(-5.99, 51.99), self.band[0, 0])
+        self.assertEqual(reader.pixel_value(9.99, 41.01), self.band[-1, -1])
+        self.assertIsNone(reader.pixel_value(20.0, 45.0))
+        # Header read twice (the hint was too short), then a single byte per point
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[-1][1] - ranges[-1][0], 0)
+
+    def test_version(self):
+        from_bytes = FWIRaster.from_bytes(self.fwi_raster.to_bytes())
+        self.assertEqual(from_bytes.version, self.fwi_raster.version)
+        other = FWIRaster(make_band(seed=1), self.fwi_raster.transform, "EPSG:4326")
+        self.assertNotEqual(other.version, self.fwi_raster.version)
+
+    def test_matches_polygonized_raster(self):
+        tiff = make_tiff(self.band)
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = tiff
+            gdf_fwi = FWIHelpers().get_fwi("http://effis")
+            fwi_raster = FWIHelpers().get_fwi_raster("http://effis")
+
+        rng = np.random.default_rng(1)
+        # Stay clear of the pixel edges, where polygon containment is ambiguous
+        cols = rng.integers(0, WIDTH, size=20) + 0.5
+        rows = rng.integers(0, HEIGHT, size=20) + 0.5
+        for col, row in zip(cols, rows):
+            lon, lat = fwi_raster.transform * (col, row)
+            polygon_value = gdf_fwi[gdf_fwi.contains(Point(lon, lat))]["fwi_pixel_value"].iloc[0]
+            self.assertEqual(fwi_raster.pixel_value(lon, lat), polygon_value)
+
+    def test_get_fwi(self):
+        tiff = make_tiff(self.band)
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = tiff
+            results = get_fwi(longitude=-5.99, latitude=51.99, date="2024-07-01")
+            outside = get_fwi(longitude=20.0, latitude=45.0, date="2024-07-01")
+
+        self.assertEqual(results["value"], FWIHelpers().fwi_category(self.band[0, 0]))
+        self.assertEqual(results["date"], "2024-07-01")
+        self.assertIsNone(outside)
+
+    def test_get_fwi_sea(self):
+        # EFFIS has no data over the sea, which must not be reported as a fire risk category
+        band = self.band.copy()
+        band[0, 0] = 0
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = make_tiff(band)
+            sea = get_fwi(longitude=-5.99, latitude=51.99, date="2024-07-01")
+            results = get_fwi_batch([-5.99, 9.99], [51.99, 41.01], date="2024-07-01")
+
+        self.assertIsNone(sea)
+        self.assertEqual(results["values"], [None, FWIHelpers().fwi_category(band[-1, -1])])
+
+    def test_get_fwi_batch(self):
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = make_tiff(self.band)
+            results = get_fwi_batch([-5.99, 20.0, 9.99], [51.99, 45.0, 41.01], date="2024-07-01")
+
+        fwi = FWIHelpers()
+        self.assertEqual(
+            results["values"], [fwi.fwi_category(self.band[0, 0]), None, fwi.fwi_category(self.band[-1, -1])]
+        )
+
+    def test_get_fwi_cache(self):
+        cache = LRUCache()
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get") as get:
+            get.return_value.content = make_tiff(self.band)
+            for lon in (-5.99, 0.0, 9.99):
+                get_fwi(longitude=lon, latitude=45.0, date="2024-07-01", cache=cache)
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import unittest
+
+import geopandas as gpd
+import numpy as np
+from rasterio.transform import from_bounds
+from shapely.geometry import box
+
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+from pyrorisks.utils.fwi_raster import FWIRaster
+from pyrorisks.utils.fwi_regions import FWIRegions
+
+
+class FWIRegionsTester(unittest.TestCase):
+    def test_aggregate(self):
+        # 4x4 pixels of 1 degree, the western half is a region, the eastern half another one
+        band = np.array(
+            [
+                [0, 100, 200, 200],
+                [0, 100, 200, 200],
+                [100, 100, 220, 0],
+                [100, 100, 220, 0],
+            ],
+            dtype=np.uint8,
+        )
+        fwi_raster = FWIRaster(band, from_bounds(0.0, 0.0, 4.0, 4.0, 4, 4), "EPSG:4326")
+        regions = gpd.GeoDataFrame(
+            {"code": ["01", "02", "03"]},
+            geometry=[box(0.0, 0.0, 2.0, 4.0), box(2.0, 0.0, 4.0, 4.0), box(10.0, 10.0, 11.0, 11.0)],
+            crs="EPSG:4326",
+        )
+
+        aggregates = FWIRegions(regions).aggregate(fwi_raster)
+
+        fwi = FWIHelpers()
+        self.assertEqual(set(aggregates), {"01", "02"})  # no pixel in region 03
+        west, east = aggregates["01"], aggregates["02"]
+        # The sea is left out
+        self.assertEqual(west["n_pixels"], 6)
+        self.assertEqual(west["max_category"], fwi.fwi_category(100))
+        self.assertAlmostEqual(west["category_shares"][str(fwi.fwi_category(100))], 1.0)
+        self.assertEqual(east["n_pixels"], 6)
+        expected_mean = (4 * fwi.fwi_category(200) + 2 * fwi.fwi_category(220)) / 6
+        self.assertAlmostEqual(east["mean_category"], expected_mean)
+        self.assertAlmostEqual(sum(east["category_shares"].values()), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
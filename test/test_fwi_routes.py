@@ -0,0 +1,99 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+
+BATCH = {"crs": "EPSG:4326", "score": "fwi", "date": "2024-07-01", "values": [2.0]}
+SERIES = {"longitude": 2.0, "latitude": 45.0, "crs": "EPSG:4326", "score": "fwi", "dates": [], "values": []}
+
+
+class FWIRoutesTester(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        for target, value in (("load_fwi_raster", "raster"), ("get_fwi_batch_from_raster", BATCH)):
+            patcher = mock.patch(f"app.api.routes.fwi.{target}", return_value=value)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_batch_date(self):
+        for date in ("2024-07-01T00:00", "../2024-07-01", "2024-13-01"):
+            response = self.client.post("/fwi/batch", json={"points": [[2.0, 45.0]], "date": date})
+            self.assertEqual(response.status_code, 422, date)
+        self.load_fwi_raster.assert_not_called()
+
+        # Normalized, so that equivalent dates share a cache entry
+        response = self.client.post("/fwi/batch", json={"points": [[2.0, 45.0]], "date": "2024-7-1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.load_fwi_raster.call_args.args[0], "2024-07-01")
+
+    def test_batch_size(self):
+        with mock.patch.object(settings, "FWI_BATCH_MAX_POINTS", 10):
+            # Rejected from its Content-Length, before it is parsed: not even a JSON document
+            response = self.client.post("/fwi/batch", content=b"[" * 2000, headers={"Content-Type": "application/json"})
+            self.assertEqual(response.status_code, 413)
+            # Or once parsed, from the number of points
+            response = self.client.post("/fwi/batch", json={"points": [[2.0, 45.0]] * 11})
+            self.assertEqual(response.status_code, 413)
+        # The schema stops validating oversized batches early
+        response = self.client.post("/fwi/batch", json={"points": [[2.0, 45.0]] * (settings.FWI_BATCH_MAX_POINTS + 1)})
+        self.assertEqual(response.status_code, 422)
+        self.get_fwi_batch_from_raster.assert_not_called()
+
+    def test_batch_file(self):
+        files = {"file": ("points.csv", b"longitude,latitude\n2.0,45.0\n", "text/csv")}
+        response = self.client.post("/fwi/batch/file", files=files, data={"date": "2024-07-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), BATCH)
+
+        response = self.client.post("/fwi/batch/file", files=files, data={"date": "yesterday"})
+        self.assertEqual(response.status_code, 422)
+
+        with mock.patch.object(settings, "FWI_BATCH_MAX_UPLOAD_BYTES", 16):
+            response = self.client.post("/fwi/batch/file", files=files)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.get_fwi_batch_from_raster.call_count, 1)
+
+    def test_series_dates(self):
+        point = {"longitude": 2.0, "latitude": 45.0}
+        with (
+            mock.patch("app.api.routes.fwi.fwi_cube", "cube"),
+            mock.patch("app.api.routes.fwi._get_fwi_series", return_value=SERIES) as get_fwi_series,
+        ):
+
+            def series_dates(**dates):
+                response = self.client.get("/fwi/series", params={**point, **dates})
+                self.assertEqual(response.status_code, 200, response.text)
+                return get_fwi_series.call_args.args[3:5]
+
+            # Up to today, or over the longest range from an older start date
+            today = datetime.date.today()
+            max_range = datetime.timedelta(days=settings.FWI_SERIES_MAX_DAYS - 1)
+            self.assertEqual(series_dates(), ((today - max_range).isoformat(), today.isoformat()))
+            self.assertEqual(
+                series_dates(start_date="2020-01-01"),
+                ("2020-01-01", (datetime.date(2020, 1, 1) + max_range).isoformat()),
+            )
+            yesterday = (today - datetime.timedelta(days=1)).isoformat()
+            self.assertEqual(series_dates(start_date=yesterday), (yesterday, today.isoformat()))
+            self.assertEqual(
+                series_dates(end_date="2020-12-31"),
+                ((datetime.date(2020, 12, 31) - max_range).isoformat(), "2020-12-31"),
+            )
+
+            response = self.client.get(
+                "/fwi/series", params={**point, "start_date": "2020-01-01", "end_date": "2024-01-01"}
+            )
+            self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
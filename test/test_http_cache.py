@@ -0,0 +1,84 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import datetime
+import unittest
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+from rasterio.transform import from_bounds
+
+from app.api.http_cache import etag_matches
+from app.api.risk_index import risk_index
+from app.core.config import settings
+from app.main import app
+from pyrorisks.utils.fwi_raster import FWIRaster
+
+REGIONS = {"01": {"mean_category": 2.0, "max_category": 3, "category_shares": {"2": 0.5, "3": 0.5}}}
+
+
+def make_raster(value: int) -> FWIRaster:
+    return FWIRaster(np.full((24, 32), value, dtype=np.uint8), from_bounds(-6.0, 41.0, 10.0, 52.0, 32, 24), "EPSG:4326")
+
+
+class HTTPCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.today = datetime.date.today().strftime("%Y-%m-%d")
+        patcher = mock.patch("app.api.risk_index.get_s3_bucket", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"xyz", "abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches('"xyz"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+    def test_fwi(self):
+        point = {"longitude": 2.0, "latitude": 45.0}
+        with mock.patch("app.api.routes.fwi.load_fwi_raster", return_value=make_raster(30)):
+            response = self.client.get("/fwi/", params=point)
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers["ETag"]
+            # Today's map may still be revised
+            self.assertEqual(response.headers["Cache-Control"], f"public, max-age={settings.HTTP_CACHE_MAX_AGE}")
+            self.assertIn("Expires", response.headers)
+
+            response = self.client.get("/fwi/", params=point, headers={"If-None-Match": f"W/{etag}"})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response.headers["ETag"], etag)
+
+            # Another point is another response
+            other = self.client.get("/fwi/", params={"longitude": 3.0, "latitude": 45.0})
+            self.assertNotEqual(other.headers["ETag"], etag)
+
+        # A revised map changes the ETag
+        with mock.patch("app.api.routes.fwi.load_fwi_raster", return_value=make_raster(60)):
+            response = self.client.get("/fwi/", params=point, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_risk(self):
+        risk_index.put("FR", "2024-06-30", REGIONS)
+        response = self.client.get("/risk/FR/2024-06-30")
+        self.assertEqual(response.status_code, 200)
+        # Past days are final
+        self.assertEqual(
+            response.headers["Cache-Control"], f"public, max-age={settings.HTTP_CACHE_FINAL_MAX_AGE}, immutable"
+        )
+        response = self.client.get("/risk/FR/2024-06-30", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        risk_index.put("FR", self.today, REGIONS)
+        response = self.client.get(f"/risk/FR/{self.today}")
+        self.assertEqual(response.headers["Cache-Control"], f"public, max-age={settings.HTTP_CACHE_MAX_AGE}")
+
+
+if __name__ == "__main__":
+    unittest.main()
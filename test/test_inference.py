@@ -0,0 +1,88 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import hashlib
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.api.inference import FEATURES, FWIBaselineModel, FWIRiskPredictor
+from app.main import app
+
+REGIONS = {
+    "01": {"mean_category": 2.0, "max_category": 3, "category_shares": {"2": 0.5, "3": 0.5}},
+    "13": {"mean_category": 5.5, "max_category": 6, "category_shares": {"5": 0.5, "6": 0.5}},
+}
+
+
+class ConstantModel:
+    """A pickled model with a `predict` method only."""
+
+    def predict(self, X):
+        return np.full(len(X), 2.0)
+
+
+class FWIRiskPredictorTester(unittest.TestCase):
+    def test_features(self):
+        geocodes, X = FWIRiskPredictor.features(REGIONS, "2024-07-01")
+        self.assertEqual(geocodes, ["01", "13"])
+        self.assertEqual(X.shape, (2, len(FEATURES)))
+        np.testing.assert_allclose(X[1, :8], [5.5, 6, 0, 0, 0, 0, 0.5, 0.5])
+        # Calendar features, on the unit circle and equal for every region
+        day_of_year = 183
+        np.testing.assert_allclose(X[:, -2], np.sin(2 * np.pi * day_of_year / 365.25))
+        np.testing.assert_allclose(X[:, -1], np.cos(2 * np.pi * day_of_year / 365.25))
+
+    def test_predict(self):
+        predictor = FWIRiskPredictor(max_dates=2)
+        # Not loaded on creation, but on first use
+        self.assertFalse(predictor.loaded)
+        self.assertIsNone(predictor.stats()["model"])
+        preds = predictor.predict("FR", "2024-07-01", REGIONS)
+        self.assertIsInstance(predictor.model, FWIBaselineModel)
+        self.assertEqual(predictor.version, "FWIBaselineModel")
+        self.assertLess(preds["01"]["score"], preds["13"]["score"])
+        self.assertEqual(preds["01"]["explainability"], "fwi")
+
+        # Memoized per (country, date)
+        self.assertIs(predictor.predict("FR", "2024-07-01", REGIONS), preds)
+        stats = predictor.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual((stats["cache"]["hits"], stats["cache"]["misses"]), (1, 1))
+        self.assertEqual(predictor.predict("FR", "2024-07-02", {}), {})
+
+    def test_model_path(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "model.pkl")
+            with open(model_path, "wb") as f:
+                pickle.dump(ConstantModel(), f)
+            predictor = FWIRiskPredictor(model_path)
+            predictor.load()
+            with open(model_path, "rb") as f:
+                self.assertEqual(predictor.version, hashlib.blake2b(f.read(), digest_size=16).hexdigest())
+            # `predict` outputs are clipped to a probability
+            preds = predictor.predict("FR", "2024-07-01", REGIONS)
+            self.assertEqual({pred["score"] for pred in preds.values()}, {1 - 1e-6})
+
+            with open(model_path, "wb") as f:
+                f.write(b"not a pickle")
+            with self.assertRaises(pickle.UnpicklingError):
+                FWIRiskPredictor(model_path).load()
+
+    def test_startup_failure(self):
+        # A missing model fails the API startup, not the first request
+        with mock.patch("app.main.predictor", FWIRiskPredictor("missing_model.pkl")):
+            with self.assertRaises(FileNotFoundError):
+                with TestClient(app):
+                    pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+from pyrorisks.utils.fwi_helpers import FWIHelpers
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTester(unittest.TestCase):
+    def test_effis_errors(self):
+        decode_errors = _sample("pyrorisks_effis_errors_total", reason="decode")
+        downloads = _sample("pyrorisks_fwi_stage_seconds_count", stage="download")
+        # EFFIS answers with an XML document when the map is not published
+        response = mock.Mock(content=b"<ServiceExceptionReport/>")
+        with mock.patch("pyrorisks.utils.fwi_helpers.requests.get", return_value=response):
+            self.assertIsNone(FWIHelpers().get_fwi_raster("http://effis"))
+        self.assertEqual(_sample("pyrorisks_effis_errors_total", reason="decode"), decode_errors + 1)
+        self.assertEqual(_sample("pyrorisks_fwi_stage_seconds_count", stage="download"), downloads + 1)
+
+    def test_metrics_route(self):
+        stats = {"hits": 3, "misses": 1, "hit_ratio": 0.75, "entries": 1, "bytes": 128}
+        with mock.patch("app.api.metrics.fwi_raster_cache.stats", return_value=stats):
+            response = TestClient(app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        lines = response.text.splitlines()
+        self.assertIn("# TYPE pyrorisks_cache_lookups_total counter", lines)
+        self.assertIn('pyrorisks_cache_lookups_total{cache="fwi_raster",result="hit"} 3.0', lines)
+        self.assertIn('pyrorisks_cache_lookups_total{cache="fwi_raster",result="miss"} 1.0', lines)
+        self.assertIn('pyrorisks_cache_hit_ratio{cache="fwi_raster"} 0.75', lines)
+        self.assertIn("# TYPE pyrorisks_http_request_duration_seconds histogram", lines)
+        self.assertIn("# TYPE pyrorisks_fwi_executor_pending gauge", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
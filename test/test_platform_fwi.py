@@ -0,0 +1,68 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import click
+from click.testing import CliRunner
+
+from pyrorisks.platform_fwi import main
+
+
+def fake_process_date(retrieved_date, *args):
+    # The first date is already stored, the third one is not published by EFFIS
+    if retrieved_date == "2024-07-03":
+        raise RuntimeError("Could not retrieve the FWI data")
+    return retrieved_date != "2024-07-01"
+
+
+class PlatformFWITester(unittest.TestCase):
+    def test_date_options(self):
+        runner = CliRunner()
+        for args in (["--start-date", "2024-13-01"], ["--retrieved-date", "01/07/2024"], ["--end-date", "tomorrow"]):
+            result = runner.invoke(main.main, args)
+            self.assertEqual(result.exit_code, 2, args)
+            self.assertIn("YYYY-MM-DD", result.output)
+        result = runner.invoke(main.main, ["--start-date", "2024-07-02", "--end-date", "2024-07-01"])
+        self.assertEqual(result.exit_code, 2)
+
+    def test_backfill(self):
+        # Threads instead of processes, so that the stubs are shared with the workers
+        with (
+            mock.patch.object(main, "ProcessPoolExecutor", ThreadPoolExecutor),
+            mock.patch.object(main, "process_date", side_effect=fake_process_date) as process_date,
+            mock.patch.object(main, "update_catalog") as update_catalog,
+        ):
+            with self.assertRaisesRegex(click.ClickException, "Failed dates: 2024-07-03"):
+                main.backfill("2024-07-01", "2024-07-04", ["geojson"], workers=2)
+        self.assertEqual(
+            sorted(call.args[0] for call in process_date.call_args_list), main.date_range("2024-07-01", "2024-07-04")
+        )
+        # The processed and skipped dates are recorded in the catalog, not the failed one
+        self.assertEqual(sorted(update_catalog.call_args.args[0]), ["2024-07-01", "2024-07-02", "2024-07-04"])
+
+    def test_skip_existing(self):
+        s3 = mock.Mock()
+        s3.object_exists.side_effect = lambda object_key: object_key.endswith(main.OUTPUT_FILES["geojson"])
+        with (
+            mock.patch.object(main, "get_s3_bucket", return_value=s3),
+            mock.patch.object(main, "FWIHelpers") as fwi_helpers,
+        ):
+            # All the outputs are stored: nothing is downloaded
+            self.assertFalse(main.process_date("2024-07-01", ["geojson"], skip_existing=True))
+            fwi_helpers.assert_not_called()
+
+            # A missing output resumes the date
+            fwi_helpers.return_value.get_fwi_raster.return_value = None
+            with self.assertRaises(RuntimeError):
+                main.process_date("2024-07-01", ["geojson", "grid"], skip_existing=True)
+            fwi_helpers.return_value.get_fwi_raster.assert_called_once()
+        s3.object_exists.assert_any_call("fwi/year=2024/month=07/day=01/fwi_values.bin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app.api.prewarm import FWIPrewarmer
+from pyrorisks.platform_fwi.get_fwi_effis_score import EFFIS_FWI_LAYER, load_fwi_raster
+from pyrorisks.utils.cache import LRUCache
+
+DATE = "2024-07-01"
+
+
+class StubEFFIS:
+    """Counts the EFFIS downloads, which return `rasters` in turn and take `delay` seconds."""
+
+    def __init__(self, rasters, delay=0.0):
+        self.rasters = list(rasters)
+        self.delay = delay
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def get_fwi_raster(self, url):
+        time.sleep(self.delay)
+        with self._lock:
+            self.downloads += 1
+            return self.rasters[min(self.downloads, len(self.rasters)) - 1]
+
+
+class FWIPrewarmerTester(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(max_entries=4, ttl=100)
+
+    def patch_effis(self, effis):
+        patcher = mock.patch("pyrorisks.platform_fwi.get_fwi_effis_score.FWIHelpers", return_value=effis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_flight(self):
+        effis = StubEFFIS(["raster"], delay=0.2)
+        self.patch_effis(effis)
+        prewarmer = FWIPrewarmer(self.cache, interval=30)
+
+        async def warm_with_cold_request():
+            deadline = asyncio.get_running_loop().time() + 30
+            return await asyncio.gather(
+                prewarmer.warm(DATE, deadline), asyncio.to_thread(load_fwi_raster, DATE, cache=self.cache)
+            )
+
+        # The pre-warming and the cold request share one download
+        self.assertEqual(asyncio.run(warm_with_cold_request()), [True, "raster"])
+        self.assertEqual(effis.downloads, 1)
+        self.assertIn(DATE, prewarmer.last_loaded)
+
+    def test_refresh(self):
+        self.patch_effis(StubEFFIS(["fresh"]))
+        prewarmer = FWIPrewarmer(self.cache, interval=30)
+        self.cache.put((EFFIS_FWI_LAYER, DATE), "stale")
+        self.assertFalse(prewarmer.is_stale(DATE))
+        # Entries expiring before the next run are stale
+        with mock.patch.object(self.cache, "age", return_value=80):
+            self.assertTrue(prewarmer.is_stale(DATE))
+            self.assertTrue(asyncio.run(prewarmer.warm(DATE, float("inf"))))
+        self.assertEqual(self.cache.get((EFFIS_FWI_LAYER, DATE)), "fresh")
+        self.assertTrue(FWIPrewarmer(LRUCache(max_entries=1)).is_stale(DATE))
+
+    def test_backoff(self):
+        # Not published by EFFIS until the fourth try
+        effis = StubEFFIS([None, None, None, "raster"])
+        self.patch_effis(effis)
+        prewarmer = FWIPrewarmer(self.cache, retry_delay=0.01, max_backoff=0.02)
+        sleep = asyncio.sleep
+        delays = []
+
+        async def record_sleep(delay):
+            delays.append(delay)
+            await sleep(delay)
+
+        with mock.patch("app.api.prewarm.asyncio.sleep", side_effect=record_sleep):
+            self.assertTrue(asyncio.run(prewarmer.warm(DATE, float("inf"))))
+        self.assertEqual(delays, [0.01, 0.02, 0.02])
+        self.assertEqual(prewarmer.failures, 3)
+
+        # Given up at the deadline, until the next run
+        effis.rasters, effis.downloads = [None], 0
+        self.cache.invalidate((EFFIS_FWI_LAYER, DATE))
+        self.assertFalse(asyncio.run(prewarmer.warm(DATE, 0)))
+        self.assertEqual(effis.downloads, 1)
+
+    def test_lifecycle(self):
+        prewarmer = FWIPrewarmer(self.cache, interval=0.01)
+
+        async def start_and_stop():
+            runs = []
+            ran_three_times = asyncio.Event()
+
+            async def run_once():
+                runs.append(len(runs))
+                if len(runs) == 3:
+                    ran_three_times.set()
+                if len(runs) == 2:
+                    raise RuntimeError("EFFIS is down")
+
+            with mock.patch.object(prewarmer, "run_once", side_effect=run_once):
+                prewarmer.start()
+                task = prewarmer._task
+                prewarmer.start()
+                self.assertIs(prewarmer._task, task)
+                # Runs every interval, errors do not stop it
+                await asyncio.wait_for(ran_three_times.wait(), timeout=5)
+                await prewarmer.stop()
+            return task
+
+        task = asyncio.run(start_and_stop())
+        self.assertTrue(task.cancelled())
+        self.assertIsNone(prewarmer._task)
+
+
+if __name__ == "__main__":
+    unittest.main()
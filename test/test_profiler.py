@@ -0,0 +1,48 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import tracemalloc
+import unittest
+
+import numpy as np
+
+from pyrorisks.utils.profiler import StageProfiler, profile_stage
+
+
+class ProfilerTester(unittest.TestCase):
+    def test_stages(self):
+        with StageProfiler() as profiler:
+            for _ in range(2):
+                with profile_stage("download"):
+                    with profile_stage("decode"):
+                        band = np.ones((1024, 1024))  # 8 MiB
+                    del band
+        self.assertFalse(tracemalloc.is_tracing())
+
+        report = profiler.report()
+        self.assertEqual(list(report["stages"]), ["decode", "download"])
+        decode, download = report["stages"]["decode"], report["stages"]["download"]
+        self.assertEqual(decode["calls"], 2)
+        self.assertEqual(download["calls"], 2)
+        self.assertGreaterEqual(decode["allocated_mib"], 8)
+        # The peak of a nested stage is included in the peak of the enclosing one
+        self.assertGreaterEqual(download["peak_mib"], decode["peak_mib"])
+        self.assertGreaterEqual(download["wall_s"], decode["wall_s"])
+        self.assertGreaterEqual(report["total"]["peak_mib"], download["peak_mib"])
+        self.assertGreater(report["total"]["max_rss_mib"], 0)
+
+    def test_inactive(self):
+        # Instrumented code runs unchanged without a profiler
+        with profile_stage("download"):
+            pass
+        with StageProfiler() as profiler:
+            pass
+        with profile_stage("download"):
+            pass
+        self.assertEqual(profiler.report()["stages"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+from app.api.risk_index import RegionRiskIndex, risk_index
+from app.main import app
+
+REGIONS = {
+    "01": {"mean_category": 2.0, "max_category": 3, "category_shares": {"2": 0.5, "3": 0.5}},
+    "13": {"mean_category": 5.5, "max_category": 6, "category_shares": {"5": 0.5, "6": 0.5}},
+}
+
+
+def stub_s3(stored):
+    """An AsyncS3Bucket stand-in reading the `fwi_regions.json` of the stored dates."""
+
+    async def read_json_from_s3(object_key):
+        await asyncio.sleep(0)
+        if object_key not in stored:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return stored[object_key]
+
+    return mock.Mock(read_json_from_s3=mock.AsyncMock(side_effect=read_json_from_s3))
+
+
+class RegionRiskIndexTester(unittest.TestCase):
+    def setUp(self):
+        self.s3 = stub_s3({
+            "fwi/year=2024/month=07/day=01/fwi_regions.json": {
+                "country": "FR",
+                "date": "2024-07-01",
+                "regions": REGIONS,
+            }
+        })
+        patcher = mock.patch("app.api.risk_index.get_s3_bucket", return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_load(self):
+        index = RegionRiskIndex(max_dates=1)
+
+        async def load():
+            return await asyncio.gather(*(index.get_or_load("FR", "2024-07-01") for _ in range(5)))
+
+        # Loaded once under concurrent requests, then served from memory
+        self.assertEqual(asyncio.run(load()), [REGIONS] * 5)
+        self.assertEqual(asyncio.run(index.get_or_load("FR", "2024-07-01")), REGIONS)
+        self.s3.read_json_from_s3.assert_awaited_once_with("fwi/year=2024/month=07/day=01/fwi_regions.json")
+        self.assertIsNotNone(index.version("FR", "2024-07-01"))
+
+        # Only the statistics of the requested country
+        self.assertIsNone(asyncio.run(index.get_or_load("ES", "2024-07-01")))
+        # The least recently used date is evicted
+        index.put("FR", "2024-07-02", REGIONS)
+        self.assertIsNone(index.get("FR", "2024-07-01"))
+        self.assertIsNone(index.version("FR", "2024-07-01"))
+
+    def test_miss_ttl(self):
+        index = RegionRiskIndex(max_dates=2, miss_ttl=60)
+        for _ in range(3):
+            self.assertIsNone(asyncio.run(index.get_or_load("FR", "2024-07-02")))
+        self.assertEqual(self.s3.read_json_from_s3.await_count, 1)
+
+        # Looked up again once the miss expired
+        with mock.patch("app.api.risk_index.time.monotonic", return_value=float("inf")):
+            self.assertIsNone(asyncio.run(index.get_or_load("FR", "2024-07-02")))
+        self.assertEqual(self.s3.read_json_from_s3.await_count, 2)
+
+        # Statistics computed in the meantime are served right away
+        index.put("FR", "2024-07-02", REGIONS)
+        self.assertEqual(asyncio.run(index.get_or_load("FR", "2024-07-02")), REGIONS)
+
+
+class RiskRouteTester(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        risk_index.put("FR", "2024-07-01", REGIONS)
+        patcher = mock.patch("app.api.risk_index.get_s3_bucket", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_risk(self):
+        response = self.client.get("/risk/fr/2024-07-01")
+        self.assertEqual(response.status_code, 200)
+        risks = {risk["geocode"]: risk for risk in response.json()}
+        self.assertEqual(set(risks), set(REGIONS))
+        self.assertLess(risks["01"]["score"], risks["13"]["score"])
+        self.assertTrue(all(0 < risk["score"] < 1 for risk in risks.values()))
+
+        # Dates without zero padding are the same day
+        unpadded = self.client.get("/risk/FR/2024-7-1")
+        self.assertEqual(unpadded.status_code, 200)
+        self.assertEqual(unpadded.json(), response.json())
+        self.assertEqual(unpadded.headers["ETag"], response.headers["ETag"])
+
+    def test_not_found(self):
+        self.assertEqual(self.client.get("/risk/FR/2024-07-01T00:00").status_code, 422)
+        self.assertEqual(self.client.get("/risk/ES/2024-07-01").status_code, 404)
+        self.assertEqual(self.client.get("/risk/FR/2020-07-01").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,288 @@
+# Copyright (C) 2021-2022, Pyronear.
+
+# This program is licensed under the Apache License version 2.
+# See LICENSE or go to <https://www.apache.org/licenses/LICENSE-2.0.txt> for full license details.
+
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from pyrorisks.utils.s3 import MIN_PART_SIZE, AsyncS3Bucket, S3Bucket, S3MultipartWriter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class StubPaginator:
+    """In-memory stand-in of the `list_objects_v2` paginator, with `page_size` entries per page."""
+
+    def __init__(self, client, page_size):
+        self.client = client
+        self.page_size = page_size
+        self.pages = 0
+
+    def paginate(self, Bucket, Prefix="", Delimiter=""):
+        entries = []
+        for key in sorted(self.client.objects):
+            if not key.startswith(Prefix):
+                continue
+            if Delimiter and Delimiter in key[len(Prefix) :]:
+                folder = Prefix + key[len(Prefix) :].split(Delimiter, 1)[0] + Delimiter
+                if {"Prefix": folder} not in entries:
+                    entries.append({"Prefix": folder})
+                continue
+            body = self.client.objects[key]
+            entries.append({
+                "Key": key,
+                "Size": len(body),
+                "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+                "LastModified": "2024-07-01T00:00:00Z",
+            })
+        for start in range(0, len(entries), self.page_size):
+            self.pages += 1
+            page = entries[start : start + self.page_size]
+            yield {
+                "Contents": [entry for entry in page if "Key" in entry],
+                "CommonPrefixes": [entry for entry in page if "Prefix" in entry],
+            }
+
+
+class StubS3Client:
+    """In-memory stand-in of the boto3 S3 client calls used by S3MultipartWriter and S3Bucket."""
+
+    def __init__(self, objects=None, page_size=1000):
+        self.objects = dict(objects or {})
+        self.extra_args = {}
+        self.uploads = {}
+        self.aborted = []
+        self.paginator = StubPaginator(self, page_size)
+
+    def etag(self, Key):
+        return f'"{hashlib.md5(self.objects[Key]).hexdigest()}"'
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+        exists = Key in self.objects
+        if (IfNoneMatch == "*" and exists) or (IfMatch is not None and (not exists or self.etag(Key) != IfMatch)):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = Body
+        self.extra_args[Key] = kwargs
+        return {"ETag": self.etag(Key)}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": self.etag(Key), **self.extra_args.get(Key, {})}
+
+    def get_paginator(self, operation_name):
+        return self.paginator
+
+    def download_file(self, Bucket, Key, Filename, Config=None):
+        with open(Filename, "wb") as f:
+            f.write(self.objects[Key])
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        self.extra_args[Key] = kwargs
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+
+class S3MultipartWriterTester(unittest.TestCase):
+    def test_small_object(self):
+        client = StubS3Client()
+        with S3MultipartWriter(client, "bucket", "small.json") as f:
+            f.write(b"{}")
+        self.assertEqual(client.objects["small.json"], b"{}")
+        self.assertEqual(client.uploads, {})
+
+    def test_multipart_upload(self):
+        client = StubS3Client()
+        chunk = b"x" * (MIN_PART_SIZE // 3 + 1)
+        with S3MultipartWriter(client, "bucket", "large.json", part_size=MIN_PART_SIZE) as f:
+            for _ in range(7):
+                f.write(chunk)
+            # Only full parts were sent so far
+            self.assertEqual(len(client.uploads["upload-0"]), 2)
+            self.assertLess(len(f._buffer), MIN_PART_SIZE)
+        self.assertEqual(client.objects["large.json"], chunk * 7)
+
+    def test_compressed_upload(self):
+        client = StubS3Client()
+        chunk = json.dumps({"type": "Feature", "properties": {"fwi_category": 3}}).encode() * 50_000
+        with S3MultipartWriter(client, "bucket", "large.json.gz", part_size=MIN_PART_SIZE, compression="gzip") as f:
+            for _ in range(10):
+                f.write(chunk)
+        self.assertEqual(gzip.decompress(client.objects["large.json.gz"]), chunk * 10)
+        self.assertLess(len(client.objects["large.json.gz"]), len(chunk))
+        self.assertEqual(f.bytes_written, len(chunk) * 10)
+        self.assertEqual(client.extra_args["large.json.gz"], {"ContentEncoding": "gzip"})
+
+        with self.assertRaises(ValueError):
+            S3MultipartWriter(client, "bucket", "large.json.br", compression="br")
+
+    @unittest.skipIf(zstandard is None, "requires the zstd extra")
+    def test_zstd_upload(self):
+        client = StubS3Client()
+        chunk = json.dumps({"type": "Feature", "properties": {"fwi_category": 3}}).encode() * 50_000
+        with S3MultipartWriter(client, "bucket", "large.json.zst", part_size=MIN_PART_SIZE, compression="zstd") as f:
+            for _ in range(10):
+                f.write(chunk)
+        body = client.objects["large.json.zst"]
+        self.assertEqual(zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(), chunk * 10)
+        self.assertLess(len(body), len(chunk))
+        self.assertEqual(client.extra_args["large.json.zst"], {"ContentEncoding": "zstd"})
+
+    def test_missing_zstandard(self):
+        with mock.patch.dict(sys.modules, {"zstandard": None}):
+            with self.assertRaises(ImportError):
+                S3MultipartWriter(StubS3Client(), "bucket", "large.json.zst", compression="zstd")
+
+    def test_abort(self):
+        client = StubS3Client()
+        with self.assertRaises(RuntimeError):
+            with S3MultipartWriter(client, "bucket", "failed.json", part_size=MIN_PART_SIZE) as f:
+                f.write(b"x" * (MIN_PART_SIZE + 1))
+                raise RuntimeError("polygonization failed")
+        self.assertNotIn("failed.json", client.objects)
+        self.assertEqual(client.aborted, ["failed.json"])
+
+
+class S3BucketTester(unittest.TestCase):
+    def test_shared_client(self):
+        credentials = dict(endpoint_url="http://localhost:4566", region_name="gra", aws_secret_key="secret")
+        s3 = S3Bucket(bucket_name="risk", aws_access_key_id="key", **credentials)
+        other_bucket = S3Bucket(bucket_name="other", aws_access_key_id="key", **credentials)
+        other_account = S3Bucket(bucket_name="risk", aws_access_key_id="other_key", **credentials)
+        self.assertIs(s3.client, other_bucket.client)
+        self.assertIsNot(s3.client, other_account.client)
+        self.assertEqual(s3.client.meta.config.max_pool_connections, 50)
+
+    def test_async_bucket(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        with mock.patch.object(s3, "read_json_from_s3", return_value={"type": "FeatureCollection"}) as read_json:
+            json_content = asyncio.run(AsyncS3Bucket(s3).read_json_from_s3("fwi/fwi_values.json"))
+        read_json.assert_called_once_with("fwi/fwi_values.json")
+        self.assertEqual(json_content, {"type": "FeatureCollection"})
+
+    def test_compressed_json(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = StubS3Client()
+        json_data = {"type": "FeatureCollection", "features": [{"properties": {"fwi_category": 3}}] * 100}
+
+        s3.write_json_to_s3(json_data, "fwi/fwi_values.json", compression="gzip")
+        body = s3.client.objects["fwi/fwi_values.json"]
+        self.assertEqual(s3.client.extra_args["fwi/fwi_values.json"], {"ContentEncoding": "gzip"})
+        self.assertLess(len(body), len(json.dumps(json_data)))
+        # Compressed with a Content-Encoding, or detected from the gzip magic number, or uncompressed
+        s3.client.objects.update({"fwi/sniffed.json": body, "fwi/plain.json": json.dumps(json_data).encode()})
+        for object_key in ("fwi/fwi_values.json", "fwi/sniffed.json", "fwi/plain.json"):
+            self.assertEqual(s3.read_json_from_s3(object_key), json_data)
+
+    @unittest.skipIf(zstandard is None, "requires the zstd extra")
+    def test_zstd_json(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = StubS3Client()
+        json_data = {"type": "FeatureCollection", "features": [{"properties": {"fwi_category": 3}}] * 100}
+
+        s3.write_json_to_s3(json_data, "fwi/fwi_values.json", compression="zstd")
+        body = s3.client.objects["fwi/fwi_values.json"]
+        self.assertEqual(s3.client.extra_args["fwi/fwi_values.json"], {"ContentEncoding": "zstd"})
+        self.assertLess(len(body), len(json.dumps(json_data)))
+        # Also detected from the zstd magic number
+        s3.client.objects["fwi/sniffed.json"] = body
+        for object_key in ("fwi/fwi_values.json", "fwi/sniffed.json"):
+            self.assertEqual(s3.read_json_from_s3(object_key), json_data)
+
+    def test_conditional_json(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = StubS3Client()
+        etag = s3.write_json_to_s3({"version": 1}, "fwi/catalog.json", if_none_match="*")
+        self.assertEqual(s3.read_json_with_etag("fwi/catalog.json"), ({"version": 1}, etag))
+
+        # Neither created again, nor replaced once changed
+        with self.assertRaises(ClientError):
+            s3.write_json_to_s3({"version": 2}, "fwi/catalog.json", if_none_match="*")
+        new_etag = s3.write_json_to_s3({"version": 2}, "fwi/catalog.json", if_match=etag)
+        with self.assertRaises(ClientError):
+            s3.write_json_to_s3({"version": 3}, "fwi/catalog.json", if_match=etag)
+        self.assertEqual(s3.read_json_with_etag("fwi/catalog.json"), ({"version": 2}, new_etag))
+
+    def test_listings(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = StubS3Client(
+            {f"fwi/year=2024/month=07/day={day:02d}/fwi_values.json": b"{}" for day in range(1, 6)}, page_size=2
+        )
+        # Over several listing pages
+        self.assertEqual(
+            s3.list_folders("fwi/year=2024/month=07/", delimiter="/"),
+            [f"fwi/year=2024/month=07/day={day:02d}/" for day in range(1, 6)],
+        )
+        self.assertEqual(s3.client.paginator.pages, 3)
+        objects = s3.list_objects("fwi/year=2024/")
+        self.assertEqual([obj["key"] for obj in objects], sorted(s3.client.objects))
+        self.assertEqual(objects[0]["size"], 2)
+        self.assertEqual(objects[0]["etag"], hashlib.md5(b"{}").hexdigest())
+        self.assertEqual(s3.list_files(prefix="fwi/", limit=3), sorted(s3.client.objects)[:3])
+        self.assertEqual(s3.list_folders("fwi/year=2023/", delimiter="/"), [])
+
+    def test_object_exists(self):
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = mock.Mock()
+        self.assertTrue(s3.object_exists("fwi/year=2024/month=07/day=01/fwi_values.json"))
+        s3.client.head_object.assert_called_once_with(
+            Bucket="risk", Key="fwi/year=2024/month=07/day=01/fwi_values.json"
+        )
+
+        s3.client.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        self.assertFalse(s3.object_exists("fwi/year=2024/month=07/day=02/fwi_values.json"))
+        # Other errors, e.g. wrong credentials, are not taken for a missing file
+        s3.client.head_object.side_effect = ClientError({"Error": {"Code": "403"}}, "HeadObject")
+        with self.assertRaises(ClientError):
+            s3.object_exists("fwi/year=2024/month=07/day=02/fwi_values.json")
+
+    def test_download_folder(self):
+        contents = {
+            f"fwi/year=2024/month=07/day={day:02d}/fwi_values.bin": os.urandom(100 + day) for day in range(1, 11)
+        }
+        s3 = S3Bucket("risk", "http://localhost:4566", "gra", "key", "secret")
+        s3.client = StubS3Client(contents, page_size=4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = s3.download_folder("fwi/", tmp_dir, max_workers=4)
+            self.assertEqual((report["files"], report["transferred"], report["skipped"]), (10, 10, 0))
+            self.assertEqual(report["bytes"], sum(len(body) for body in contents.values()))
+            for key, body in contents.items():
+                with open(os.path.join(tmp_dir, key), "rb") as f:
+                    self.assertEqual(f.read(), body)
+
+            # Unchanged files are skipped, modified ones are downloaded again
+            with open(os.path.join(tmp_dir, "fwi/year=2024/month=07/day=01/fwi_values.bin"), "ab") as f:
+                f.write(b"\x00")
+            report = s3.download_folder("fwi/", tmp_dir, max_workers=4)
+            self.assertEqual((report["transferred"], report["skipped"]), (1, 9))
+
+
+if __name__ == "__main__":
+    unittest.main()